@@ -1,9 +1,37 @@
+import csv
+import functools
+import json
+import multiprocessing as mp
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from itertools import islice
+from typing import TYPE_CHECKING
+
 import click
 from pathlib import Path
-from graph_manager import OntoMaintGraph
+from config import DEFAULT_REASONING, DEFAULT_SHARDED, DEFAULT_STORE, REASONING_MODES, SNAPSHOT_DIR, SNAPSHOT_SUFFIXES, STORES
+from export import EXPORT_FORMATS, SUFFIXES, export_rows, json_value
+from query_registry import QueryRegistry, is_iri, prepare_text, to_term
+from cascade import HIGH_RISK_COLUMNS, CascadeIndex
+from profiling import Profiler
+from server import DEFAULT_HOST, DEFAULT_PORT, QueryService, remote_query, remote_sparql, serve
+
+# rdflib, owlrl and numpy take most of the startup time: graph_manager, bulk_load,
+# scenarios and timeseries are imported by the commands that use them, so --help,
+# option errors and commands answered by the query server never load them.
+if TYPE_CHECKING:
+    from graph_manager import OntoMaintGraph
+    from views import MaterializedViews
 
 
 BASE_DIR = Path(__file__).resolve().parent
+QUERIES_DIR = BASE_DIR / "queries"
+REGISTRY = QueryRegistry(QUERIES_DIR)
+READINGS_DIR = BASE_DIR / "data" / "readings"
+# parsed columns of the readings CSVs, appended to as the CSVs grow
+READINGS_CACHE_DIR = BASE_DIR / SNAPSHOT_DIR / "readings"
 
 
 def format_uri(uri):
@@ -18,71 +46,538 @@ def format_uri(uri):
     return uri_str
 
 
+_profiler = None
+
+
+def profile_phase(name: str, **info):
+    """
+    Time a block as a phase when --profile is on; a no-op otherwise.
+    Yields a dict the block can add counts to.
+    """
+    if _profiler is None:
+        return nullcontext(dict(info))
+    return _profiler.phase(name, **info)
+
+
+def output_phase(show):
+    """
+    Time a show_* function (formatting and printing results) as the "format" phase.
+    """
+    @functools.wraps(show)
+    def wrapper(*args, **kwargs):
+        with profile_phase("format", function=show.__name__):
+            return show(*args, **kwargs)
+    return wrapper
+
+
+_reasoning = DEFAULT_REASONING
+_store = DEFAULT_STORE
+_sharded = DEFAULT_SHARDED
+
+
+def graph_snapshot_path() -> Path:
+    from graph_manager import input_fingerprint, snapshot_path
+
+    return snapshot_path(BASE_DIR, input_fingerprint(BASE_DIR, _reasoning), _store)
+
+
+_graph = None
+
+
+def load_graph(query=None) -> "OntoMaintGraph":
+    """
+    Load the reasoned graph, reusing the on-disk snapshot when it is up to date.
+    The graph is shared by every command invoked in this process.
+
+    Given the query it is loaded for (a query name or a prepared query) and
+    no up-to-date snapshot, only the asserted graph is loaded and only what
+    that query can observe is materialized (lazy reasoning; nothing at all
+    for queries reasoning adds nothing to). No snapshot is written then: it is
+    only saved by commands needing the full closure (all, ingest, serve,
+    snapshot build), which complete the reasoning first.
+
+    With --sharded it is a ShardedGraph, every shard fully reasoned.
+    """
+    from graph_manager import OntoMaintGraph
+
+    global _graph
+    if _graph is None and _sharded:
+        from sharding import ShardedGraph
+
+        with profile_phase("load_graph", sharded=True):
+            _graph = ShardedGraph(BASE_DIR, _reasoning, _store).load()
+    if _graph is None:
+        with profile_phase("load_graph"):
+            _graph = OntoMaintGraph(_reasoning, store=_store)
+            if query is None or graph_snapshot_path().exists():
+                _graph.load_reasoned(BASE_DIR)
+            else:
+                _graph.load_ontologies_and_data(BASE_DIR)
+
+    if not _graph.reasoned and query is not None:
+        prepared = REGISTRY.prepared(query) if isinstance(query, str) else query
+        _graph.reason_for_queries([prepared.algebra])
+    elif not _graph.reasoned:
+        _graph.apply_reasoning()
+        try:
+            _graph.save_snapshot(graph_snapshot_path())
+        except OSError as e:
+            print(f"Could not write snapshot: {e}")
+    return _graph
+
+
+def run_named_query(query_name: str, bindings: dict = None, graph: "OntoMaintGraph" = None):
+    """
+    Run queries/<query_name> on the given graph, the query server, or a locally loaded graph.
+    bindings maps query variables to local names or URIs (e.g. {"failure": "OverheatingA"}).
+    Queries for which views.answered_by_views holds are read from the materialized views instead.
+    """
+    with profile_phase(f"query:{query_name}") as record:
+        from_views = graph is None and uses_views(query_name, bindings)
+        # stored views first; without them the query server, and only then views built here
+        if from_views and load_views(build=False) is not None:
+            results = load_views().query_rows(query_name)[1]
+            record.update(views=True, rows=len(results))
+            return results
+        if graph is None:
+            results = remote_query(query_name, bindings)
+            if results is not None:
+                record.update(remote=True, rows=len(results))
+                return results
+            if from_views:
+                results = load_views().query_rows(query_name)[1]
+                record.update(views=True, rows=len(results))
+                return results
+            graph = load_graph(query_name)
+
+        results = graph.run_named_query(REGISTRY, query_name, bindings)
+        record["rows"] = len(results)
+        return results
+
+
+def stream_named_query(query_name: str, bindings: dict = None):
+    """
+    (variable names, rows) of queries/<query_name> for exporting. Always
+    evaluated locally, so rows are produced as they are written and keep
+    their literal types (the query server returns whole results as text).
+    """
+    with profile_phase(f"query:{query_name}", streamed=True):
+        if uses_views(query_name, bindings):
+            columns, rows = load_views().query_rows(query_name)
+            return columns, iter(rows)
+        return load_graph(query_name).iter_named_query(REGISTRY, query_name, bindings)
+
+
+def export_options(command):
+    """
+    Add --format and --output to a command printing result rows. The command
+    gets export=None for the table, or export(columns, rows) writing rows as
+    they come; whatever it prints meanwhile (e.g. graph loading progress) goes
+    to stderr so that it cannot end up in the exported data.
+    """
+    @click.option("--format", "fmt", type=click.Choice(("table",) + EXPORT_FORMATS), default="table",
+                  show_default=True, help="Print a table, or stream the rows as CSV, JSON Lines or Parquet")
+    @click.option("--output", "-o", type=click.Path(dir_okay=False, path_type=Path), default=None,
+                  help="With --format, write to this file instead of stdout")
+    @functools.wraps(command)
+    def wrapper(*args, fmt, output, **kwargs):
+        if fmt == "table":
+            if output is not None:
+                raise click.UsageError("--output needs --format csv, jsonl or parquet.")
+            return command(*args, export=None, **kwargs)
+
+        target = sys.stdout if output is None else output
+        with redirect_stdout(sys.stderr):
+            return command(*args, export=functools.partial(export_result, fmt=fmt, target=target), **kwargs)
+    return wrapper
+
+
+def export_result(columns, rows, fmt: str, target):
+    with profile_phase("export", format=fmt) as record:
+        record["rows"] = export_rows(columns, rows, fmt, target)
+
+
+_cascade_index = None
+
+
+def load_cascade_index() -> CascadeIndex:
+    """
+    Load the failure-propagation / job-chain index, cached in the snapshot
+    directory under the same input fingerprint as the graph snapshot.
+    """
+    global _cascade_index
+    if _cascade_index is not None:
+        return _cascade_index
+
+    from graph_manager import input_fingerprint
+
+    with profile_phase("cascade_index") as record:
+        path = BASE_DIR / SNAPSHOT_DIR / f"cascade-{input_fingerprint(BASE_DIR, _reasoning)[:16]}.pickle"
+        _cascade_index = CascadeIndex.load(path)
+        record["cached"] = _cascade_index is not None
+        if _cascade_index is None:
+            _cascade_index = CascadeIndex.from_rows(run_named_query("cascade_edges.sparql"))
+            try:
+                _cascade_index.save(path)
+            except OSError as e:
+                print(f"Could not write cascade index {path}: {e}")
+    return _cascade_index
+
+
+_views = None
+
+
+def uses_views(query_name: str, bindings: dict = None) -> bool:
+    from views import answered_by_views
+
+    return not bindings and not _sharded and answered_by_views(query_name)
+
+
+def load_views(build: bool = True) -> "MaterializedViews":
+    """
+    Load the materialized views behind team-workload, high-risk and
+    production, cached in the snapshot directory under the same input
+    fingerprint as the graph snapshot; built from the reasoned graph when
+    missing (without build, None instead).
+    """
+    global _views
+    if _views is not None:
+        return _views
+
+    from graph_manager import input_fingerprint
+    from views import MaterializedViews, views_path
+
+    with profile_phase("views") as record:
+        path = views_path(BASE_DIR, input_fingerprint(BASE_DIR, _reasoning))
+        _views = MaterializedViews.load(path, REGISTRY)
+        record["cached"] = _views is not None
+        if _views is None and not build:
+            return None
+        if _views is None:
+            _views = MaterializedViews(REGISTRY).build(load_graph().graph)
+            try:
+                _views.save(path)
+            except OSError as e:
+                print(f"Could not write views {path}: {e}")
+    return _views
+
+
+def _query_worker(query_name: str):
+    # Runs in a forked worker, which inherits the parent's loaded graph.
+    return [tuple(row) for row in run_named_query(query_name, graph=_graph)]
+
+
+def run_queries_parallel(query_names: list[str], workers: int = None) -> list:
+    """
+    Evaluate read-only named queries concurrently on one loaded graph.
+    Results come back in the order of query_names; a failed query yields its exception.
+    """
+    with ThreadPoolExecutor(max_workers=len(query_names)) as pool:
+        remote = list(pool.map(lambda name: _capture(remote_query, name), query_names))
+    if all(r is not None for r in remote):
+        return remote
+
+    load_graph()
+    # a sharded graph already spreads each query over a process per shard
+    if workers == 1 or _sharded or "fork" not in mp.get_all_start_methods():
+        return [_capture(_query_worker, name) for name in query_names]
+
+    # rdflib queries are CPU-bound Python, so threads would serialize on the GIL;
+    # forked processes share the loaded graph copy-on-write instead.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("fork")) as pool:
+        futures = [pool.submit(_query_worker, name) for name in query_names]
+    return [f.exception() or f.result() for f in futures]
+
+
+def _capture(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+
 @click.group()
-def app():
+@click.option("--reasoning", type=click.Choice(REASONING_MODES), default=DEFAULT_REASONING, show_default=True,
+              help="Full OWL RL closure, or only the rules the named queries need (env: ONTOMAINT_REASONING)")
+@click.option("--store", type=click.Choice(STORES), default=DEFAULT_STORE, show_default=True,
+              help="Keep the reasoned snapshot pickled and load it into memory, or query it in place "
+                   "from an indexed SQLite file (env: ONTOMAINT_STORE)")
+@click.option("--sharded/--no-sharded", default=DEFAULT_SHARDED, show_default=True,
+              help="Reason and query each subdirectory of data/ (e.g. each plant) as a separate graph, "
+                   "in parallel (env: ONTOMAINT_SHARDED=1)")
+@click.option("--profile", is_flag=True,
+              help="Report wall time, triple and row counts per phase on stderr")
+@click.option("--profile-format", type=click.Choice(["table", "jsonl"]), default="table", show_default=True,
+              help="Human table or one JSON object per phase")
+@click.option("--profile-memory", is_flag=True,
+              help="With --profile, also record peak Python allocations per phase (tracemalloc; slow)")
+@click.option("--profile-cprofile", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="With --profile, also run cProfile and write its stats to this file")
+@click.pass_context
+def app(ctx, reasoning, store, sharded, profile, profile_format, profile_memory, profile_cprofile):
     """OntoMaint app - run maintenance queries and get recommendations."""
-    pass
+    global _profiler, _reasoning, _store, _sharded
+    _reasoning, _store, _sharded = reasoning, store, sharded
+    if not profile:
+        return
+
+    from graph_manager import OntoMaintGraph
+
+    _profiler = Profiler(trace_memory=profile_memory, cprofile=profile_cprofile is not None).start()
+    OntoMaintGraph.subscribe(_profiler.event)
+
+    def report():
+        global _profiler
+        _profiler.stop()
+        OntoMaintGraph.unsubscribe(_profiler.event)
+        if profile_cprofile is not None:
+            _profiler.dump_cprofile(profile_cprofile)
+        _profiler.report(profile_format)
+        _profiler = None
+
+    ctx.call_on_close(report)
+    ctx.with_resource(profile_phase(f"command:{ctx.invoked_subcommand}"))
+
+
+LOAD_WORKERS_OPTION = click.option(
+    "--workers", type=click.IntRange(min=1), default=None,
+    help="Processes parsing input files in parallel (default: one per CPU; 1 parses serially)",
+)
 
 
 @app.command("init")
-def init_graph():
+@LOAD_WORKERS_OPTION
+def init_graph(workers):
     """Load ontologies + data and run reasoning (dry run)."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
+    from graph_manager import OntoMaintGraph
+
+    g = OntoMaintGraph(_reasoning, store=_store)
+    g.load_ontologies_and_data(BASE_DIR, workers)
     g.apply_reasoning()
 
 
+@app.group("snapshot")
+def snapshot():
+    """Manage the pre-materialized (reasoned) graph snapshot."""
+    pass
+
+
+@snapshot.command("build")
+@LOAD_WORKERS_OPTION
+def snapshot_build(workers):
+    """Parse, reason and write a fresh snapshot for the current inputs."""
+    from graph_manager import OntoMaintGraph
+
+    if _sharded:
+        from sharding import ShardedGraph
+
+        g = ShardedGraph(BASE_DIR, _reasoning, _store, workers=workers).load(use_snapshot=False)
+        click.echo(f"Snapshots of {len(g.shards)} shard(s) written to {BASE_DIR / SNAPSHOT_DIR / 'shards'}")
+        return
+
+    g = OntoMaintGraph(_reasoning, store=_store)
+    g.load_ontologies_and_data(BASE_DIR, workers)
+    g.apply_reasoning()
+
+    path = graph_snapshot_path()
+    g.save_snapshot(path)
+    click.echo(f"Snapshot written to {path}")
+
+
+@snapshot.command("status")
+def snapshot_status():
+    """Show whether the snapshot matches the current inputs."""
+    if _sharded:
+        from sharding import ShardedGraph
+
+        for name, path in ShardedGraph(BASE_DIR, _reasoning, _store).snapshot_paths().items():
+            click.echo(f"{name:<20} {'up to date' if path.exists() else 'missing or stale'}")
+        return
+
+    path = graph_snapshot_path()
+    if path.exists():
+        click.echo(f"Snapshot is up to date: {path}")
+    else:
+        click.echo("Snapshot is missing or stale; it will be rebuilt on the next run.")
+
+
+@snapshot.command("clear")
+def snapshot_clear():
+    """Delete all stored snapshots."""
+    removed = 0
+    for old in (BASE_DIR / SNAPSHOT_DIR).rglob("*"):
+        if old.suffix in SNAPSHOT_SUFFIXES.values():
+            old.unlink()
+            removed += 1
+    click.echo(f"Removed {removed} snapshot(s).")
+
+
+@app.command("ingest")
+@click.argument("data_file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def ingest(data_file):
+    """Add a data file (.ttl, .nt, .nq, optionally .gz) to data/ and update the reasoned snapshot incrementally."""
+    from bulk_load import rdf_format
+
+    try:
+        rdf_format(data_file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if _sharded:
+        raise click.UsageError("ingest updates the single graph; add the file to its shard's directory instead.")
+    target = BASE_DIR / "data" / data_file.name
+    if target.exists():
+        raise click.ClickException(f"{target} already exists.")
+
+    from graph_manager import input_fingerprint
+    from views import views_path
+
+    views = load_views()
+    g = load_graph()
+    delta = g.load_data_file(data_file)
+
+    shutil.copyfile(data_file, target)
+    g.save_snapshot(graph_snapshot_path())
+    views.update(g.graph, delta)
+    views.save(views_path(BASE_DIR, input_fingerprint(BASE_DIR, _reasoning)))
+    click.echo(f"Ingested {data_file.name}; snapshot and views updated.")
+
+
+@app.group("views")
+def materialized_views():
+    """Manage the materialized views behind team-workload, high-risk and production."""
+    if _sharded:
+        raise click.UsageError("views are kept for the single graph only.")
+
+
+@materialized_views.command("build")
+def views_build():
+    """Evaluate every view on the reasoned graph and store them."""
+    from graph_manager import input_fingerprint
+    from views import MaterializedViews, views_path
+
+    views = MaterializedViews(REGISTRY).build(load_graph().graph)
+    path = views_path(BASE_DIR, input_fingerprint(BASE_DIR, _reasoning))
+    views.save(path)
+    for name, groups in views.groups.items():
+        click.echo(f"{name:<20} {len(groups):>8} key(s)")
+    click.echo(f"Views written to {path}")
+
+
+@materialized_views.command("check")
+def views_check():
+    """Compare the stored views with their queries evaluated on the reasoned graph."""
+    views = load_views()
+    differing = views.check(load_graph().graph)
+    for name in views.views:
+        click.echo(f"{name:<20} {'DIFFERENT' if name in differing else 'ok'}")
+    if differing:
+        sys.exit(1)
+
+
+@materialized_views.command("show")
+@click.argument("name")
+@export_options
+def views_show(name, export):
+    """Print the rows of one view."""
+    views = load_views()
+    if name not in views.views:
+        raise click.BadParameter(f"choose from {', '.join(views.views)}", param_hint="NAME")
+    columns, rows = views.rows(name)
+    if export:
+        export(columns, rows)
+    else:
+        show_query_rows(columns, rows)
+
+
+@app.command("serve")
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option("--port", default=DEFAULT_PORT, show_default=True, type=int)
+def serve_queries(host, port):
+    """Keep one reasoned graph in memory and answer queries over HTTP."""
+    if _sharded:
+        raise click.UsageError("serve does not support --sharded.")
+    g = load_graph()
+    serve(QueryService(g, REGISTRY), host=host, port=port)
+
+
+DEPTH_OPTION = click.option(
+    "--depth", type=click.IntRange(min=0), default=None,
+    help="Maximum propagation / job-chain hops to follow (default: unlimited)",
+)
+
+
 @app.command("impact")
 @click.option("--failure", required=True,
               help="URI local name of the ErrorContext (e.g. OverheatingA)")
-def impact(failure):
+@DEPTH_OPTION
+@export_options
+def impact(failure, depth, export):
     """
     Diagnose impact of a given failure: machines, jobs, and propagated failures.
     """
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
-
-    failure_uri = f"http://example.org/ontomaint#{failure}"
-    query_file = BASE_DIR / "queries" / "impact_failure.sparql"
-
-    filter_clause = f"FILTER (?failure = <{failure_uri}>)"
-
-    results = g.run_query_from_file(query_file, filter_clause=filter_clause)
+    index = load_cascade_index()
+    cascade = index.failure_cascade(to_term(failure), depth)
+    if export:
+        export(CASCADE_COLUMNS, cascade_rows(index, cascade))
+        return
 
-    if not results:
+    if not cascade["machines"] and not cascade["blocked_jobs"] and len(cascade["failures"]) == 1:
         click.echo(f"No impact found for failure {failure}.")
         return
 
     click.echo(f"Impact for failure {failure}:\n")
+    show_cascade(index, cascade)
 
-    for failure_res, machine, job, next_job, prop_failure in results:
-        click.echo(f"- Affected machine: {format_uri(machine)}")
-        click.echo(f"  Blocked job:   {job}")
-        if next_job:
-            click.echo(f"  Next job:     {next_job}")
-        if prop_failure:
-            click.echo(f"  May propagate to: {format_uri(prop_failure)}")
-        click.echo("")
+
+CASCADE_COLUMNS = ("root_failure", "failure", "hops", "machines", "downtime", "blocked_jobs")
+
+
+def _joined(terms):
+    return " ".join(str(t) for t in terms) or None
+
+
+def cascade_rows(index: CascadeIndex, cascade: dict):
+    """
+    One row per failure of a cascade, in CASCADE_COLUMNS order; several machines or jobs are space-separated URIs.
+    """
+    for failure, hops in cascade["failures"].items():
+        yield (cascade["failure"], failure, hops, _joined(index.machines.get(failure, ())),
+               index.downtime.get(failure), _joined(index.blocked_jobs.get(failure, ())))
+
+
+@output_phase
+def show_cascade(index: CascadeIndex, cascade: dict, indent: str = ""):
+    click.echo(f"{indent}Cascade depth: {cascade['depth']}   Failures: {len(cascade['failures'])}   "
+               f"Cumulative downtime: {cascade['downtime']:g} minutes\n")
+    click.echo(f"{indent}{'Failure':<22} {'Hops':<6} {'Machine':<15} {'Downtime (min)':<15} {'Blocks Job':<20}")
+    click.echo(f"{indent}" + "-" * 80)
+
+    for failure, hops in cascade["failures"].items():
+        machines = ", ".join(format_uri(m) for m in index.machines.get(failure, ())) or "None"
+        jobs = ", ".join(format_uri(j) for j in index.blocked_jobs.get(failure, ())) or "None"
+        downtime = index.downtime.get(failure)
+        click.echo(f"{indent}{format_uri(failure):<22} {hops:<6} {machines:<15} {'None' if downtime is None else f'{downtime:g}':<15} {jobs:<20}")
+
+    if cascade["downstream_jobs"]:
+        jobs = ", ".join(f"{format_uri(job)} (+{hops})" for job, hops in cascade["downstream_jobs"].items())
+        click.echo(f"\n{indent}Downstream jobs: {jobs}")
+    for cycle in cascade["cycles"]:
+        click.echo(f"{indent}Cycle detected: {' -> '.join(format_uri(n) for n in cycle + cycle[:1])}")
+    click.echo("")
 
 
 @app.command("actions")
 @click.option("--failure", required=True,
               help="URI local name of the ErrorContext (e.g. OverheatingA)")
-def actions(failure):
+@export_options
+def actions(failure, export):
     """
     Suggest corrective actions for a failure.
     """
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
-
-    failure_uri = f"http://example.org/ontomaint#{failure}"
-    query_file = BASE_DIR / "queries" / "actions_for_failure.sparql"
-
-    filter_clause = f"FILTER (?failure = <{failure_uri}>)"
-
-    results = g.run_query_from_file(query_file, filter_clause=filter_clause)
+    if export:
+        export(*stream_named_query("actions_for_failure.sparql", {"failure": failure}))
+        return
+    results = run_named_query("actions_for_failure.sparql", {"failure": failure})
 
     if not results:
         click.echo(f"No corrective actions defined for failure {failure}.")
@@ -91,19 +586,21 @@ def actions(failure):
     click.echo(f"Recommended actions for {failure}:\n")
     for _, action in results:
         click.echo(f"- {action}")
-            
+
+
 
 @app.command("critical")
-def critical():
+@export_options
+def critical(export):
     """List failures sorted by severity and downtime."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
-
-    query_file = BASE_DIR / "queries" / "critical_failures.sparql"
+    if export:
+        export(*stream_named_query("critical_failures.sparql"))
+        return
+    show_critical(run_named_query("critical_failures.sparql"))
 
-    results = g.run_query_from_file(query_file)
 
+@output_phase
+def show_critical(results):
     if not results:
         click.echo("No critical failures found.")
         return
@@ -118,45 +615,71 @@ def critical():
             
 
 @app.command("whatif")
-@click.option("--machine", required=True,
+@click.option("--machine", default=None,
               help="Machine name (e.g. MixerA)")
-def whatif(machine):
-    """Simulate all failures that affect a given machine."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
-
-    machine_uri = f"http://example.org/ontomaint#{machine}"
-    query_file = BASE_DIR / "queries" / "whatif_machine_failure.sparql"
-
-    filter_clause = f"FILTER (?machine = <{machine_uri}>)"
+@click.option("--all", "all_machines", is_flag=True,
+              help="Simulate every machine going down and rank the scenarios")
+@click.option("--top", type=click.IntRange(min=1), default=None,
+              help="With --all, only show the N worst scenarios")
+@DEPTH_OPTION
+@export_options
+def whatif(machine, all_machines, top, depth, export):
+    """Simulate all failures that affect a given machine, or every machine going down (--all)."""
+    if all_machines:
+        from scenarios import SCENARIO_COLUMNS, RelationArrays, machine_scenarios
+
+        rows = machine_scenarios(RelationArrays(load_cascade_index()))
+        if export:
+            export(SCENARIO_COLUMNS, rows[:top])
+        else:
+            show_machine_scenarios(rows, top)
+        return
+    if machine is None:
+        raise click.UsageError("Pass --machine <name> or --all.")
 
-    results = g.run_query_from_file(query_file, filter_clause=filter_clause)
+    index = load_cascade_index()
+    cascades = index.machine_cascades(to_term(machine), depth)
+    if export:
+        export(CASCADE_COLUMNS, (row for cascade in cascades for row in cascade_rows(index, cascade)))
+        return
 
-    if not results:
+    if not cascades:
         click.echo(f"No failures affect machine {machine}.")
         return
 
     click.echo(f"What-if scenario: failures affecting {machine}\n")
 
-    for failure, blockedJob, nextJob in results:
-        click.echo(f"- Failure: {format_uri(failure)}")
-        click.echo(f"  Blocks job: {format_uri(blockedJob)}")
-        if nextJob:
-            click.echo(f"  Downstream job: {format_uri(nextJob)}")
-        click.echo("")
+    for cascade in cascades:
+        click.echo(f"- Failure: {format_uri(cascade['failure'])}")
+        show_cascade(index, cascade, indent="  ")
+
+
+@output_phase
+def show_machine_scenarios(rows, top=None):
+    if not rows:
+        click.echo("No machines found.")
+        return
+
+    click.echo(f"What-if scenarios: every machine going down ({len(rows)} machines)\n")
+    click.echo(f"{'Rank':<6} {'Machine':<20} {'Failure Modes':<14} {'Blocked Jobs':<13} {'Downstream Jobs':<16} {'Batches':<8} {'Lost Batch Size':<16} {'Exp. Downtime':<14} {'Worst Downtime':<14}")
+    click.echo("-" * 130)
+
+    for rank, (machine, modes, blocked, downstream, batches, lost, expected, worst) in enumerate(rows[:top], start=1):
+        click.echo(f"{rank:<6} {format_uri(machine):<20} {modes:<14} {blocked:<13} {downstream:<16} {batches:<8} {lost:<16g} {expected:<14g} {worst:<14g}")
 
 
 @app.command("health")
-def health():
+@export_options
+def health(export):
     """Display overall machine health status."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*stream_named_query("machine_health.sparql"))
+        return
+    show_health(run_named_query("machine_health.sparql"))
 
-    query_file = BASE_DIR / "queries" / "machine_health.sparql"
-    results = g.run_query_from_file(query_file)
 
+@output_phase
+def show_health(results):
     if not results:
         click.echo("No machine health data available.")
         return
@@ -169,38 +692,124 @@ def health():
         click.echo(f"{format_uri(machine):<15} {str(uptime):<12} {str(failure_rate):<15} {str(age):<12} {str(last_maint):<20} {str(interval):<15}")
 
 
+def parse_weights(ctx, param, values) -> dict:
+    from risk import RISK_WEIGHTS
+
+    weights = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name.strip() not in RISK_WEIGHTS:
+            raise click.BadParameter(f"unknown risk factor {name.strip()!r}; expected one of {', '.join(RISK_WEIGHTS)}")
+        try:
+            weights[name.strip()] = float(weight)
+        except ValueError:
+            raise click.BadParameter(f"expected FACTOR=NUMBER, got {value!r}")
+    return weights
+
+
+@app.command("risk")
+@click.option("--top", type=click.IntRange(min=1), default=None, help="Only show the N riskiest machines")
+@click.option("--as-of", default=None, help="Date to count overdue maintenance at, ISO time (default: now)")
+@click.option("--weight", "weights", multiple=True, callback=parse_weights, metavar="FACTOR=WEIGHT",
+              help="Exponent of a risk factor (failure_rate, age, overdue, severity, downtime; default 1, 0 drops it); repeatable")
+@export_options
+def risk(top, as_of, weights, export):
+    """
+    Rank machines by composite risk: failure rate x age x overdue maintenance x
+    worst severity and downtime of the failures affecting them.
+    """
+    from datetime import datetime
+
+    from risk import RISK_COLUMNS, MachineRisk
+
+    try:
+        as_of = datetime.fromisoformat(as_of) if as_of else datetime.now()
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--as-of")
+
+    health_rows = run_named_query("machine_health.sparql")
+    failure_rows = run_named_query("critical_failures.sparql")
+    with profile_phase("risk") as record:
+        machines = MachineRisk.from_rows(health_rows, failure_rows)
+        rows = machines.ranking(as_of, top, weights)
+        record["machines"] = len(machines)
+    if export:
+        export(RISK_COLUMNS, rows)
+        return
+    show_risk(rows, len(machines), as_of)
+
+
+@output_phase
+def show_risk(rows, machines, as_of):
+    if not rows:
+        click.echo("No machine health data available.")
+        return
+
+    click.echo(f"Machine risk as of {as_of:%Y-%m-%d %H:%M} (top {len(rows)} of {machines} machines):\n")
+    click.echo(f"{'Rank':<6} {'Machine':<20} {'Risk':<12} {'Failure Rate':<13} {'Age (yrs)':<10} {'Overdue (days)':<15} "
+               f"{'Worst Severity':<15} {'Worst Downtime':<15} {'Failure Modes':<13}")
+    click.echo("-" * 125)
+
+    for rank, (machine, score, failure_rate, age, overdue, severity, downtime, modes) in enumerate(rows, start=1):
+        click.echo(f"{rank:<6} {format_uri(machine):<20} {score:<12.4g} {_g(failure_rate):<13} {_g(age):<10} "
+                   f"{overdue:<15.1f} {_g(severity):<15} {_g(downtime):<15} {modes:<13}")
+
+
+def _g(value) -> str:
+    return "None" if value is None else f"{value:g}"
+
+
 @app.command("high-risk")
-def high_risk():
+@DEPTH_OPTION
+@export_options
+def high_risk(depth, export):
     """Identify high-risk failures (near-critical severity)."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*high_risk_result(depth))
+        return
+    show_high_risk(run_named_query("high_risk_failures.sparql"), depth=depth)
 
-    query_file = BASE_DIR / "queries" / "high_risk_failures.sparql"
-    results = g.run_query_from_file(query_file)
 
-    if not results:
+def high_risk_rows(results, depth=None) -> list[tuple]:
+    """
+    CascadeIndex.high_risk_rows of the high-risk query rows; the index is only loaded when there are any.
+    """
+    return load_cascade_index().high_risk_rows(results, depth) if results else []
+
+
+def high_risk_result(depth=None):
+    columns, rows = stream_named_query("high_risk_failures.sparql")
+    return HIGH_RISK_COLUMNS, [(*row[:7], _joined(row[7]), row[8]) for row in high_risk_rows(list(rows), depth)]
+
+
+@output_phase
+def show_high_risk(results, depth=None):
+    rows = high_risk_rows(results, depth)
+    if not rows:
         click.echo("No high-risk failures found.")
         return
 
     click.echo("High-Risk Failures:\n")
-    click.echo(f"{'Failure':<20} {'Machine':<15} {'Severity':<10} {'Downtime (min)':<15} {'Cascades':<7} {'Next Failures':<20} {'Action':<20}")
-    click.echo("-" * 120)
+    click.echo(f"{'Failure':<20} {'Machine':<15} {'Severity':<10} {'Downtime (min)':<15} {'Cascades':<9} {'Depth':<6} {'Total (min)':<12} {'Next Failures':<20} {'Action':<20}")
+    click.echo("-" * 140)
 
-    for failure, machine, severity, downtime, cascade_count, next_failures, required_action in results:
-        click.echo(f"{format_uri(failure):<20} {format_uri(machine):<15} {str(severity):<10} {str(downtime):<15} {str(cascade_count):<7} {format_uri(next_failures):<20} {str(format_uri(required_action)):<20}")
+    for failure, machine, severity, downtime, cascades, depth, total, next_failures, required_action in rows:
+        next_failures = ", ".join(format_uri(f) for f in next_failures) or "None"
+        click.echo(f"{format_uri(failure):<20} {format_uri(machine):<15} {str(severity):<10} {str(downtime):<15} {cascades:<9} {depth:<6} {total:<12g} {next_failures:<20} {str(format_uri(required_action)):<20}")
 
 
 @app.command("maintenance")
-def maintenance():
+@export_options
+def maintenance(export):
     """Display maintenance schedules for all machines."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*stream_named_query("maintenance_schedule.sparql"))
+        return
+    show_maintenance(run_named_query("maintenance_schedule.sparql"))
 
-    query_file = BASE_DIR / "queries" / "maintenance_schedule.sparql"
-    results = g.run_query_from_file(query_file)
 
+@output_phase
+def show_maintenance(results):
     if not results:
         click.echo("No maintenance schedules found.")
         return
@@ -213,16 +822,74 @@ def maintenance():
         click.echo(f"{format_uri(machine):<15} {format_uri(task):<25} {str(description):<30} {str(due_date):<20} {str(est_hours):<10} {format_uri(team):<15} {str(specialty):<20}")
 
 
+@app.command("schedule")
+@click.option("--start", default=None, help="First day of the planning horizon, ISO date (default: today)")
+@click.option("--days", type=click.IntRange(min=1), default=30, show_default=True, help="Length of the planning horizon")
+@click.option("--hours-per-day", type=click.FloatRange(min=0, min_open=True, max=24), default=8.0, show_default=True,
+              help="Working hours per operator and day")
+@export_options
+def schedule(start, days, hours_per_day, export):
+    """Assign maintenance tasks and their recurrences to team operators within their working hours."""
+    from datetime import date, datetime
+
+    from scheduler import SCHEDULE_COLUMNS, MaintenanceData, plan_maintenance
+
+    try:
+        start = datetime.fromisoformat(start) if start else datetime.combine(date.today(), datetime.min.time())
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--start")
+
+    tasks = run_named_query("maintenance_tasks.sparql")
+    operators = run_named_query("maintenance_operators.sparql")
+    with profile_phase("schedule") as record:
+        plan = plan_maintenance(MaintenanceData.from_rows(tasks, operators), start, days, hours_per_day)
+        rows = plan.rows()
+        record.update(tasks=len(plan.tasks), assigned=len(plan.assigned), unscheduled=len(plan.unscheduled))
+    if export:
+        # times as ISO 8601, like the dateTime literals of query exports
+        export(SCHEDULE_COLUMNS, [(*row[:5], *(t.isoformat() for t in row[5:8]), row[8]) for row in rows])
+        return
+    show_schedule(plan, rows)
+
+
+@output_phase
+def show_schedule(plan, rows):
+    if not rows and not plan.unscheduled:
+        click.echo("No maintenance tasks due in the planning horizon.")
+        return
+
+    calendar = plan.calendar
+    click.echo(f"Maintenance Schedule, {calendar.start:%Y-%m-%d} + {calendar.days} days:\n")
+    click.echo(f"{'Task':<30} {'Machine':<15} {'Operator':<18} {'Due':<17} {'Start':<17} {'End':<17} {'Late (h)':<9}")
+    click.echo("-" * 128)
+    for task, machine, _, operator, match, due, start, end, late in rows:
+        operator = format_uri(operator) + ("" if match else " *")
+        click.echo(f"{format_uri(task):<30} {format_uri(machine):<15} {operator:<18} {due:%Y-%m-%d %H:%M}  "
+                   f"{start:%Y-%m-%d %H:%M}  {end:%Y-%m-%d %H:%M}  {late:<9g}")
+
+    click.echo(f"\n{len(rows)} task(s) scheduled, {plan.late()} late, {len(plan.unscheduled)} unscheduled"
+               " (* operator without any of the machine operators' specialties)")
+    for task, due, reason in plan.unscheduled:
+        click.echo(f"  unscheduled: {format_uri(plan.tasks[task][0])} due {calendar.wall_time(due):%Y-%m-%d %H:%M}: {reason}")
+
+    click.echo(f"\n{'Team':<25} {'Operators':<10} {'Assigned (h)':<13} {'Available (h)':<14} {'Utilization':<11}")
+    click.echo("-" * 75)
+    for team, (count, hours, capacity) in sorted(plan.team_utilization().items()):
+        click.echo(f"{format_uri(team):<25} {count:<10} {hours:<13g} {capacity:<14g} {hours / capacity:<11.1%}")
+
+
 @app.command("production")
-def production():
+@export_options
+def production(export):
     """Analyze production impact of failures."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*stream_named_query("production_impact_analysis.sparql"))
+        return
+    show_production(run_named_query("production_impact_analysis.sparql"))
 
-    query_file = BASE_DIR / "queries" / "production_impact_analysis.sparql"
-    results = g.run_query_from_file(query_file)
 
+@output_phase
+def show_production(results):
     if not results:
         click.echo("No production impact data available.")
         return
@@ -236,37 +903,64 @@ def production():
 
 
 @app.command("sensors")
-def sensors():
+@click.option("--since", default=None, help="Only readings at or after this ISO time (e.g. 2025-12-12T10:00:00)")
+@click.option("--until", default=None, help="Only readings at or before this ISO time")
+@export_options
+def sensors(since, until, export):
     """Analyze sensor performance and anomalies."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*sensor_result(since, until))
+        return
+    show_sensors(since=since, until=until)
 
-    query_file = BASE_DIR / "queries" / "sensor_performance.sparql"
-    results = g.run_query_from_file(query_file)
 
-    if not results:
+SENSOR_COLUMNS = ("machine", "sensor", "metric", "unit", "readings", "min", "max", "mean", "last", "last_time")
+
+
+def sensor_aggregates(since=None, until=None) -> list[tuple]:
+    """
+    Per-series aggregates (SENSOR_COLUMNS) of the readings in data/readings/*.csv;
+    the graph only holds the sensors and metrics (sensor_performance.sparql).
+    """
+    from timeseries import TimeSeriesStore
+
+    store = TimeSeriesStore()
+    if READINGS_DIR.exists():
+        store.ingest_dir(READINGS_DIR, READINGS_CACHE_DIR)
+    return store.aggregates(since, until)
+
+
+def sensor_result(since=None, until=None):
+    return SENSOR_COLUMNS, sensor_aggregates(since, until)
+
+
+@output_phase
+def show_sensors(since=None, until=None):
+    rows = sensor_aggregates(since, until)
+    if not rows:
         click.echo("No sensor data available.")
         return
 
     click.echo("Sensor Performance:\n")
-    click.echo(f"{'Machine':<20} {'Sensor':<20} {'Metric Name':<20} {'Value':<15} {'Unit':<12} {'Measurement Time':<25}")
-    click.echo("-" * 115)
+    click.echo(f"{'Machine':<15} {'Sensor':<22} {'Metric Name':<26} {'Unit':<10} {'Readings':<9} {'Min':<10} {'Max':<10} {'Mean':<10} {'Last':<10} {'Last Measurement':<25}")
+    click.echo("-" * 155)
 
-    for machine, sensor, metric_name, metric_value, metric_unit, measurement_time in results:
-        click.echo(f"{format_uri(machine):<20} {format_uri(sensor):<20} {str(metric_name):<20} {str(metric_value):<15} {str(metric_unit):<12} {str(measurement_time):<25}")
+    for machine, sensor, metric_name, unit, count, vmin, vmax, vmean, last, last_time in rows:
+        click.echo(f"{format_uri(machine):<15} {format_uri(sensor):<22} {metric_name:<26} {str(unit):<10} {count:<9} {vmin:<10.4g} {vmax:<10.4g} {vmean:<10.4g} {last:<10.4g} {last_time:<25}")
 
 
 @app.command("spare-parts")
-def spare_parts():
+@export_options
+def spare_parts(export):
     """Analyze impact of spare parts availability on failures."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*stream_named_query("spare_parts_impact.sparql"))
+        return
+    show_spare_parts(run_named_query("spare_parts_impact.sparql"))
 
-    query_file = BASE_DIR / "queries" / "spare_parts_impact.sparql"
-    results = g.run_query_from_file(query_file)
 
+@output_phase
+def show_spare_parts(results):
     if not results:
         click.echo("No spare parts data available.")
         return
@@ -280,15 +974,17 @@ def spare_parts():
 
 
 @app.command("team-workload")
-def team_workload():
+@export_options
+def team_workload(export):
     """Analyze team workload and maintenance task distribution."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+    if export:
+        export(*stream_named_query("team_workload.sparql"))
+        return
+    show_team_workload(run_named_query("team_workload.sparql"))
 
-    query_file = BASE_DIR / "queries" / "team_workload.sparql"
-    results = g.run_query_from_file(query_file)
 
+@output_phase
+def show_team_workload(results):
     if not results:
         click.echo("No team workload data available.")
         return
@@ -301,30 +997,246 @@ def team_workload():
         click.echo(f"{format_uri(team):<20} {str(operator_count):<12} {str(machines_responsible):<20} {str(total_hours):<22}")
 
 
+ANALYSES = [
+    ("health", "machine_health.sparql", show_health),
+    ("critical", "critical_failures.sparql", show_critical),
+    ("high-risk", "high_risk_failures.sparql", show_high_risk),
+    ("maintenance", "maintenance_schedule.sparql", show_maintenance),
+    ("production", "production_impact_analysis.sparql", show_production),
+    ("sensors", None, show_sensors),
+    ("spare-parts", "spare_parts_impact.sparql", show_spare_parts),
+    ("team-workload", "team_workload.sparql", show_team_workload),
+]
+# Analyses whose exported rows are computed rather than being the query rows
+# (sensors has no query: its readings are not in the graph).
+EXPORTED_RESULTS = {"high-risk": high_risk_result, "sensors": sensor_result}
+
+
 @app.command("all")
-def run_all():
-    """Run all analysis queries sequentially."""
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
+@click.option("--workers", type=click.IntRange(min=1), default=None,
+              help="Parallel query workers (default: one per CPU; 1 runs sequentially)")
+@click.option("--format", "fmt", type=click.Choice(("table",) + EXPORT_FORMATS), default="table", show_default=True,
+              help="Print tables, or write every analysis as CSV, JSON Lines or Parquet")
+@click.option("--output", "-o", type=click.Path(file_okay=False, path_type=Path), default=None,
+              help="With --format, the directory to write <analysis>.<format> files to")
+def run_all(workers, fmt, output):
+    """Run all analysis queries on one graph load, evaluated in parallel."""
+    if fmt != "table" or output is not None:
+        if fmt == "table" or output is None:
+            raise click.UsageError("Pass both --format csv|jsonl|parquet and --output DIR.")
+        export_all(fmt, output)
+        return
+
+    query_names = [query_name for _, query_name, _ in ANALYSES if query_name]
+    with profile_phase("parallel_queries", queries=len(query_names), workers=workers):
+        results = iter(run_queries_parallel(query_names, workers=workers))
 
-    commands = ["health", "critical", "high-risk", "maintenance", "production", "sensors", "spare-parts", "team-workload"]
-    
     click.echo("=" * 100)
     click.echo("COMPREHENSIVE SYSTEM ANALYSIS")
     click.echo("=" * 100)
     click.echo()
 
-    for cmd in commands:
+    for cmd, query_name, show in ANALYSES:
         click.echo(f"\n{'='*100}")
         click.echo(f"{cmd.upper()}")
         click.echo(f"{'='*100}\n")
-        
+
+        if query_name is None:
+            show()
+            continue
+        result = next(results)
+        if isinstance(result, Exception):
+            click.echo(f"Error running {cmd}: {result}")
+            continue
+        show(result)
+
+
+def export_all(fmt: str, directory: Path):
+    """
+    Write every analysis to directory/<analysis>.<format>, streaming each query in turn on one graph.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for cmd, query_name, _ in ANALYSES:
+        result = EXPORTED_RESULTS.get(cmd)
+        columns, rows = result() if result else stream_named_query(query_name)
+        path = directory / f"{cmd}{SUFFIXES[fmt]}"
+        export_result(columns, rows, fmt, path)
+        click.echo(f"Wrote {path}")
+
+
+# the parameter each batch command is asked about
+BATCH_PARAMETERS = {"impact": "failure", "actions": "failure", "whatif": "machine"}
+
+
+@app.command("batch")
+@click.argument("requests", type=click.File("r", encoding="utf-8"), default="-")
+@click.option("--input-format", type=click.Choice(["jsonl", "csv"]), default=None,
+              help="Format of the requests (default: csv for a .csv file, else jsonl)")
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-",
+              help="Write the answers to this file instead of stdout")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=1000, show_default=True,
+              help="Requests answered together; answers are written after each chunk")
+def batch(requests, input_format, output, chunk_size):
+    """
+    Answer many impact, actions and whatif requests in one process.
+
+    Reads REQUESTS (stdin by default) as JSON Lines, e.g.
+    {"command": "impact", "failure": "OverheatingA", "depth": 1}, or as CSV with
+    the columns command, failure, machine, depth. Writes one JSON line per
+    request, in input order: {"request": ..., "rows": [...]} with the rows the
+    command writes with --format jsonl, or {"request": ..., "error": "..."}.
+    """
+    fmt = input_format or ("csv" if requests.name.endswith(".csv") else "jsonl")
+    records = read_batch_requests(requests, fmt)
+    with redirect_stdout(sys.stderr), profile_phase("batch", format=fmt) as record:
+        count = 0
+        for chunk in iter(lambda: list(islice(records, chunk_size)), []):
+            for answer in batch_answers(chunk):
+                output.write(json.dumps(answer) + "\n")
+            output.flush()
+            count += len(chunk)
+        record["requests"] = count
+
+
+def read_batch_requests(file, fmt: str):
+    """
+    Requests as dicts, one per JSON line or CSV row (empty cells left out).
+    A line that is not JSON yields a ValueError in its place.
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(file):
+            yield {k: v for k, v in row.items() if k and v}
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ValueError(f"not JSON: {line.strip()[:80]}")
+
+
+def batch_request(record) -> tuple:
+    """
+    (command, failure or machine, depth) of a batch request; ValueError if it is not one.
+    """
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("a request must be an object")
+    command = record.get("command")
+    if command not in BATCH_PARAMETERS:
+        raise ValueError(f"unknown command {command!r}; expected one of {', '.join(BATCH_PARAMETERS)}")
+    value = record.get(BATCH_PARAMETERS[command])
+    if not value or not isinstance(value, str):
+        raise ValueError(f"{command} needs a {BATCH_PARAMETERS[command]}")
+    if not is_iri(value):
+        raise ValueError(f"{value!r} is not a local name or URI")
+    depth = record.get("depth")
+    if depth is not None:
+        if isinstance(depth, bool) or not str(depth).isdigit():
+            raise ValueError(f"depth must be a number of hops (0 or more), not {depth!r}")
+        depth = int(depth)
+    return command, value, depth
+
+
+def batch_answers(records: list) -> list[dict]:
+    """
+    Answers to a chunk of batch requests, in order. The actions requests are
+    one evaluation of actions_for_failure.sparql over all their failures;
+    impact and whatif come from the cascade index, loaded once.
+    """
+    requests = [_capture(batch_request, record) for record in records]
+    failures = {to_term(r[1]) for r in requests if isinstance(r, tuple) and r[0] == "actions"}
+    actions = _capture(batch_actions, failures) if failures else None
+
+    answers = []
+    for record, request in zip(records, requests):
+        answer = {"request": record} if isinstance(record, dict) else {}
         try:
-            ctx = click.get_current_context()
-            ctx.invoke(globals()[cmd.replace("-", "_")])
+            if isinstance(request, Exception):
+                raise request
+            columns, rows = batch_rows(request, actions)
+            answer["rows"] = [dict(zip(columns, map(json_value, row))) for row in rows]
         except Exception as e:
-            click.echo(f"Error running {cmd}: {e}")
+            answer["error"] = str(e)
+        answers.append(answer)
+    return answers
+
+
+def batch_actions(failures) -> tuple:
+    """
+    (variable names, {failure: rows}) of actions_for_failure.sparql, with VALUES over all failures.
+    """
+    prepared = REGISTRY.prepared_with_values("actions_for_failure.sparql", "failure", failures)
+    with profile_phase("query:actions_for_failure.sparql", failures=len(failures)) as record:
+        columns, rows = load_graph(prepared).iter_query(prepared)
+        position = columns.index("failure")
+        found = {}
+        for row in rows:
+            found.setdefault(row[position], []).append(row)
+        record["rows"] = sum(map(len, found.values()))
+    return columns, found
+
+
+def batch_rows(request: tuple, actions) -> tuple:
+    # (columns, rows) of one request, as the command would export them
+    command, value, depth = request
+    if command == "actions":
+        if isinstance(actions, Exception):
+            raise actions
+        columns, found = actions
+        return columns, found.get(to_term(value), [])
+
+    index = load_cascade_index()
+    if command == "impact":
+        return CASCADE_COLUMNS, cascade_rows(index, index.failure_cascade(to_term(value), depth))
+    return CASCADE_COLUMNS, [row for cascade in index.machine_cascades(to_term(value), depth)
+                             for row in cascade_rows(index, cascade)]
+
+
+@app.command("query")
+@click.argument("query_file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@export_options
+def query(query_file, export):
+    """
+    Run a SPARQL SELECT query from a file. Rows are printed as they are produced;
+    with --format they are streamed to stdout or --output.
+    """
+    text = query_file.read_text(encoding="utf-8")
+    try:
+        remote = None if export else remote_sparql(text)
+    except RuntimeError as e:
+        raise click.ClickException(f"{query_file}: {e}")
+    if remote is not None:
+        columns, rows, truncated = remote
+        show_query_rows(columns, rows)
+        if truncated:
+            click.echo(f"Stopped at the query server's limit of {len(rows):,} rows "
+                       "(--format, or ONTOMAINT_SERVER=, evaluates locally without it).", err=True)
+        return
+
+    try:
+        prepared = prepare_text(text)
+        with profile_phase(f"query:{query_file.name}", streamed=True):
+            columns, rows = load_graph(prepared).iter_query(prepared)
+    except Exception as e:
+        raise click.ClickException(f"{query_file}: {e}")
+
+    if export:
+        export(columns, rows)
+    else:
+        show_query_rows(columns, rows)
+
+
+@output_phase
+def show_query_rows(columns, rows):
+    click.echo("  ".join(f"{c:<25}" for c in columns).rstrip())
+    click.echo("-" * (27 * len(columns)))
+    count = 0
+    for row in rows:
+        click.echo("  ".join(f"{format_uri(cell):<25}" for cell in row).rstrip())
+        count += 1
+    click.echo(f"\n{count} row(s)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+from rdflib import RDF, URIRef
+
+from benchmarks.run import BASE_DIR, RESULTS_DIR
+from graph_manager import OntoMaintGraph
+from query_registry import ONTO
+
+APP = [sys.executable, str(BASE_DIR / "app.py")]
+# local evaluation, as a tool spawning app.py without a query server gets
+ENV = {**os.environ, "ONTOMAINT_SERVER": ""}
+
+
+def make_requests(count: int) -> list[dict]:
+    """
+    count requests cycling over impact, actions and whatif and over the repository's failures and machines.
+    """
+    graph = OntoMaintGraph()
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            graph.load_reasoned(BASE_DIR)
+        finally:
+            sys.stdout = stdout
+    failures = sorted(str(s) for s in graph.graph.subjects(RDF.type, URIRef(ONTO + "ErrorContext")))
+    machines = sorted(str(s) for s in graph.graph.subjects(RDF.type, URIRef(ONTO + "Machine")))
+    requests = []
+    for i in range(count):
+        command = ("impact", "actions", "whatif")[i % 3]
+        if command == "whatif":
+            requests.append({"command": command, "machine": machines[i % len(machines)]})
+        else:
+            requests.append({"command": command, "failure": failures[i % len(failures)]})
+        if command != "actions" and i % 2:
+            requests[-1]["depth"] = 1
+    return requests
+
+
+def run_batch(requests: list[dict]) -> tuple[float, list[dict]]:
+    text = "".join(json.dumps(request) + "\n" for request in requests)
+    started = time.perf_counter()
+    done = subprocess.run(APP + ["batch"], input=text, capture_output=True, text=True, env=ENV, check=True)
+    return time.perf_counter() - started, [json.loads(line) for line in done.stdout.splitlines()]
+
+
+def run_one(request: dict) -> tuple[float, list[dict]]:
+    command = request["command"]
+    args = [command, "--machine" if command == "whatif" else "--failure",
+            request.get("machine") or request["failure"], "--format", "jsonl"]
+    if "depth" in request:
+        args += ["--depth", str(request["depth"])]
+    started = time.perf_counter()
+    done = subprocess.run(APP + args, capture_output=True, text=True, env=ENV, check=True)
+    return time.perf_counter() - started, [json.loads(line) for line in done.stdout.splitlines()]
+
+
+def _sorted(rows: list[dict]) -> list:
+    return sorted(json.dumps(row, sort_keys=True) for row in rows)
+
+
+@click.command()
+@click.option("--requests", "counts", default="100,1000,10000", show_default=True,
+              help="Comma-separated numbers of requests per batch.")
+@click.option("--per-process", type=click.IntRange(min=1), default=30, show_default=True,
+              help="Requests run as one app.py process each (and checked against the batch answers).")
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/batch-<timestamp>.json).")
+def main(counts, per_process, output):
+    """
+    Requests per second of impact, actions and whatif requests answered by
+    one `app.py batch` against one app.py process per request, on the
+    repository's data, and whether both answer the same.
+    """
+    counts = [int(s) for s in counts.split(",") if s.strip()]
+    requests = make_requests(max(counts + [per_process]))
+    run_batch(requests[:3])  # snapshot and cascade index written, as for any later call
+
+    seconds = [run_one(request) for request in requests[:per_process]]
+    single = {"requests": per_process, "seconds": round(sum(s for s, _ in seconds), 3)}
+    single["requests_per_second"] = round(per_process / single["seconds"], 2)
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "per_process": single, "results": []}
+    failures = []
+
+    click.echo(f"{'Requests':>8} {'Batch':>9} {'Req/s':>9} {'Per process':>12} {'Req/s':>7} {'Speedup':>8}  Answers")
+    click.echo("-" * 75)
+    for count in counts:
+        elapsed, answers = run_batch(requests[:count])
+        different = [i for i, (answer, (_, rows)) in enumerate(zip(answers, seconds))
+                     if "error" in answer or _sorted(answer["rows"]) != _sorted(rows)]
+        if len(answers) != count or different:
+            failures.append(f"{count} requests: {len(answers)} answers, differing at {different[:5]}")
+        rate = count / elapsed
+        click.echo(f"{count:>8,} {elapsed:>8.2f}s {rate:>9,.1f} {single['seconds']:>11.2f}s "
+                   f"{single['requests_per_second']:>7.2f} {rate / single['requests_per_second']:>7.0f}x  "
+                   + ("DIFFERENT" if len(answers) != count or different else "equal"))
+        results["results"].append({"requests": count, "seconds": round(elapsed, 3),
+                                   "requests_per_second": round(rate, 1), "answers_equal": not different})
+    if failures:
+        results["failures"] = failures
+        click.echo("FAILED: " + "; ".join(failures))
+
+    output = output or RESULTS_DIR / f"batch-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import click
+
+from benchmarks.plant import write_plant
+from benchmarks.reasoning import SAMPLE_BINDINGS
+from benchmarks.run import BASE_DIR, QUERIES_DIR, QUERY_BINDINGS, RESULTS_DIR
+from graph_manager import OntoMaintGraph
+from query_registry import QueryRegistry
+from sandbox import QuerySandbox, evaluate
+from server import QueryService, remote_query, remote_sparql, serialize_cell, start_background
+
+# Named queries whose text is also sent as ad-hoc SPARQL, to run in the sandbox's workers.
+AD_HOC = ["critical_failures.sparql", "machine_health.sparql"]
+
+
+def _key(rows) -> list:
+    # order-independent: queries without ORDER BY may return rows in any order
+    return sorted(json.dumps(list(row)) for row in rows)
+
+
+def expected_answers(graph: OntoMaintGraph, registry: QueryRegistry, bindings: dict, max_rows: int) -> list[tuple]:
+    """
+    (kind, query, bindings, rows) of every named query and AD_HOC text, evaluated locally.
+    """
+    answers = []
+    for name in registry.names(internal=True):
+        rows = [[serialize_cell(cell) for cell in row] for row in registry.execute(graph.graph, name, bindings.get(name))]
+        answers.append(("named", name, bindings.get(name), _key(rows)))
+    for name in AD_HOC:
+        _, rows, _ = evaluate(graph.graph, registry.text(name), max_rows)
+        answers.append(("sparql", registry.text(name), None, _key([serialize_cell(c) for c in row] for row in rows)))
+    return answers
+
+
+def check_clients(graph: OntoMaintGraph, registry: QueryRegistry, answers: list, clients: int,
+                  requests: int) -> dict:
+    """
+    Start a server with an empty cache on a background thread and send it
+    `requests` named and ad-hoc queries from `clients` threads at once,
+    comparing every answer with the local one.
+    """
+    sandbox = QuerySandbox.of_graph(graph)
+    httpd, url = start_background(QueryService(graph, registry, sandbox=sandbox))
+
+    def ask(i):
+        kind, query, bindings, expected = answers[i % len(answers)]
+        started = time.perf_counter()
+        try:
+            if kind == "named":
+                rows = remote_query(query, bindings, url=url)
+            else:
+                rows = (remote_sparql(query, url=url) or (None, None))[1]
+        except RuntimeError as e:
+            rows = e
+        seconds = time.perf_counter() - started
+        if rows is None or isinstance(rows, RuntimeError):
+            return seconds, f"request {i} ({kind} {query[:40]!r}): {rows or 'no answer'}"
+        return seconds, None if _key(rows) == expected else f"request {i} ({kind} {query[:40]!r}): rows differ"
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            done = list(pool.map(ask, range(requests)))
+        elapsed = time.perf_counter() - started
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        sandbox.close()
+
+    latencies = sorted(seconds for seconds, _ in done)
+    return {
+        "clients": clients,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "median_ms": round(statistics.median(latencies) * 1e3, 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1e3, 2),
+        "failures": [failure for _, failure in done if failure],
+    }
+
+
+@click.command()
+@click.option("--scales", default="0,50", show_default=True,
+              help="Comma-separated plant sizes, in machines; 0 is the repository's own data.")
+@click.option("--clients", "client_counts", default="1,8,32", show_default=True,
+              help="Comma-separated numbers of concurrent clients.")
+@click.option("--requests", type=click.IntRange(min=1), default=200, show_default=True,
+              help="Requests per number of clients.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/clients-<timestamp>.json).")
+def main(scales, client_counts, requests, seed, output):
+    """
+    Send many named and ad-hoc queries at once to a query server started with
+    server.start_background, and check every answer against local execution.
+    """
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "results": []}
+    failed = False
+    registry = QueryRegistry(QUERIES_DIR)
+    click.echo(f"{'Machines':>8} {'Clients':>7} {'Requests':>8} {'Seconds':>8} {'Req/s':>8} {'Median ms':>10} "
+               f"{'p95 ms':>8}  Answers")
+    click.echo("-" * 80)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-clients-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            plant_dir, bindings = BASE_DIR, SAMPLE_BINDINGS
+            if machines:
+                plant_dir = Path(tmp) / f"plant-{machines}"
+                write_plant(plant_dir, machines, seed)
+                bindings = {name: binding() for name, binding in QUERY_BINDINGS.items()}
+            graph = OntoMaintGraph()
+            with redirect_stdout(StringIO()):
+                graph.load_reasoned(plant_dir, use_snapshot=False)
+            answers = expected_answers(graph, registry, bindings, QuerySandbox.of_graph(graph).max_rows)
+
+            for clients in [int(s) for s in client_counts.split(",") if s.strip()]:
+                run = check_clients(graph, registry, answers, clients, requests)
+                failed = failed or bool(run["failures"])
+                click.echo(f"{machines:>8} {clients:>7} {requests:>8} {run['seconds']:>7.2f}s "
+                           f"{run['requests_per_second']:>8.1f} {run['median_ms']:>10.2f} {run['p95_ms']:>8.2f}  "
+                           + (f"DIFFERENT ({len(run['failures'])}): " + "; ".join(run["failures"][:3])
+                              if run["failures"] else "equal"))
+                results["results"].append({"machines": machines, **run})
+
+    output = output or RESULTS_DIR / f"clients-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+import click
+from owlrl import DeductiveClosure, OWLRL_Semantics
+from rdflib import Graph
+
+from benchmarks.plant import write_plant
+from benchmarks.run import BASE_DIR, RESULTS_DIR
+from graph_manager import OntoMaintGraph
+from reasoning import is_schema_triple
+
+
+def _sample(triples: set, count: int, rng: random.Random) -> list:
+    # sorted first, so a seed always picks the same triples
+    return rng.sample(sorted(triples, key=lambda t: tuple(term.n3() for term in t)), min(count, len(triples)))
+
+
+def full_closure(asserted: set) -> set:
+    """
+    The closure DeductiveClosure(OWLRL_Semantics) computes from scratch over the asserted triples.
+    """
+    graph = Graph()
+    graph.addN((s, p, o, graph) for s, p, o in asserted)
+    DeductiveClosure(OWLRL_Semantics).expand(graph)
+    return set(graph)
+
+
+def check_plant(plant_dir: Path, rounds: int, delta: int, held_out: float, seed: int) -> dict:
+    """
+    Reason a plant with a random share of its instance triples held out, then
+    apply rounds of random deltas (delta held-out triples added, delta
+    asserted ones removed) incrementally, comparing the closure after each
+    round with a full rebuild and the reported change with the actual one.
+    """
+    rng = random.Random(seed)
+    graph = OntoMaintGraph("owlrl")
+    with redirect_stdout(StringIO()):
+        graph.load_ontologies_and_data(plant_dir, workers=1)
+    data = {t for t in graph.asserted if not is_schema_triple(t)}
+    pool = set(_sample(data, int(len(data) * held_out), rng))
+    graph.asserted.difference_update(pool)
+    for t in pool:
+        graph.graph.remove(t)
+    with redirect_stdout(StringIO()):
+        graph.apply_reasoning()
+
+    result = {"asserted": len(graph.asserted), "triples": len(graph.graph), "rounds": [], "failures": []}
+    for number in range(rounds):
+        added = _sample(pool, delta, rng)
+        removed = _sample(data - pool, delta, rng)
+        before = set(graph.graph)
+        started = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            change = graph.apply_delta(added=added, removed=removed)
+        delta_seconds = time.perf_counter() - started
+        pool.difference_update(added)
+        pool.update(removed)
+
+        started = time.perf_counter()
+        expected = full_closure(graph.asserted)
+        rebuild_seconds = time.perf_counter() - started
+        closure = set(graph.graph)
+        missing, extra = expected - closure, closure - expected
+        if change is None:
+            reported = "full re-run"
+        else:
+            reported = change == (closure - before, before - closure)
+        result["rounds"].append({"delta_seconds": round(delta_seconds, 4), "rebuild_seconds": round(rebuild_seconds, 4),
+                                 "missing": len(missing), "extra": len(extra), "change_reported": reported})
+        if missing or extra or reported is not True:
+            result["failures"].append({
+                "round": number, "missing": len(missing), "extra": len(extra), "change_reported": reported,
+                "examples": [" ".join(term.n3() for term in t) for t in sorted(missing | extra)[:5]],
+            })
+    return result
+
+
+@click.command()
+@click.option("--scales", default="0,50", show_default=True,
+              help="Comma-separated plant sizes, in machines; 0 is the repository's own data.")
+@click.option("--rounds", type=click.IntRange(min=1), default=10, show_default=True, help="Deltas per plant.")
+@click.option("--delta", type=click.IntRange(min=1), default=20, show_default=True,
+              help="Triples added and triples removed per delta.")
+@click.option("--held-out", type=click.FloatRange(0, 1), default=0.2, show_default=True,
+              help="Share of instance triples left out of the first closure, to add back in deltas.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/incremental-<timestamp>.json).")
+def main(scales, rounds, delta, held_out, seed, output):
+    """
+    Apply random add/remove deltas with incremental reasoning and check each
+    resulting closure against a full DeductiveClosure rebuild.
+    """
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "rounds": rounds, "delta": delta,
+               "results": []}
+    failed = False
+    click.echo(f"{'Machines':>8} {'Asserted':>9} {'Triples':>9} {'Rounds':>6} {'Delta ms':>9} {'Rebuild s':>10}  Closures")
+    click.echo("-" * 72)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-incremental-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            plant_dir = BASE_DIR
+            if machines:
+                plant_dir = Path(tmp) / f"plant-{machines}"
+                write_plant(plant_dir, machines, seed)
+            run = check_plant(plant_dir, rounds, delta, held_out, seed)
+            failed = failed or bool(run["failures"])
+            delta_ms = statistics.median(r["delta_seconds"] for r in run["rounds"]) * 1e3
+            rebuild = statistics.median(r["rebuild_seconds"] for r in run["rounds"])
+            verdict = (f"DIFFERENT in {len(run['failures'])} round(s)" if run["failures"]
+                       else f"identical ({rounds} rounds)")
+            click.echo(f"{machines:>8} {run['asserted']:>9,} {run['triples']:>9,} {rounds:>6} {delta_ms:>9.1f} "
+                       f"{rebuild:>9.2f}s  {verdict}")
+            for failure in run["failures"]:
+                click.echo(f"  round {failure['round']}: {failure['missing']} missing, {failure['extra']} extra, "
+                           f"change reported: {failure['change_reported']}; " + "; ".join(failure["examples"]))
+            results["results"].append({"machines": machines, **run})
+
+    output = output or RESULTS_DIR / f"incremental-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
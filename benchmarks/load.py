@@ -0,0 +1,115 @@
+import gzip
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import click
+from rdflib import Graph
+
+from benchmarks.plant import write_plant
+from benchmarks.run import RESULTS_DIR, peak_rss_mb
+from bulk_load import load_files, throughput
+
+
+# (label, file suffix, parallel): parallel variants use the --workers pool
+VARIANTS = [
+    ("turtle, serial", ".ttl", False),
+    ("turtle, process pool", ".ttl", True),
+    ("n-triples, streamed", ".nt", False),
+    ("n-triples, process pool", ".nt", True),
+    ("n-triples.gz, streamed", ".nt.gz", False),
+]
+
+
+def split_plant(plant_ttl: Path, directory: Path, files: int) -> dict:
+    """
+    Split a generated plant into `files` parts by subject, each written as
+    Turtle, N-Triples and gzipped N-Triples. Returns {suffix: [paths]}.
+    """
+    g = Graph()
+    g.parse(plant_ttl, format="turtle")
+    parts = [Graph() for _ in range(files)]
+    for s, p, o in g:
+        parts[zlib.crc32(str(s).encode()) % files].add((s, p, o))
+
+    written = {".ttl": [], ".nt": [], ".nt.gz": []}
+    for i, part in enumerate(parts):
+        part.bind("onto", "http://example.org/ontomaint#")
+        ttl, nt = directory / f"part-{i:04d}.ttl", directory / f"part-{i:04d}.nt"
+        part.serialize(ttl, format="turtle")
+        part.serialize(nt, format="nt", encoding="utf-8")
+        with nt.open("rb") as src, gzip.open(directory / f"part-{i:04d}.nt.gz", "wb") as dst:
+            dst.write(src.read())
+        written[".ttl"].append(ttl)
+        written[".nt"].append(nt)
+        written[".nt.gz"].append(directory / f"part-{i:04d}.nt.gz")
+    return written
+
+
+def _child(conn, fn, *args):
+    conn.send(fn(*args))
+
+
+def in_child(fn, *args):
+    """
+    fn(*args) in a fresh forked process, so every variant starts from the same
+    (small) parent and its peak memory is its own.
+    """
+    ctx = mp.get_context("fork")
+    receiver, sender = ctx.Pipe(duplex=False)
+    worker = ctx.Process(target=_child, args=(sender, fn, *args))
+    worker.start()
+    sender.close()
+    result = receiver.recv()
+    worker.join()
+    return result
+
+
+def time_load(files: list[Path], workers: int) -> dict:
+    stats = load_files(Graph(), files, workers)
+    stats["peak_rss_mb"] = peak_rss_mb()
+    return stats
+
+
+@click.command()
+@click.option("--machines", type=click.IntRange(min=1), default=2000, show_default=True)
+@click.option("--files", type=click.IntRange(min=1), default=40, show_default=True,
+              help="Number of files the plant is split into.")
+@click.option("--workers", type=click.IntRange(min=2), default=max(2, os.cpu_count() or 1), show_default=True,
+              help="Pool size of the process-pool variants.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/load-<timestamp>.json).")
+def main(machines, files, workers, seed, output):
+    """Compare load throughput of serial Turtle, pooled parsing and streamed N-Triples."""
+    with tempfile.TemporaryDirectory(prefix="ontomaint-load-") as tmp:
+        tmp = Path(tmp)
+        plant = write_plant(tmp / "plant", machines, seed)
+        parts = in_child(split_plant, plant, tmp, files)
+
+        results = {"created": datetime.now().isoformat(timespec="seconds"), "cpus": os.cpu_count(),
+                   "machines": machines, "files": files, "variants": []}
+        click.echo(f"{'Variant':<26} {'Triples':>10} {'Seconds':>9} {'Triples/s':>11} {'vs serial':>10} {'Peak MB':>9}")
+        click.echo("-" * 80)
+        baseline = None
+        for label, suffix, parallel in VARIANTS:
+            pool = workers if parallel else 1
+            stats = in_child(time_load, parts[suffix], pool)
+            rate = throughput(stats)
+            baseline = baseline or rate
+            results["variants"].append({"variant": label, "workers": pool, **stats, "triples_per_second": rate})
+            click.echo(f"{label:<26} {stats['triples']:>10,} {stats['seconds']:>9.2f} {rate:>11,.0f} "
+                       f"{rate / baseline:>9.2f}x {stats['peak_rss_mb']:>9.1f}")
+
+    output = output or RESULTS_DIR / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import csv
+import random
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import click
+
+from timeseries import READINGS_COLUMNS
+
+
+PREFIXES = """@prefix onto: <http://example.org/ontomaint#> .
+@prefix sosa: <http://www.w3.org/ns/sosa/> .
+@prefix xsd:  <http://www.w3.org/2001/XMLSchema#> .
+"""
+
+# One production line is one machine per stage, chained by nextJob like the sample bottling line.
+# stage: (machine prefix, job, components, sensor, metrics, failure modes)
+# metric: (name, unit, typical value); failure mode: (name, corrective action)
+STAGES = [
+    ("Mixer", "JobMixing", ["Blade", "Motor", "Seal"], "TempSensor",
+     [("Temperature", "Celsius", 85.0), ("RPM", "RPM", 450.0)],
+     [("Overheating", "CoolantCheck"), ("SealLeak", "ReplaceMixerSeal")]),
+    ("Filler", "JobFilling", ["Nozzle", "Pump", "Valve"], "VibrationSensor",
+     [("Hydraulic Pressure", "PSI", 125.0), ("Flow Rate", "L/min", 18.0)],
+     [("Overload", "LoadBalancing"), ("ValveFailure", "ReplaceFillerValves")]),
+    ("Capper", "JobCapping", ["Jaws", "Spindle"], "TorqueSensor",
+     [("Cap Torque", "N·m", 22.5)],
+     [("CapperJam", "ClearJam"), ("WornGrippers", "ReplaceGrippers")]),
+    ("Labeler", "JobLabeling", ["Roll", "Printer", "Sensor"], "PositionSensor",
+     [("Label Alignment Accuracy", "Percent", 98.9), ("Labeling Speed", "units/min", 350.0)],
+     [("LabelMisalignment", "LabelCalibration"), ("PrintQualityFail", "ReplacePrintHead")]),
+    ("Packer", "JobPacking", ["Arm", "Gripper", "Conveyor"], "VisionSystem",
+     [("Packing Speed", "units/min", 240.0), ("Pack Position Accuracy", "Percent", 99.5)],
+     [("ConveyorSlip", "ReplaceConveyorBelt"), ("LowHydraulicPressure", "ReplaceHydraulicFilter")]),
+]
+
+# corrective action: (spare part, part number, lead time days, cost USD, duration hours)
+ACTIONS = {
+    "CoolantCheck": ("CoolantFluid", "COOL-500ML", 1, 45.50, 2.0),
+    "ReplaceMixerSeal": ("MixerSealKit", "MX-SEAL-2025", 5, 150.00, 4.0),
+    "LoadBalancing": ("FillerGasket", "FILLER-GSK-2", 3, 125.00, 3.5),
+    "ReplaceFillerValves": ("FillerValveSet", "FIL-VLV-SET", 30, 1200.00, 8.0),
+    "ClearJam": ("StarWheel", "CAP-STAR-WHL", 15, 350.00, 1.0),
+    "ReplaceGrippers": ("CapperGripperPad", "CP-GRIP-50", 14, 25.00, 1.0),
+    "LabelCalibration": ("LabelSensor", "LBL-SENS-OPT", 10, 180.00, 1.5),
+    "ReplacePrintHead": ("LabelerPrintHead", "LBL-PH-300DPI", 21, 450.00, 0.5),
+    "ReplaceConveyorBelt": ("ConveyorBeltAssembly", "PKR-BELT-500MM", 7, 850.00, 4.0),
+    "ReplaceHydraulicFilter": ("HydraulicFilter", "HYD-FILT-X10", 2, 85.00, 1.5),
+}
+
+SPECIALTIES = ["Mixing Systems", "Hydraulic Systems", "Mechanical Assemblies", "Precision Equipment", "Conveyor Systems"]
+TASKS = ["Quarterly bearing inspection and lubrication", "Bi-monthly pump seal replacement",
+         "Monthly spindle alignment check", "Quarterly label path calibration",
+         "Semi-annual gripper pad replacement"]
+
+MACHINES_PER_TEAM = 10
+REFERENCE_TIME = datetime(2025, 12, 12, 8, 0)
+
+
+def _time(t: datetime) -> str:
+    return f'"{t.isoformat(timespec="seconds")}"^^xsd:dateTime'
+
+
+def plant_names(machines: int) -> list[tuple]:
+    """
+    (line, stage) of every machine in a plant of the given size: full lines of
+    len(STAGES) machines, the last one possibly cut short.
+    """
+    return [divmod(i, len(STAGES)) for i in range(machines)]
+
+
+def machine_name(line: int, stage: int) -> str:
+    return f"{STAGES[stage][0]}_L{line:05d}"
+
+
+def failure_name(line: int, stage: int, mode: int) -> str:
+    return f"{STAGES[stage][5][mode][0]}_L{line:05d}"
+
+
+def generate_plant(machines: int, seed: int = 0, cross_line: float = 0.05, first_line: int = 0, first_team: int = 0,
+                   readings: list = None):
+    """
+    Turtle for a synthetic plant with the given number of machines, as text
+    chunks (one per resource), following ontologies/base.ttl and the shape of
+    data/machines.ttl. One reading of each performance metric is appended to
+    readings (if given) as a row of READINGS_COLUMNS rather than put in the
+    graph. Each line chains its jobs with nextJob; the first failure mode of a
+    stage propagates to the next stage's, and with probability cross_line also to a random failure on another line. The same seed always
+    gives the same plant. Lines and teams are numbered from first_line and
+    first_team, so that several plants can be loaded together.
+    """
+    rng = random.Random(seed)
+    layout = [(line + first_line, stage) for line, stage in plant_names(machines)]
+    lines = {}
+    for line, stage in layout:
+        lines.setdefault(line, []).append(stage)
+
+    yield PREFIXES
+
+    for action, (part, number, lead, cost, hours) in ACTIONS.items():
+        yield (f"\nonto:{action} a onto:CorrectiveAction ;\n"
+               f"  onto:requiresSparePart onto:{part} ;\n"
+               f"  onto:estimatedDurationHours {hours} .\n"
+               f"onto:{part} a onto:SparePart ;\n"
+               f'  onto:partNumber "{number}" ;\n'
+               f"  onto:leadTimeDays {lead} ;\n"
+               f"  onto:costUSD {cost:.2f} .\n")
+
+    for team in range(first_team, first_team + (machines + MACHINES_PER_TEAM - 1) // MACHINES_PER_TEAM):
+        yield f"\nonto:MaintenanceTeam_{team:05d} a onto:Team .\n"
+
+    for i, (line, stage) in enumerate(layout):
+        prefix, job, components, sensor, metrics, modes = STAGES[stage]
+        name = machine_name(line, stage)
+        suffix = f"L{line:05d}"
+        team = f"MaintenanceTeam_{first_team + i // MACHINES_PER_TEAM:05d}"
+        age = round(rng.uniform(1.0, 12.0), 1)
+        last_maintenance = REFERENCE_TIME - timedelta(days=rng.randint(1, 120), minutes=rng.randint(0, 1439))
+
+        parts = [
+            f"\nonto:{name} a onto:Machine ;",
+            f"  onto:hasCapacity {rng.choice([250.0, 300.0, 350.0, 400.0, 500.0])} ;",
+            f'  onto:manufacturingYear "{2025 - int(age)}"^^xsd:gYear ;',
+            f"  onto:hasAgeYears {age} ;",
+            f"  onto:lastMaintenanceDate {_time(last_maintenance)} ;",
+            f"  onto:maintenanceIntervalDays {rng.choice([30, 45, 60, 90, 120])} ;",
+            f"  onto:failureRate {round(rng.uniform(0.005, 0.05), 3)} ;",
+            f"  onto:uptime {round(rng.uniform(95.0, 99.9), 1)} ;",
+            f"  onto:operatedBy onto:Operator_{name} ;",
+            f"  onto:maintainedBy onto:{team} ;",
+            f"  onto:monitoredBy onto:{sensor}_{suffix} ;",
+        ]
+        parts += [f"  onto:hasComponent onto:{prefix}{c}_{suffix} ;" for c in components]
+        parts.append(f"  onto:requiresMaintenance onto:MaintenanceTask_{name}_1 ;")
+        parts += [f"  onto:hasPerformanceMetric onto:Metric_{name}_{m} ;" for m in range(len(metrics))]
+        parts.append(f"  onto:processesBatch onto:Batch_{name} .")
+
+        parts += [f"onto:{prefix}{c}_{suffix} a onto:Component ." for c in components]
+        parts.append(f"onto:{sensor}_{suffix} a sosa:Sensor .")
+        parts += [
+            f"onto:Operator_{name} a onto:Operator ;",
+            f"  onto:hasExperienceLevel {rng.randint(1, 5)} ;",
+            f'  onto:hasSpecialty "{SPECIALTIES[stage]}" ;',
+            f"  onto:belongsToTeam onto:{team} .",
+            f"onto:MaintenanceTask_{name}_1 a onto:MaintenanceTask ;",
+            f'  onto:maintenanceDescription "{TASKS[stage]}" ;',
+            f"  onto:dueDate {_time(REFERENCE_TIME + timedelta(days=rng.randint(-30, 180)))} ;",
+            f"  onto:estimatedDurationHours {rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5])} .",
+        ]
+
+        measured = REFERENCE_TIME + timedelta(hours=2, minutes=rng.randint(0, 59))
+        for m, (metric, unit, typical) in enumerate(metrics):
+            parts += [
+                f"onto:Metric_{name}_{m} a onto:PerformanceMetric ;",
+                f'  onto:metricName "{metric}" ;',
+                f'  onto:metricUnit "{unit}" .',
+            ]
+            value = round(typical * rng.uniform(0.9, 1.1), 1)
+            if readings is not None:
+                readings.append((measured.isoformat(timespec="seconds"), name, f"{sensor}_{suffix}",
+                                 metric, value, unit))
+
+        parts += [
+            f"onto:Batch_{name} a onto:ProductionBatch ;",
+            f"  onto:batchSize {rng.randrange(1000, 15000, 500)} ;",
+            f"  onto:batchDate {_time(REFERENCE_TIME + timedelta(hours=rng.randint(0, 72)))} .",
+        ]
+
+        for mode, (failure, action) in enumerate(modes):
+            parts += [
+                f"onto:{failure}_{suffix} a onto:ErrorContext ;",
+                f"  onto:affectsMachine onto:{name} ;",
+                f"  onto:blocksJob onto:{job}_{suffix} ;",
+                f"  onto:requiresAction onto:{action} ;",
+                f"  onto:hasSeverity {rng.randint(1, 5)} ;",
+                f"  onto:hasDowntimeMinutes {rng.choice([10, 15, 30, 45, 60, 90, 240, 480])} .",
+            ]
+
+        if stage == 0:
+            stages = lines[line]
+            parts += [f"onto:{STAGES[s][1]}_{suffix} a onto:Job ." for s in stages]
+            parts += [f"onto:{STAGES[a][1]}_{suffix} onto:nextJob onto:{STAGES[b][1]}_{suffix} ."
+                      for a, b in zip(stages, stages[1:])]
+
+        if stage + 1 < len(lines[line]):
+            parts += [
+                f"onto:Propagation_{name} a onto:FailurePropagation ;",
+                f"  onto:hasCause onto:{failure_name(line, stage, 0)} ;",
+                f"  onto:propagatesTo onto:{failure_name(line, stage + 1, 0)} .",
+            ]
+        if len(lines) > 1 and rng.random() < cross_line:
+            other, other_stage = layout[rng.randrange(len(layout))]
+            if other != line:
+                parts += [
+                    f"onto:CrossPropagation_{name} a onto:FailurePropagation ;",
+                    f"  onto:hasCause onto:{failure_name(line, stage, 1)} ;",
+                    f"  onto:propagatesTo onto:{failure_name(other, other_stage, rng.randrange(2))} .",
+                ]
+
+        yield "\n".join(parts) + "\n"
+
+
+def _write_ontologies(directory: Path, ontologies_dir: Path = None):
+    ontologies_dir = ontologies_dir or Path(__file__).resolve().parent.parent / "ontologies"
+    (directory / "ontologies").mkdir(parents=True, exist_ok=True)
+    for ttl in ontologies_dir.glob("*.ttl"):
+        shutil.copy(ttl, directory / "ontologies" / ttl.name)
+
+
+def _write_readings(path: Path, readings: list):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(READINGS_COLUMNS)
+        writer.writerows(readings)
+
+
+def write_plant(directory: Path, machines: int, seed: int = 0, ontologies_dir: Path = None) -> Path:
+    """
+    Write a plant laid out like the repository (ontologies/*.ttl,
+    data/plant.ttl and its readings in data/readings/plant.csv) so
+    OntoMaintGraph.load_ontologies_and_data can load it.
+    """
+    _write_ontologies(directory, ontologies_dir)
+    (directory / "data").mkdir(parents=True, exist_ok=True)
+    path = directory / "data" / "plant.ttl"
+    readings = []
+    with path.open("w", encoding="utf-8") as f:
+        f.writelines(generate_plant(machines, seed, readings=readings))
+    _write_readings(directory / "data" / "readings" / "plant.csv", readings)
+    return path
+
+
+def write_plants(directory: Path, plants: int, machines: int, seed: int = 0, ontologies_dir: Path = None) -> list[Path]:
+    """
+    Write several plants of the given number of machines each, as
+    data/plant-<n>/plant.ttl (readings in data/readings/plant-<n>.csv): one
+    shard per plant for ShardedGraph. Machine, line and team names do not
+    repeat across plants; corrective actions and spare parts are the same in
+    every plant.
+    """
+    _write_ontologies(directory, ontologies_dir)
+    lines = (machines + len(STAGES) - 1) // len(STAGES)
+    teams = (machines + MACHINES_PER_TEAM - 1) // MACHINES_PER_TEAM
+    paths = []
+    for plant in range(plants):
+        path = directory / "data" / f"plant-{plant:03d}" / "plant.ttl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        readings = []
+        with path.open("w", encoding="utf-8") as f:
+            f.writelines(generate_plant(machines, seed + plant, first_line=plant * lines, first_team=plant * teams,
+                                        readings=readings))
+        _write_readings(directory / "data" / "readings" / f"plant-{plant:03d}.csv", readings)
+        paths.append(path)
+    return paths
+
+
+@click.command()
+@click.argument("directory", type=click.Path(file_okay=False, path_type=Path))
+@click.option("--machines", type=click.IntRange(min=1), default=1000, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--plants", type=click.IntRange(min=1), default=None,
+              help="Write this many plants of MACHINES machines each, one data/ subdirectory (shard) per plant")
+def main(directory, machines, seed, plants):
+    """Write a synthetic plant with MACHINES machines to DIRECTORY."""
+    if plants is None:
+        path = write_plant(directory, machines, seed)
+        click.echo(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB, {machines} machines).")
+        return
+    paths = write_plants(directory, plants, machines, seed)
+    size = sum(path.stat().st_size for path in paths)
+    click.echo(f"Wrote {plants} plants to {directory / 'data'} ({size / 1e6:.1f} MB, {plants * machines} machines).")
+
+
+if __name__ == "__main__":
+    main()
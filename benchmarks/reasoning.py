@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from benchmarks.load import in_child
+from benchmarks.plant import write_plant
+from benchmarks.run import BASE_DIR, QUERIES_DIR, QUERY_BINDINGS, RESULTS_DIR, peak_rss_mb
+from graph_manager import REASONING_MODES, OntoMaintGraph
+from query_registry import QueryRegistry
+
+
+# The repository's own data (scale 0) has no generated names; bind the sample ones.
+SAMPLE_BINDINGS = {
+    "actions_for_failure.sparql": {"failure": "OverheatingA"},
+    "impact_failure.sparql": {"failure": "OverheatingA"},
+    "whatif_machine_failure.sparql": {"machine": "MixerA"},
+}
+
+
+def _digest(rows) -> str:
+    """
+    Order-independent hash of a query result, so results of large plants need not leave the child.
+    """
+    keys = sorted("\t".join("" if term is None else term.n3() for term in row) for row in rows)
+    return hashlib.sha256("\n".join(keys).encode()).hexdigest()
+
+
+def reason_and_query(plant_dir: Path, mode: str, queries: list[str], bindings: dict) -> dict:
+    """
+    Load and reason one plant in the given mode and run every query on it (in a child process).
+    """
+    sys.stdout = open(os.devnull, "w")
+    graph = OntoMaintGraph(mode)
+    registry = QueryRegistry(QUERIES_DIR)
+    graph.load_ontologies_and_data(plant_dir, workers=1)
+    asserted = len(graph.graph)
+
+    started = time.perf_counter()
+    graph.apply_reasoning()
+    result = {"mode": mode, "asserted": asserted, "triples": len(graph.graph),
+              "reasoning_seconds": round(time.perf_counter() - started, 4), "queries": {}}
+
+    started = time.perf_counter()
+    for name in queries:
+        rows = list(registry.execute(graph.graph, name, bindings.get(name)))
+        result["queries"][name] = {"rows": len(rows), "digest": _digest(rows)}
+    result["query_seconds"] = round(time.perf_counter() - started, 4)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def lazy_and_query(plant_dir: Path, queries: list[str], bindings: dict) -> dict:
+    """
+    Lazy reasoning as the CLI does it without a snapshot: every query runs on its own copy
+    of the asserted graph, with only what that query can observe materialized.
+    """
+    sys.stdout = open(os.devnull, "w")
+    asserted = OntoMaintGraph()
+    registry = QueryRegistry(QUERIES_DIR)
+    asserted.load_ontologies_and_data(plant_dir, workers=1)
+    result = {"mode": "lazy", "asserted": len(asserted.graph), "triples": 0,
+              "reasoning_seconds": 0.0, "query_seconds": 0.0, "queries": {}}
+
+    for name in queries:
+        graph = OntoMaintGraph()
+        graph.asserted.update(asserted.asserted)
+        graph.graph.addN((s, p, o, graph.graph) for s, p, o in asserted.asserted)
+
+        started = time.perf_counter()
+        graph.reason_for_queries([registry.prepared(name).algebra])
+        result["reasoning_seconds"] += time.perf_counter() - started
+        result["triples"] = max(result["triples"], len(graph.graph))
+
+        started = time.perf_counter()
+        rows = list(registry.execute(graph.graph, name, bindings.get(name)))
+        result["query_seconds"] += time.perf_counter() - started
+        result["queries"][name] = {"rows": len(rows), "digest": _digest(rows)}
+    result["reasoning_seconds"] = round(result["reasoning_seconds"], 4)
+    result["query_seconds"] = round(result["query_seconds"], 4)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def check_scale(plant_dir: Path, queries: list[str], bindings: dict) -> tuple[list[dict], list[str]]:
+    """
+    (one result per reasoning mode plus lazy per-query reasoning, names of the queries
+    whose results differ from full OWL RL).
+    """
+    runs = [in_child(reason_and_query, plant_dir, mode, queries, bindings) for mode in REASONING_MODES]
+    runs.append(in_child(lazy_and_query, plant_dir, queries, bindings))
+    full = runs[0]["queries"]
+    differing = sorted({name for run in runs[1:] for name in queries if run["queries"][name] != full[name]})
+    return runs, differing
+
+
+@click.command()
+@click.option("--scales", default="0,100", show_default=True,
+              help="Comma-separated plant sizes, in machines; 0 is the repository's own data.")
+@click.option("--query", "queries", multiple=True, help="Only check this named query (repeatable).")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/reasoning-<timestamp>.json).")
+def main(scales, queries, seed, output):
+    """Check that targeted and lazy reasoning answer every named query like full OWL RL, and compare cost."""
+    registry = QueryRegistry(QUERIES_DIR)
+    names = list(queries) or registry.names(internal=True)
+    for name in names:
+        try:
+            registry.text(name)
+        except KeyError:
+            raise click.BadParameter(f"no such query: {name}", param_hint="--query")
+
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "results": []}
+    failed = False
+    click.echo(f"{'Machines':>8}  {'Mode':<9} {'Triples':>10} {'Reasoning':>10} {'Queries':>9} {'Peak MB':>9}  Results")
+    click.echo("-" * 78)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-reasoning-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            if machines == 0:
+                plant_dir, bindings = BASE_DIR, SAMPLE_BINDINGS
+            else:
+                plant_dir = Path(tmp) / f"plant-{machines}"
+                write_plant(plant_dir, machines, seed)
+                bindings = {name: binding() for name, binding in QUERY_BINDINGS.items()}
+
+            runs, differing = check_scale(plant_dir, names, bindings)
+            failed = failed or bool(differing)
+            for run in runs:
+                verdict = "reference" if run is runs[0] else (
+                    "DIFFERENT: " + ", ".join(differing) if differing else f"identical ({len(names)} queries)")
+                click.echo(f"{machines:>8}  {run['mode']:<9} {run['triples']:>10,} {run['reasoning_seconds']:>9.2f}s "
+                           f"{run['query_seconds']:>8.2f}s {run['peak_rss_mb']:>9.1f}  {verdict}")
+            results["results"].append({"machines": machines, "runs": runs, "differing": differing})
+
+    output = output or RESULTS_DIR / f"reasoning-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import click
+import numpy as np
+
+from benchmarks.plant import REFERENCE_TIME
+from benchmarks.run import RESULTS_DIR, peak_rss_mb
+from risk import RISK_WEIGHTS, MachineRisk, top_k
+
+# Modes per machine, as the stages of benchmarks.plant have.
+FAILURE_MODES = (1, 3)
+
+
+def risk_rows(machines: int, seed: int = 0) -> tuple[list, list]:
+    """
+    (machine_health.sparql rows, critical_failures.sparql rows) distributed
+    like the machines and failures of benchmarks.plant.
+    """
+    rng = random.Random(seed)
+    health, failures = [], []
+    for machine in range(machines):
+        name = f"Machine_{machine:07d}"
+        health.append((name, round(rng.uniform(95.0, 99.9), 1), round(rng.uniform(0.005, 0.05), 3),
+                       round(rng.uniform(1.0, 12.0), 1),
+                       REFERENCE_TIME - timedelta(days=rng.randint(1, 120), minutes=rng.randint(0, 1439)),
+                       rng.choice([30, 45, 60, 90, 120])))
+        for mode in range(rng.randint(*FAILURE_MODES)):
+            failures.append((f"Failure_{machine:07d}_{mode}", name, rng.randint(1, 5),
+                             rng.choice([10, 15, 30, 45, 60, 90, 240, 480])))
+    return health, failures
+
+
+def reference_ranking(health: list, failures: list, as_of: datetime, weights: dict, top: int) -> list[tuple]:
+    """
+    (machine, risk) of the top machines, computed row by row in plain Python.
+    """
+    worst = {}
+    for _, machine, severity, downtime in failures:
+        s, d = worst.get(machine, (-math.inf, -math.inf))
+        worst[machine] = (max(s, severity), max(d, downtime))
+    scored = []
+    for position, (machine, _, rate, age, last, interval) in enumerate(health):
+        overdue = max((as_of - last).total_seconds() / 86400 - interval, 0.0)
+        severity, downtime = worst.get(machine, (0.0, 0.0))
+        factors = {"failure_rate": rate, "age": 1 + age, "overdue": 1 + overdue / interval,
+                   "severity": 1 + severity, "downtime": 1 + downtime / 60}
+        risk = math.prod(factor ** weights[name] for name, factor in factors.items() if weights[name])
+        scored.append((-risk, position, machine))
+    return [(machine, -risk) for risk, _, machine in sorted(scored)[:top]]
+
+
+def _median_ms(fn, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return round(statistics.median(runs) * 1e3, 3)
+
+
+@click.command()
+@click.option("--machines", "sizes", default="1000,100000,1000000", show_default=True,
+              help="Comma-separated numbers of machines.")
+@click.option("--top", type=click.IntRange(min=1), default=20, show_default=True)
+@click.option("--repeat", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/risk-<timestamp>.json).")
+def main(sizes, top, repeat, seed, output):
+    """
+    Time the machine risk engine on generated machines: building its arrays,
+    rescoring with new weights and the top-K ranking (argpartition / full
+    sort), and check the ranking against a plain Python one.
+    """
+    as_of = REFERENCE_TIME + timedelta(days=30)
+    weights = {**RISK_WEIGHTS, "overdue": 2.0, "downtime": 0.5}
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "top": top, "weights": weights, "results": []}
+    failed = False
+    click.echo(f"{'Machines':>9} {'Failures':>9} {'Build':>8} {'Score ms':>9} {'Top-K ms':>9} {'Sort ms':>9} "
+               f"{'Rerank ms':>10} {'Python':>8} {'Peak MB':>8}  Ranking")
+    click.echo("-" * 100)
+    for machines in [int(s) for s in sizes.split(",") if s.strip()]:
+        health, failures = risk_rows(machines, seed)
+        started = time.perf_counter()
+        risk = MachineRisk.from_rows(health, failures)
+        build_seconds = time.perf_counter() - started
+
+        overdue = risk.overdue_days(as_of)
+        scores = risk.scores(as_of, weights, overdue)
+        run = {
+            "failures": len(failures),
+            "build_seconds": round(build_seconds, 3),
+            "score_ms": _median_ms(lambda: risk.scores(as_of, weights, overdue), repeat),
+            "top_k_ms": _median_ms(lambda: top_k(scores, top), repeat),
+            "full_sort_ms": _median_ms(lambda: np.argsort(-scores, kind="stable")[:top], repeat),
+            # what a dashboard rerun with new weights costs
+            "rerank_ms": _median_ms(lambda: risk.ranking(as_of, top, weights), repeat),
+        }
+        started = time.perf_counter()
+        expected = reference_ranking(health, failures, as_of, weights, top)
+        run["python_seconds"] = round(time.perf_counter() - started, 3)
+        ranking = [(machine, score) for machine, score, *_ in risk.ranking(as_of, top, weights)]
+        run["ranking_equal"] = [m for m, _ in ranking] == [m for m, _ in expected] and all(
+            math.isclose(a, b, rel_tol=1e-9) for (_, a), (_, b) in zip(ranking, expected))
+        run["peak_rss_mb"] = peak_rss_mb()
+        failed = failed or not run["ranking_equal"]
+
+        click.echo(f"{machines:>9,} {len(failures):>9,} {build_seconds:>7.2f}s {run['score_ms']:>9.2f} "
+                   f"{run['top_k_ms']:>9.2f} {run['full_sort_ms']:>9.2f} {run['rerank_ms']:>10.2f} "
+                   f"{run['python_seconds']:>7.2f}s {run['peak_rss_mb']:>8.0f}  "
+                   + ("equal" if run["ranking_equal"] else "DIFFERENT"))
+        results["results"].append({"machines": machines, **run})
+
+    output = output or RESULTS_DIR / f"risk-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
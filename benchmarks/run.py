@@ -0,0 +1,207 @@
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+import owlrl
+import rdflib
+
+from benchmarks.plant import STAGES, failure_name, machine_name, write_plant
+from graph_manager import OntoMaintGraph
+from query_registry import QueryRegistry
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+QUERIES_DIR = BASE_DIR / "queries"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_SCALES = "10,1000,100000"
+# Stages this much slower than the baseline (in seconds) or less are never flagged: timer noise.
+MIN_REGRESSION_SECONDS = 0.05
+
+# Parameterized queries are timed the way the CLI runs them, bound to one machine/failure.
+QUERY_BINDINGS = {
+    "actions_for_failure.sparql": lambda: {"failure": failure_name(0, 0, 0)},
+    "impact_failure.sparql": lambda: {"failure": failure_name(0, 0, 0)},
+    "whatif_machine_failure.sparql": lambda: {"machine": machine_name(0, 0)},
+}
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _timed(fn, repeat: int = 1):
+    """
+    (result of the last call, wall time of every call in seconds).
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(round(time.perf_counter() - start, 4))
+    return result, runs
+
+
+def _bench_plant(plant_dir: Path, queries: list[str], repeat: int, reasoning: bool, conn):
+    """
+    Runs in a fresh forked process per scale, so peak memory belongs to that scale only.
+    Sends one record per stage as soon as it is done; a timeout keeps the finished ones.
+    """
+    sys.stdout = open(os.devnull, "w")  # OntoMaintGraph reports progress with print
+    graph = OntoMaintGraph()
+    registry = QueryRegistry(QUERIES_DIR)
+
+    _, runs = _timed(lambda: graph.load_ontologies_and_data(plant_dir))
+    conn.send({"stage": "parse", "seconds": runs[0], "triples": len(graph.graph), "peak_rss_mb": peak_rss_mb()})
+
+    if reasoning:
+        _, runs = _timed(graph.apply_reasoning)
+        conn.send({"stage": "reasoning", "seconds": runs[0], "triples": len(graph.graph), "peak_rss_mb": peak_rss_mb()})
+
+    for name in queries:
+        bindings = QUERY_BINDINGS[name]() if name in QUERY_BINDINGS else None
+        rows, runs = _timed(lambda: list(registry.execute(graph.graph, name, bindings)), repeat)
+        conn.send({"stage": name, "seconds": min(runs), "runs": runs, "rows": len(rows),
+                   "bindings": bindings, "peak_rss_mb": peak_rss_mb()})
+    conn.send(None)
+
+
+def bench_scale(machines: int, queries: list[str], repeat: int = 1, reasoning: bool = True,
+                seed: int = 0, timeout: float = None, keep_dir: Path = None) -> dict:
+    """
+    Generate a plant with the given number of machines and time parse,
+    reasoning and every query on it in a child process.
+    """
+    with tempfile.TemporaryDirectory(prefix="ontomaint-bench-") as tmp:
+        plant_dir = keep_dir / f"plant-{machines}" if keep_dir else Path(tmp)
+        path, runs = _timed(lambda: write_plant(plant_dir, machines, seed))
+        result = {
+            "machines": machines,
+            "lines": (machines + len(STAGES) - 1) // len(STAGES),
+            "seed": seed,
+            "file_mb": round(path.stat().st_size / 1e6, 2),
+            "generate_seconds": runs[0],
+            "status": "ok",
+            "stages": [],
+        }
+
+        ctx = mp.get_context("fork")
+        receiver, sender = ctx.Pipe(duplex=False)
+        worker = ctx.Process(target=_bench_plant, args=(plant_dir, queries, repeat, reasoning, sender))
+        worker.start()
+        sender.close()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not receiver.poll(remaining):
+                result["status"] = "timeout"
+                worker.kill()
+                break
+            try:
+                record = receiver.recv()
+            except EOFError:
+                worker.join()
+                result["status"] = f"failed (exit code {worker.exitcode})"
+                break
+            if record is None:
+                break
+            result["stages"].append(record)
+            click.echo(f"  {machines:>7} machines  {record['stage']:<36} {record['seconds']:>10.3f}s"
+                       f"  {record['peak_rss_mb']:>9.1f} MB")
+        worker.join()
+        return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[tuple]:
+    """
+    (machines, stage, baseline seconds, seconds, ratio, regressed) for every stage timed in
+    both runs; a stage regressed when it got slower by more than tolerance (relative)
+    and MIN_REGRESSION_SECONDS (absolute).
+    """
+    before = {(r["machines"], s["stage"]): s["seconds"] for r in baseline["results"] for s in r["stages"]}
+    rows = []
+    for r in results["results"]:
+        for s in r["stages"]:
+            old = before.get((r["machines"], s["stage"]))
+            if old is None:
+                continue
+            ratio = s["seconds"] / old if old > 0 else float("inf")
+            regressed = ratio > 1 + tolerance and s["seconds"] - old > MIN_REGRESSION_SECONDS
+            rows.append((r["machines"], s["stage"], old, s["seconds"], ratio, regressed))
+    return rows
+
+
+@click.command()
+@click.option("--scales", default=DEFAULT_SCALES, show_default=True,
+              help="Comma-separated plant sizes, in machines.")
+@click.option("--query", "queries", multiple=True, help="Only time this named query (repeatable).")
+@click.option("--repeat", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Runs per query; the best one is reported.")
+@click.option("--no-reasoning", is_flag=True, help="Query the asserted graph, skipping OWL RL.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--timeout", type=float, default=None, help="Give up on a scale after this many seconds.")
+@click.option("--keep-plants", type=click.Path(file_okay=False, path_type=Path), default=None,
+              help="Write the generated plants here instead of a temporary directory.")
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/bench-<timestamp>.json).")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False, path_type=Path), default=None,
+              help="Earlier results file to compare against; exits with status 1 on a regression.")
+@click.option("--tolerance", type=float, default=0.25, show_default=True,
+              help="Slowdown relative to the baseline tolerated before flagging a regression.")
+def main(scales, queries, repeat, no_reasoning, seed, timeout, keep_plants, output, baseline, tolerance):
+    """Time parsing, reasoning and every named query on synthetic plants of growing size."""
+    sizes = [int(s) for s in scales.split(",") if s.strip()]
+    registry = QueryRegistry(QUERIES_DIR)
+    names = list(queries) or registry.names(internal=True)
+    for name in names:
+        try:
+            registry.text(name)
+        except KeyError:
+            raise click.BadParameter(f"no such query: {name}", param_hint="--query")
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rdflib": rdflib.__version__,
+        "owlrl": owlrl.__version__,
+        "reasoning": not no_reasoning,
+        "repeat": repeat,
+        "results": [],
+    }
+    for machines in sizes:
+        click.echo(f"Benchmarking {machines} machines...")
+        results["results"].append(
+            bench_scale(machines, names, repeat, not no_reasoning, seed, timeout, keep_plants)
+        )
+
+    output = output or RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+
+    if baseline:
+        rows = compare(results, json.loads(baseline.read_text(encoding="utf-8")), tolerance)
+        click.echo(f"\n{'Machines':>8}  {'Stage':<36} {'Baseline':>10} {'Now':>10} {'Ratio':>7}")
+        click.echo("-" * 78)
+        for machines, stage, old, new, ratio, slower in rows:
+            flag = "  REGRESSION" if slower else ""
+            click.echo(f"{machines:>8}  {stage:<36} {old:>9.3f}s {new:>9.3f}s {ratio:>6.2f}x{flag}")
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from benchmarks.plant import write_plant
+from benchmarks.run import BASE_DIR, QUERIES_DIR, RESULTS_DIR
+from graph_manager import OntoMaintGraph
+from query_registry import QueryRegistry
+from sandbox import QueryAborted, QuerySandbox, evaluate
+
+# A cartesian product of the whole graph with itself, twice: never finishes.
+RUNAWAY = "SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o . ?a ?b ?c . ?d ?e ?f }"
+# The same product sorted, which holds every solution: runs out of memory first.
+GREEDY = "SELECT * WHERE { ?s ?p ?o . ?a ?b ?c . ?d ?e ?f } ORDER BY ?o ?c ?f"
+ALL_TRIPLES = "SELECT * WHERE { ?s ?p ?o }"
+AD_HOC = ["critical_failures.sparql", "machine_health.sparql", "spare_parts_impact.sparql"]
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    try:
+        result = fn(*args)
+    except QueryAborted as e:
+        result = e
+    return time.perf_counter() - started, result
+
+
+def check_sandbox(graph: OntoMaintGraph, registry: QueryRegistry, sandbox: QuerySandbox, repeat: int) -> dict:
+    """
+    Ad-hoc latency inline and in the sandbox, then whether the timeout, row
+    limit and memory ceiling stop queries and named queries still answer
+    while a runaway query runs.
+    """
+    result = {"triples": len(graph.graph), "queries": {}, "failures": []}
+    for name in AD_HOC:
+        text = registry.text(name)
+        inline = [_timed(evaluate, graph.graph, text, sandbox.max_rows) for _ in range(repeat)]
+        sandboxed = [_timed(sandbox.run, text) for _ in range(repeat)]
+        if inline[0][1] != sandboxed[0][1]:
+            result["failures"].append(f"{name}: sandboxed rows differ from inline ones")
+        result["queries"][name] = {"inline_seconds": round(statistics.median(s for s, _ in inline), 4),
+                                   "sandbox_seconds": round(statistics.median(s for s, _ in sandboxed), 4)}
+
+    # named queries on the serving process while a runaway query holds a worker
+    runaway = {}
+    thread = threading.Thread(target=lambda: runaway.update(zip(("seconds", "result"), _timed(sandbox.run, RUNAWAY))))
+    thread.start()
+    named = []
+    while thread.is_alive():
+        named.append(_timed(registry.execute, graph.graph, "critical_failures.sparql", None)[0])
+    thread.join()
+    result["runaway_seconds"] = round(runaway["seconds"], 3)
+    result["named_during_runaway_seconds"] = round(statistics.median(named), 4) if named else None
+    if not isinstance(runaway["result"], QueryAborted) or runaway["seconds"] > sandbox.timeout + 1:
+        result["failures"].append(f"runaway query not stopped at the timeout: {runaway['result']}")
+
+    seconds, (_, rows, truncated) = _timed(sandbox.run, ALL_TRIPLES, None, 1000)
+    result["row_limit_seconds"] = round(seconds, 4)
+    if len(rows) != 1000 or not truncated:
+        result["failures"].append(f"row limit: {len(rows)} rows, truncated={truncated}")
+
+    seconds, greedy = _timed(sandbox.run, GREEDY, 600)
+    result["memory_limit_seconds"] = round(seconds, 3)
+    if not isinstance(greedy, QueryAborted) or "memory" not in str(greedy):
+        result["failures"].append(f"memory ceiling: {greedy!r}")
+    return result
+
+
+@click.command()
+@click.option("--scales", default="0,200", show_default=True,
+              help="Comma-separated plant sizes, in machines; 0 is the repository's own data.")
+@click.option("--timeout", type=float, default=3.0, show_default=True, help="Sandbox query timeout, in seconds.")
+@click.option("--max-memory-mb", type=int, default=256, show_default=True, help="Sandbox memory ceiling per query.")
+@click.option("--repeat", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/sandbox-<timestamp>.json).")
+def main(scales, timeout, max_memory_mb, repeat, seed, output):
+    """Time ad-hoc queries in the sandbox against inline, and check its timeout, row limit and memory ceiling."""
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "timeout": timeout,
+               "max_memory_mb": max_memory_mb, "results": []}
+    failed = False
+    registry = QueryRegistry(QUERIES_DIR)
+    click.echo(f"{'Machines':>8} {'Triples':>9} {'Inline':>8} {'Sandbox':>8} {'Runaway':>8} {'Named':>8} "
+               f"{'Rows':>8} {'Memory':>8}  Limits")
+    click.echo("-" * 90)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-sandbox-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            plant_dir = BASE_DIR
+            if machines:
+                plant_dir = Path(tmp) / f"plant-{machines}"
+                write_plant(plant_dir, machines, seed)
+            graph = OntoMaintGraph()
+            graph.load_reasoned(plant_dir, use_snapshot=False)
+            sandbox = QuerySandbox.of_graph(graph, timeout=timeout, max_memory_mb=max_memory_mb)
+            try:
+                run = check_sandbox(graph, registry, sandbox, repeat)
+            finally:
+                sandbox.close()
+
+            failed = failed or bool(run["failures"])
+            inline = sum(q["inline_seconds"] for q in run["queries"].values())
+            sandboxed = sum(q["sandbox_seconds"] for q in run["queries"].values())
+            named = run["named_during_runaway_seconds"]
+            click.echo(f"{machines:>8} {run['triples']:>9,} {inline:>7.3f}s {sandboxed:>7.3f}s "
+                       f"{run['runaway_seconds']:>7.2f}s {named or 0:>7.3f}s {run['row_limit_seconds']:>7.3f}s "
+                       f"{run['memory_limit_seconds']:>7.2f}s  "
+                       + ("FAILED: " + "; ".join(run["failures"]) if run["failures"] else "enforced"))
+            results["results"].append({"machines": machines, **run})
+
+    output = output or RESULTS_DIR / f"sandbox-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import click
+
+from benchmarks.plant import MACHINES_PER_TEAM, REFERENCE_TIME, SPECIALTIES
+from benchmarks.run import RESULTS_DIR, peak_rss_mb
+from scheduler import MaintenanceData, plan_maintenance
+
+
+def task_rows(tasks: int, operators_per_team: int, seed: int = 0) -> tuple[list, list]:
+    """
+    (task rows, operator rows) for plan_maintenance, distributed like the
+    maintenance data of benchmarks.plant (one task per machine, teams of
+    MACHINES_PER_TEAM machines) but with operators_per_team operators per team.
+    """
+    rng = random.Random(seed)
+    teams = (tasks + MACHINES_PER_TEAM - 1) // MACHINES_PER_TEAM
+    operators = [(f"Operator_{team:05d}_{i}", f"MaintenanceTeam_{team:05d}", SPECIALTIES[i % len(SPECIALTIES)])
+                 for team in range(teams) for i in range(operators_per_team)]
+    rows = []
+    for machine in range(tasks):
+        rows.append((f"MaintenanceTask_{machine:06d}_1", f"Machine_{machine:06d}",
+                     f"MaintenanceTeam_{machine // MACHINES_PER_TEAM:05d}", rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5]),
+                     REFERENCE_TIME + timedelta(days=rng.randint(-30, 180)),
+                     REFERENCE_TIME - timedelta(days=rng.randint(1, 120)), rng.choice([30, 45, 60, 90, 120]),
+                     SPECIALTIES[machine % MACHINES_PER_TEAM % len(SPECIALTIES)]))
+    return rows, operators
+
+
+@click.command()
+@click.option("--tasks", "sizes", default="1000,10000,100000", show_default=True,
+              help="Comma-separated numbers of maintenance tasks.")
+@click.option("--operators-per-team", default="10,1", show_default=True,
+              help=f"Comma-separated operators per team of {MACHINES_PER_TEAM} machines (10: one per machine).")
+@click.option("--days", type=click.IntRange(min=1), default=90, show_default=True, help="Planning horizon.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/schedule-<timestamp>.json).")
+def main(sizes, operators_per_team, days, seed, output):
+    """Time the maintenance scheduler on generated tasks and check every schedule is feasible."""
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "days": days, "results": []}
+    failed = False
+    click.echo(f"{'Tasks':>8} {'Ops/team':>8} {'Occurrences':>11} {'Rows':>8} {'Plan':>8} {'Late':>8} "
+               f"{'Unsched.':>8} {'Util.':>6} {'Peak MB':>8}  Feasibility")
+    click.echo("-" * 101)
+    for tasks in [int(s) for s in sizes.split(",") if s.strip()]:
+        for per_team in [int(s) for s in operators_per_team.split(",") if s.strip()]:
+            rows, operators = task_rows(tasks, per_team, seed)
+            started = time.perf_counter()
+            data = MaintenanceData.from_rows(rows, operators)
+            load_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            plan = plan_maintenance(data, REFERENCE_TIME, days)
+            seconds = time.perf_counter() - started
+
+            violations = plan.violations()
+            failed = failed or bool(violations)
+            occurrences = len(plan.assigned) + len(plan.unscheduled)
+            utilization = plan.team_utilization().values()
+            used = sum(hours for _, hours, _ in utilization) / sum(capacity for *_, capacity in utilization)
+            click.echo(f"{tasks:>8,} {per_team:>8} {occurrences:>11,} {load_seconds:>7.3f}s {seconds:>7.3f}s {plan.late():>8,} "
+                       f"{len(plan.unscheduled):>8,} {used:>6.1%} {peak_rss_mb():>8.1f}  "
+                       + (f"{len(violations)} VIOLATIONS, e.g. {violations[0]}" if violations else "feasible"))
+            results["results"].append({"tasks": tasks, "operators_per_team": per_team, "occurrences": occurrences,
+                                       "rows_seconds": round(load_seconds, 4), "plan_seconds": round(seconds, 4),
+                                       "late": plan.late(),
+                                       "unscheduled": len(plan.unscheduled), "utilization": round(used, 4),
+                                       "violations": violations[:20]})
+
+    output = output or RESULTS_DIR / f"schedule-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
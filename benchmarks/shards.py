@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from benchmarks.load import in_child
+from benchmarks.plant import write_plants
+from benchmarks.reasoning import _digest
+from benchmarks.run import QUERIES_DIR, QUERY_BINDINGS, RESULTS_DIR, peak_rss_mb
+from graph_manager import OntoMaintGraph
+from query_registry import QueryRegistry
+from sharding import ShardedGraph, merge_plan
+
+
+def _order_digest(rows, order: list) -> str:
+    """
+    Hash of the ORDER BY columns in result order: rows tied on them may come in any order.
+    """
+    keys = ["\t".join("" if row[column] is None else row[column].n3() for column, _ in order) for row in rows]
+    return hashlib.sha256("\n".join(keys).encode()).hexdigest()
+
+
+def _summary(registry: QueryRegistry, name: str, rows) -> dict:
+    rows = [tuple(row) for row in rows]
+    plan = merge_plan(registry.prepared(name))
+    order = plan["order"] if plan else []
+    return {"rows": len(rows), "digest": _digest(rows), "order": _order_digest(rows, order)}
+
+
+def single_run(plant_dir: Path, queries: list[str], bindings: dict) -> dict:
+    """
+    All plants in one graph: load, reason and run every query (in a child process).
+    """
+    sys.stdout = open(os.devnull, "w")
+    registry = QueryRegistry(QUERIES_DIR)
+    started = time.perf_counter()
+    graph = OntoMaintGraph()
+    graph.load_ontologies_and_data(plant_dir, workers=1)
+    graph.apply_reasoning()
+    result = {"mode": "single", "triples": len(graph.graph),
+              "build_seconds": round(time.perf_counter() - started, 4), "queries": {}}
+
+    started = time.perf_counter()
+    for name in queries:
+        result["queries"][name] = _summary(registry, name, registry.execute(graph.graph, name, bindings.get(name)))
+    result["query_seconds"] = round(time.perf_counter() - started, 4)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def sharded_run(plant_dir: Path, queries: list[str], bindings: dict, workers: int) -> dict:
+    """
+    One shard per plant, reasoned and queried in a pool of the given size (in a child process).
+    Building includes writing and reading back each shard's snapshot.
+    """
+    sys.stdout = open(os.devnull, "w")
+    registry = QueryRegistry(QUERIES_DIR)
+    started = time.perf_counter()
+    graph = ShardedGraph(plant_dir, workers=workers).load(use_snapshot=False)
+    result = {"mode": f"sharded/{workers}", "triples": sum(len(s.graph) for s in graph.shards.values()),
+              "build_seconds": round(time.perf_counter() - started, 4), "queries": {}}
+
+    started = time.perf_counter()
+    for name in queries:
+        result["queries"][name] = _summary(registry, name, graph.run_named_query(registry, name, bindings.get(name)))
+    result["query_seconds"] = round(time.perf_counter() - started, 4)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+@click.command()
+@click.option("--plants", default="1,4", show_default=True, help="Comma-separated numbers of plants.")
+@click.option("--machines", type=click.IntRange(min=1), default=100, show_default=True,
+              help="Machines per plant.")
+@click.option("--workers", type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True,
+              help="Processes reasoning and querying shards.")
+@click.option("--query", "queries", multiple=True, help="Only run this named query (repeatable).")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/shards-<timestamp>.json).")
+def main(plants, machines, workers, queries, seed, output):
+    """Compare one graph holding every plant with one shard per plant, and check they give the same results."""
+    registry = QueryRegistry(QUERIES_DIR)
+    names = list(queries) or registry.names(internal=True)
+    for name in names:
+        try:
+            registry.text(name)
+        except KeyError:
+            raise click.BadParameter(f"no such query: {name}", param_hint="--query")
+    bindings = {name: binding() for name, binding in QUERY_BINDINGS.items()}
+
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "machines": machines, "results": []}
+    failed = False
+    click.echo(f"{'Plants':>6}  {'Mode':<10} {'Triples':>10} {'Build':>9} {'Queries':>9} {'Peak MB':>9}  Results")
+    click.echo("-" * 76)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-shards-") as tmp:
+        for count in [int(s) for s in plants.split(",") if s.strip()]:
+            plant_dir = Path(tmp) / f"plants-{count}"
+            write_plants(plant_dir, count, machines, seed)
+            runs = [in_child(single_run, plant_dir, names, bindings),
+                    in_child(sharded_run, plant_dir, names, bindings, workers)]
+            differing = sorted(name for name in names if runs[1]["queries"][name] != runs[0]["queries"][name])
+            failed = failed or bool(differing)
+            for run in runs:
+                verdict = "reference" if run is runs[0] else (
+                    "DIFFERENT: " + ", ".join(differing) if differing else f"identical ({len(names)} queries)")
+                click.echo(f"{count:>6}  {run['mode']:<10} {run['triples']:>10,} {run['build_seconds']:>8.2f}s "
+                           f"{run['query_seconds']:>8.2f}s {run['peak_rss_mb']:>9.1f}  {verdict}")
+            results["results"].append({"plants": count, "runs": runs, "differing": differing})
+
+    output = output or RESULTS_DIR / f"shards-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
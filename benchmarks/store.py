@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from benchmarks.load import in_child
+from benchmarks.plant import write_plant
+from benchmarks.run import QUERIES_DIR, QUERY_BINDINGS, RESULTS_DIR, peak_rss_mb
+from graph_manager import DEFAULT_REASONING, REASONING_MODES, SNAPSHOT_SUFFIXES, STORES, OntoMaintGraph
+from query_registry import QueryRegistry
+
+
+def build_snapshots(plant_dir: Path, reasoning: str, directory: Path) -> dict:
+    """
+    Load and reason the plant once and write it as a snapshot for every store: {store: path}.
+    """
+    sys.stdout = open(os.devnull, "w")
+    graph = OntoMaintGraph(reasoning)
+    graph.load_ontologies_and_data(plant_dir, workers=1)
+    graph.apply_reasoning()
+    paths = {}
+    for store in STORES:
+        path = directory / store / f"graph{SNAPSHOT_SUFFIXES[store]}"
+        graph.save_snapshot(path)
+        paths[store] = path
+    return paths
+
+
+def open_and_query(path: Path, store: str, queries: list[str], repeat: int) -> dict:
+    """
+    Open a snapshot the way the CLI does and time every query on it (in a child process).
+    """
+    sys.stdout = open(os.devnull, "w")
+    before = peak_rss_mb()
+    graph = OntoMaintGraph(store=store)
+    started = time.perf_counter()
+    graph.load_snapshot(path)
+    result = {"store": store, "file_mb": round(path.stat().st_size / 1e6, 2),
+              "open_seconds": round(time.perf_counter() - started, 4),
+              "open_rss_mb": round(peak_rss_mb() - before, 1), "queries": {}}
+
+    registry = QueryRegistry(QUERIES_DIR)
+    for name in queries:
+        bindings = QUERY_BINDINGS[name]() if name in QUERY_BINDINGS else None
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = list(registry.execute(graph.graph, name, bindings))
+            runs.append(round(time.perf_counter() - started, 4))
+        result["queries"][name] = {"seconds": min(runs), "rows": len(rows)}
+    result["peak_rss_mb"] = round(peak_rss_mb() - before, 1)
+    return result
+
+
+@click.command()
+@click.option("--scales", default="100,1000", show_default=True, help="Comma-separated plant sizes, in machines.")
+@click.option("--query", "queries", multiple=True, help="Only time this named query (repeatable).")
+@click.option("--repeat", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Runs per query; the best one is reported.")
+@click.option("--reasoning", type=click.Choice(REASONING_MODES), default=DEFAULT_REASONING, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/store-<timestamp>.json).")
+def main(scales, queries, repeat, reasoning, seed, output):
+    """Compare opening and querying the reasoned snapshot from memory and from SQLite."""
+    registry = QueryRegistry(QUERIES_DIR)
+    names = list(queries) or registry.names(internal=True)
+    for name in names:
+        try:
+            registry.text(name)
+        except KeyError:
+            raise click.BadParameter(f"no such query: {name}", param_hint="--query")
+
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "reasoning": reasoning, "results": []}
+    with tempfile.TemporaryDirectory(prefix="ontomaint-store-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            click.echo(f"Benchmarking {machines} machines...")
+            plant_dir = Path(tmp) / f"plant-{machines}"
+            write_plant(plant_dir, machines, seed)
+            paths = in_child(build_snapshots, plant_dir, reasoning, Path(tmp) / f"snapshots-{machines}")
+            runs = [in_child(open_and_query, paths[store], store, names, repeat) for store in STORES]
+            results["results"].append({"machines": machines, "runs": runs})
+
+            click.echo(f"{'Store':<8} {'File MB':>8} {'Open':>9} {'Open MB':>8} {'Peak MB':>8}")
+            for run in runs:
+                click.echo(f"{run['store']:<8} {run['file_mb']:>8.1f} {run['open_seconds']:>8.3f}s "
+                           f"{run['open_rss_mb']:>8.1f} {run['peak_rss_mb']:>8.1f}")
+            click.echo(f"\n{'Query':<36} " + " ".join(f"{run['store']:>10}" for run in runs) + f" {'Ratio':>7}")
+            for name in names:
+                seconds = [run["queries"][name]["seconds"] for run in runs]
+                ratio = seconds[-1] / seconds[0] if seconds[0] > 0 else float("inf")
+                click.echo(f"{name:<36} " + " ".join(f"{s:>9.3f}s" for s in seconds) + f" {ratio:>6.2f}x")
+            click.echo("")
+
+    output = output or RESULTS_DIR / f"store-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import click
+import numpy as np
+
+from benchmarks.load import in_child
+from benchmarks.plant import write_plant
+from benchmarks.run import QUERIES_DIR, RESULTS_DIR, peak_rss_mb
+from cascade import CascadeIndex
+from graph_manager import OntoMaintGraph
+from query_registry import QueryRegistry
+from scenarios import RelationArrays, machine_scenarios
+from term_dictionary import RELATIONS, TermDictionary, _local_name
+
+
+def _timed(build):
+    started = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - started
+
+
+def _retained(build) -> int:
+    """
+    Bytes still allocated once build() returns (timed separately: tracemalloc slows it down).
+    """
+    tracemalloc.start()
+    result = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def _string_pairs(graph: OntoMaintGraph, terms: TermDictionary) -> dict:
+    # the RELATIONS as (source, target) string pairs, the way the analyses held them before
+    return {name: list(zip(map(str, terms.decode(src)), map(str, terms.decode(dst))))
+            for name, (src, dst) in ((name, terms.relation(name)) for name in RELATIONS)}
+
+
+def compare(plant_dir: Path, repeat: int) -> dict:
+    """
+    Build the what-if relations from cascade_edges.sparql rows (URI strings)
+    and from the term dictionary (integer IDs), and time grouping and
+    formatting on both (in a child process).
+    """
+    sys.stdout = open(os.devnull, "w")
+    graph = OntoMaintGraph()
+    graph.load_reasoned(plant_dir, use_snapshot=False)
+    registry = QueryRegistry(QUERIES_DIR)
+    result = {"triples": len(graph.graph)}
+
+    rows, query_seconds = _timed(lambda: graph.run_named_query(registry, "cascade_edges.sparql"))
+    index, index_seconds = _timed(lambda: CascadeIndex.from_rows(rows))
+    strings, strings_seconds = _timed(lambda: RelationArrays(index))
+    terms, terms_seconds = _timed(graph.term_dictionary)
+    ids, ids_seconds = _timed(lambda: RelationArrays.from_terms(terms))
+    result.update(terms=len(terms), query_seconds=round(query_seconds, 4),
+                  index_seconds=round(index_seconds + strings_seconds, 4),
+                  dictionary_seconds=round(terms_seconds, 4), from_terms_seconds=round(ids_seconds, 4),
+                  index_mb=round(_retained(lambda: CascadeIndex.from_rows(rows)) / 1e6, 2),
+                  dictionary_mb=round(_retained(graph.term_dictionary) / 1e6, 2),
+                  scenarios_equal=sorted(machine_scenarios(strings)) == sorted(machine_scenarios(ids)))
+
+    pairs = _string_pairs(graph, terms)
+    relations = {name: terms.relation(name) for name in RELATIONS}
+    result["relations"] = {name: len(src) for name, (src, _) in relations.items()}
+    result["relations_as_strings_mb"] = round(_retained(lambda: _string_pairs(graph, terms)) / 1e6, 2)
+    result["relations_as_ids_mb"] = round(sum(src.nbytes + dst.nbytes for src, dst in relations.values()) / 1e6, 2)
+
+    # group: failures per machine; format: local names of every cell of the relations
+    machine_edges = pairs["affectsMachine"]
+    fm_machine = relations["affectsMachine"][1]
+    cells = [cell for edges in pairs.values() for edge in edges for cell in edge]
+    cell_ids = np.concatenate([array for pair in relations.values() for array in pair])
+    timings = {
+        "group_strings": lambda: Counter(machine for _, machine in machine_edges),
+        "group_ids": lambda: np.bincount(fm_machine, minlength=len(terms)),
+        "format_strings": lambda: [_local_name(cell) for cell in cells],
+        "format_ids": lambda: terms.local_names(cell_ids),
+    }
+    for name, fn in timings.items():
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - started)
+        result[f"{name}_seconds"] = round(min(runs), 5)
+    result["cells"] = len(cells)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+@click.command()
+@click.option("--scales", default="1000,5000", show_default=True, help="Comma-separated plant sizes, in machines.")
+@click.option("--repeat", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/terms-<timestamp>.json).")
+def main(scales, repeat, seed, output):
+    """
+    Compare the what-if relations as URI strings (cascade_edges.sparql rows)
+    and as term-dictionary IDs: build time, memory, grouping and formatting
+    (strings / IDs).
+    """
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "results": []}
+    failed = False
+    click.echo(f"{'Machines':>8} {'Triples':>9} {'Terms':>8} {'Build: strings':>14} {'IDs':>7} "
+               f"{'Index MB':>8} {'Dict. MB':>8} {'Relations MB':>14} {'Group ms':>15} {'Format ms':>15}  Scenarios")
+    click.echo("-" * 122)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-terms-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            plant_dir = Path(tmp) / f"plant-{machines}"
+            write_plant(plant_dir, machines, seed)
+            run = in_child(compare, plant_dir, repeat)
+            failed = failed or not run["scenarios_equal"]
+            strings = run["query_seconds"] + run["index_seconds"]
+            ids = run["dictionary_seconds"] + run["from_terms_seconds"]
+            click.echo(f"{machines:>8} {run['triples']:>9,} {run['terms']:>8,} {strings:>13.3f}s {ids:>6.3f}s "
+                       f"{run['index_mb']:>8.2f} {run['dictionary_mb']:>8.2f} "
+                       f"{run['relations_as_strings_mb']:>6.2f} / {run['relations_as_ids_mb']:<5.2f} "
+                       f"{run['group_strings_seconds'] * 1e3:>6.2f} / {run['group_ids_seconds'] * 1e3:<6.2f} "
+                       f"{run['format_strings_seconds'] * 1e3:>6.2f} / {run['format_ids_seconds'] * 1e3:<6.2f}  "
+                       + ("equal" if run["scenarios_equal"] else "DIFFERENT"))
+            results["results"].append({"machines": machines, **run})
+
+    output = output or RESULTS_DIR / f"terms-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from benchmarks.load import in_child
+from benchmarks.plant import write_plant
+from benchmarks.run import BASE_DIR, QUERIES_DIR, RESULTS_DIR, peak_rss_mb
+from graph_manager import OntoMaintGraph
+from query_registry import QueryRegistry
+from reasoning import is_schema_triple
+from views import MaterializedViews
+
+
+def _changes(graph: OntoMaintGraph, steps: int, size: int, seed: int) -> list[tuple]:
+    """
+    (added, removed) deltas: size random asserted data triples removed, then
+    added back, steps times; every other removal is all triples of one subject.
+    """
+    rng = random.Random(seed)
+    data = sorted((t for t in graph.asserted if not is_schema_triple(t)), key=str)
+    changes = []
+    for step in range(steps):
+        if step % 2:
+            subject = rng.choice(data)[0]
+            removed = [t for t in data if t[0] == subject or t[2] == subject]
+        else:
+            removed = rng.sample(data, min(size, len(data)))
+        changes += [([], removed), (removed, [])]
+    return changes
+
+
+def update_views(plant_dir: Path, steps: int, size: int, seed: int) -> dict:
+    """
+    Reason one plant, build the views, then apply changes and compare
+    updating the views with rebuilding them (in a child process).
+    """
+    sys.stdout = open(os.devnull, "w")
+    graph = OntoMaintGraph()
+    graph.load_reasoned(plant_dir, use_snapshot=False)
+    registry = QueryRegistry(QUERIES_DIR)
+
+    started = time.perf_counter()
+    views = MaterializedViews(registry).build(graph.graph)
+    result = {"triples": len(graph.graph), "build_seconds": round(time.perf_counter() - started, 4),
+              "keys": {name: len(groups) for name, groups in views.groups.items()}, "changes": []}
+
+    for added, removed in _changes(graph, steps, size, seed):
+        delta = graph.apply_delta(added, removed)
+        started = time.perf_counter()
+        updated = views.update(graph.graph, delta)
+        result["changes"].append({"added": len(added), "removed": len(removed),
+                                  "update_seconds": round(time.perf_counter() - started, 4),
+                                  "keys_updated": sum(updated.values()), "differing": views.check(graph.graph)})
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+@click.command()
+@click.option("--scales", default="0,200", show_default=True,
+              help="Comma-separated plant sizes, in machines; 0 is the repository's own data.")
+@click.option("--steps", type=click.IntRange(min=1), default=5, show_default=True,
+              help="Changes per scale, each applied and then reverted.")
+@click.option("--size", type=click.IntRange(min=1), default=20, show_default=True,
+              help="Triples removed by a random change.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), default=None,
+              help="Results file (default: benchmarks/results/views-<timestamp>.json).")
+def main(scales, steps, size, seed, output):
+    """Check that updated materialized views equal their queries after every change, and compare update with rebuild."""
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "results": []}
+    failed = False
+    click.echo(f"{'Machines':>8} {'Triples':>10} {'Build':>9} {'Update (median / max)':>22} {'Keys':>6} {'Peak MB':>9}  Results")
+    click.echo("-" * 86)
+    with tempfile.TemporaryDirectory(prefix="ontomaint-views-") as tmp:
+        for machines in [int(s) for s in scales.split(",") if s.strip()]:
+            plant_dir = BASE_DIR
+            if machines:
+                plant_dir = Path(tmp) / f"plant-{machines}"
+                write_plant(plant_dir, machines, seed)
+
+            run = in_child(update_views, plant_dir, steps, size, seed)
+            differing = sorted({name for change in run["changes"] for name in change["differing"]})
+            failed = failed or bool(differing)
+            seconds = sorted(change["update_seconds"] for change in run["changes"])
+            keys = sum(change["keys_updated"] for change in run["changes"]) / len(run["changes"])
+            verdict = "DIFFERENT: " + ", ".join(differing) if differing else f"consistent ({len(seconds)} changes)"
+            click.echo(f"{machines:>8} {run['triples']:>10,} {run['build_seconds']:>8.2f}s "
+                       f"{seconds[len(seconds) // 2]:>10.3f}s / {seconds[-1]:.3f}s {keys:>6.1f} "
+                       f"{run['peak_rss_mb']:>9.1f}  {verdict}")
+            results["results"].append({"machines": machines, **run})
+
+    output = output or RESULTS_DIR / f"views-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    click.echo(f"Results written to {output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import gzip
+import multiprocessing as mp
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from rdflib import Graph, Literal, URIRef
+from rdflib.exceptions import ParserError
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser, r_tail, r_wspace
+
+
+# Input file suffixes (optionally followed by .gz) and their rdflib format names.
+FORMATS = {".ttl": "turtle", ".nt": "nt", ".nq": "nquads"}
+
+# Triples handed to the graph per addN call when streaming line-based files.
+CHUNK_SIZE = 50_000
+
+# Below this much input, a process pool costs more than it saves.
+POOL_MIN_BYTES = 4 << 20
+
+
+def rdf_format(path: Path) -> str:
+    """
+    rdflib format name for a path such as plant.ttl, readings.nt or day.nq.gz.
+    """
+    suffixes = path.suffixes
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    if not suffixes or suffixes[-1] not in FORMATS:
+        raise ValueError(f"Unsupported RDF file {path.name}; expected one of "
+                         + ", ".join(f"*{s}[.gz]" for s in FORMATS))
+    return FORMATS[suffixes[-1]]
+
+
+def is_rdf_file(path: Path) -> bool:
+    try:
+        rdf_format(path)
+    except ValueError:
+        return False
+    return True
+
+
+def open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+# The common N-Triples / N-Quads line: IRIs and a literal without escapes.
+# Anything else (blank nodes, escapes, comments) goes through rdflib's parser.
+_IRI = r'<([^\s"<>\\:]+:[^\s"<>\\]*)>'
+_OBJECT = _IRI + r'|("([^"\\]*)"(?:@([a-zA-Z]+(?:-[a-zA-Z0-9]+)*)|\^\^' + _IRI + r')?)'
+_TRIPLE_LINE = re.compile(r"[ \t]*" + _IRI + r"[ \t]+" + _IRI + r"[ \t]+(?:" + _OBJECT + r")[ \t]*\.[ \t]*(?:#.*)?")
+_QUAD_LINE = re.compile(r"[ \t]*" + _IRI + r"[ \t]+" + _IRI + r"[ \t]+(?:" + _OBJECT + r")"
+                        r"(?:[ \t]+(?:<[^>]*>|_:\S+))?[ \t]*\.[ \t]*(?:#.*)?")
+
+
+class _ListSink:
+    def __init__(self):
+        self.triples = []
+
+    def triple(self, s, p, o):
+        self.triples.append((s, p, o))
+
+
+class _LineParser(W3CNTriplesParser):
+    """
+    rdflib's N-Triples line parser, also accepting N-Quads lines. The graph
+    name of a quad is dropped: everything is merged into one graph, as with
+    the Turtle files.
+    """
+
+    __slots__ = ("quads",)
+
+    def __init__(self, sink, quads: bool = False):
+        super().__init__(sink)
+        self.quads = quads
+
+    def parseline(self, bnode_context=None):
+        if not self.quads:
+            return super().parseline(bnode_context)
+
+        self.eat(r_wspace)
+        if not self.line or self.line.startswith("#"):
+            return
+        subject = self.subject(bnode_context)
+        self.eat(r_wspace)
+        predicate = self.predicate()
+        self.eat(r_wspace)
+        obj = self.object(bnode_context)
+        self.eat(r_wspace)
+        self.uriref() or self.nodeid(bnode_context)
+        self.eat(r_tail)
+        if self.line:
+            raise ParserError("Trailing garbage")
+        self.sink.triple(subject, predicate, obj)
+
+
+def iter_triples(path: Path, chunk_size: int = CHUNK_SIZE):
+    """
+    Parse one file, yielding lists of triples. N-Triples and N-Quads are
+    streamed line by line, at most chunk_size triples at a time; Turtle is
+    parsed whole and yielded as one list.
+    """
+    fmt = rdf_format(path)
+    if fmt == "turtle":
+        g = Graph()
+        with open_text(path) as f:
+            g.parse(f, format="turtle")
+        yield list(g)
+        return
+
+    sink = _ListSink()
+    parser = _LineParser(sink, quads=fmt == "nquads")
+    line_re = _QUAD_LINE if fmt == "nquads" else _TRIPLE_LINE
+    # terms repeat a lot; build each distinct one once
+    iris, literals = {}, {}
+
+    def iri(value):
+        term = iris.get(value)
+        if term is None:
+            term = iris[value] = URIRef(value)
+        return term
+
+    with open_text(path) as f:
+        for lineno, line in enumerate(f, 1):
+            m = line_re.fullmatch(line.rstrip("\r\n"))
+            if m is None:
+                parser.line = line.rstrip("\r\n")
+                try:
+                    parser.parseline()
+                except ParserError as e:
+                    raise ParserError(f"{path.name}, line {lineno}: {e}: {line!r}")
+            else:
+                s_, p_, o_iri, o_lit, lexical, lang, datatype = m.groups()
+                if o_iri is not None:
+                    obj = iri(o_iri)
+                else:
+                    obj = literals.get(o_lit)
+                    if obj is None:
+                        obj = literals[o_lit] = Literal(lexical, lang, iri(datatype) if datatype else None)
+                sink.triples.append((iri(s_), iri(p_), obj))
+
+            if len(sink.triples) >= chunk_size:
+                yield sink.triples
+                sink.triples = []
+    if sink.triples:
+        yield sink.triples
+
+
+def parse_file(path: Path) -> tuple[list, float]:
+    """
+    (triples, seconds) for one file; runs in the pool workers. Equal terms are
+    made the same object, so pickle sends each one once and the parent keeps
+    one copy.
+    """
+    started = time.perf_counter()
+    terms = {}
+    intern = terms.setdefault
+    triples = [(intern(s, s), intern(p, p), intern(o, o)) for chunk in iter_triples(path) for s, p, o in chunk]
+    return triples, time.perf_counter() - started
+
+
+def default_workers(files: list) -> int:
+    """
+    One worker per CPU, at most one per file; 1 for inputs too small to gain from a pool.
+    """
+    if sum(path.stat().st_size for path in files) < POOL_MIN_BYTES:
+        return 1
+    return max(1, min(len(files), os.cpu_count() or 1))
+
+
+def load_files(graph: Graph, files: list[Path], workers: int = None, on_file=None) -> dict:
+    """
+    Add every file to graph and return {"files", "triples", "seconds"}.
+
+    With more than one worker, files are parsed in a pool of forked processes
+    (parsing is CPU-bound pure Python) and merged in file order. Otherwise
+    Turtle is parsed straight into the graph and line-based files are
+    streamed into it in chunks. on_file(path, triples added, seconds) is
+    called after each file.
+    """
+    started, before = time.perf_counter(), len(graph)
+    workers = default_workers(files) if workers is None else workers
+
+    if workers > 1 and len(files) > 1 and "fork" in mp.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("fork")) as pool:
+            for path, (triples, seconds) in zip(files, pool.map(parse_file, files)):
+                size = len(graph)
+                graph.addN((s, p, o, graph) for s, p, o in triples)
+                if on_file:
+                    on_file(path, len(graph) - size, seconds)
+    else:
+        for path in files:
+            file_started, size = time.perf_counter(), len(graph)
+            if rdf_format(path) == "turtle" and path.suffix != ".gz":
+                graph.parse(path, format="turtle")
+            else:
+                for chunk in iter_triples(path):
+                    graph.addN((s, p, o, graph) for s, p, o in chunk)
+            if on_file:
+                on_file(path, len(graph) - size, time.perf_counter() - file_started)
+
+    return {"files": len(files), "triples": len(graph) - before, "seconds": time.perf_counter() - started}
+
+
+def throughput(stats: dict) -> float:
+    """
+    Triples per second of a load_files result.
+    """
+    return stats["triples"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
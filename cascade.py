@@ -0,0 +1,261 @@
+import pickle
+from collections import defaultdict
+from pathlib import Path
+
+
+INDEX_FORMAT = 2
+
+# Columns of CascadeIndex.high_risk_rows: the high-risk query's row with its failure's cascade.
+HIGH_RISK_COLUMNS = ("failure", "machine", "severity", "downtime", "cascades", "depth",
+                     "total_downtime", "next_failures", "action")
+
+
+class CascadeIndex:
+    """
+    In-memory adjacency lists for failure propagation (FailurePropagation
+    hasCause -> propagatesTo), failures -> machines/jobs, job -> nextJob
+    and machine -> processed batches.
+    Built once from the rows of queries/internal/cascade_edges.sparql;
+    cascades are then plain BFS walks instead of SPARQL joins, so they follow
+    any number of hops.
+    Nodes are kept as URI strings.
+    """
+
+    def __init__(self):
+        self.propagates_to = defaultdict(list)
+        self.machines = defaultdict(list)
+        self.failures_by_machine = defaultdict(list)
+        self.blocked_jobs = defaultdict(list)
+        self.next_jobs = defaultdict(list)
+        self.downtime = {}
+        self.all_machines = {}
+        self.batches = defaultdict(list)
+        self.batch_size = {}
+        self._components = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build the index from (kind, source, target) rows.
+        """
+        index = cls()
+        for kind, source, target in rows:
+            index.add_edge(str(kind), str(source), target)
+        return index
+
+    def save(self, path: Path):
+        """
+        Pickle the index next to the graph snapshot; older index files are removed.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for old in path.parent.glob("cascade-*.pickle"):
+            if old != path:
+                old.unlink()
+
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump((INDEX_FORMAT, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @staticmethod
+    def load(path: Path):
+        """
+        Load an index written by save, or None if it is missing, unreadable or from another format.
+        """
+        try:
+            with path.open("rb") as f:
+                fmt, index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError, ValueError):
+            return None
+        return index if fmt == INDEX_FORMAT else None
+
+    def add_edge(self, kind: str, source: str, target):
+        self._components.clear()
+        if kind == "hasDowntimeMinutes":
+            self.downtime[source] = float(target)
+            return
+        if kind == "batchSize":
+            self.batch_size[source] = float(target)
+            return
+        if kind == "Machine":
+            self.all_machines[source] = None
+            return
+
+        target = str(target)
+        if kind == "propagatesTo":
+            edges = self.propagates_to[source]
+        elif kind == "affectsMachine":
+            edges = self.machines[source]
+            self.failures_by_machine[target].append(source)
+        elif kind == "blocksJob":
+            edges = self.blocked_jobs[source]
+        elif kind == "nextJob":
+            edges = self.next_jobs[source]
+        elif kind == "processesBatch":
+            edges = self.batches[source]
+        else:
+            raise ValueError(f"Unknown edge kind {kind!r}")
+        if target not in edges:
+            edges.append(target)
+
+    def machine_names(self) -> list[str]:
+        """
+        Every machine: typed onto:Machine, affected by a failure or processing a batch.
+        """
+        machines = dict(self.all_machines)
+        machines.update(dict.fromkeys(self.failures_by_machine))
+        machines.update(dict.fromkeys(self.batches))
+        return list(machines)
+
+    # ------------------------------------------------------------
+    # Traversal
+    # ------------------------------------------------------------
+    @staticmethod
+    def _bfs(adjacency, roots, max_depth=None) -> dict:
+        """
+        Nodes reachable from roots, mapped to their hop distance (roots are 0), in BFS order.
+        The visited map stops the walk from looping on cyclic edges.
+        """
+        depths = dict.fromkeys(roots, 0)
+        frontier = list(depths)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                for target in adjacency.get(node, ()):
+                    if target not in depths:
+                        depths[target] = depth
+                        next_frontier.append(target)
+            frontier = next_frontier
+        return depths
+
+    @staticmethod
+    def _cycles(adjacency, nodes) -> list[list]:
+        """
+        Strongly connected components with a cycle among nodes (Tarjan, iterative).
+        """
+        index, low, on_stack = {}, {}, set()
+        stack, cycles = [], []
+
+        for start in nodes:
+            if start in index:
+                continue
+            index[start] = low[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            work = [(start, iter(adjacency.get(start, ())))]
+
+            while work:
+                node, targets = work[-1]
+                for target in targets:
+                    if target not in nodes:
+                        continue
+                    if target not in index:
+                        index[target] = low[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(adjacency.get(target, ()))))
+                        break
+                    if target in on_stack:
+                        low[node] = min(low[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in adjacency.get(node, ()):
+                            cycles.append(component[::-1])
+        return cycles
+
+    def _cycles_reached(self, name: str, reached: dict, closed: bool) -> list[list]:
+        """
+        Cycles among the reached nodes of one adjacency map. When the walk was
+        not depth-limited, reached is closed under successors, so the cycles are
+        the graph-wide cyclic components it touches, computed once per index.
+        """
+        adjacency = getattr(self, name)
+        if not closed:
+            return self._cycles(adjacency, reached)
+
+        if name not in self._components:
+            member_of = {}
+            for component in self._cycles(adjacency, adjacency):
+                for node in component:
+                    member_of[node] = component
+            self._components[name] = member_of
+
+        member_of = self._components[name]
+        cycles = {}
+        for node in reached:
+            component = member_of.get(node)
+            if component is not None:
+                cycles[id(component)] = component
+        return list(cycles.values())
+
+    def failure_cascade(self, failure: str, max_depth: int = None) -> dict:
+        """
+        Everything a failure leads to within max_depth hops (None = unlimited):
+        - failures: propagated failures -> hops from the root (the root itself is 0)
+        - machines: machines affected by any failure in the cascade -> the first failure affecting them
+        - blocked_jobs: jobs blocked directly -> the first failure blocking them
+        - downstream_jobs: later jobs reached over nextJob -> hops from the nearest blocked job
+        - depth, downtime: cascade depth and cumulative downtime in minutes
+        - cycles: propagation loops and job-chain loops found along the way
+        """
+        failure = str(failure)
+        failures = self._bfs(self.propagates_to, [failure], max_depth)
+
+        machines = {}
+        blocked_jobs = {}
+        for f in failures:
+            for machine in self.machines.get(f, ()):
+                machines.setdefault(machine, f)
+            for job in self.blocked_jobs.get(f, ()):
+                blocked_jobs.setdefault(job, f)
+
+        jobs = self._bfs(self.next_jobs, blocked_jobs, max_depth)
+        downstream_jobs = {job: hops for job, hops in jobs.items() if hops}
+
+        return {
+            "failure": failure,
+            "failures": failures,
+            "machines": machines,
+            "blocked_jobs": blocked_jobs,
+            "downstream_jobs": downstream_jobs,
+            "depth": max(failures.values()),
+            "downtime": sum(self.downtime.get(f, 0.0) for f in failures),
+            "cycles": (self._cycles_reached("propagates_to", failures, max_depth is None)
+                       + self._cycles_reached("next_jobs", jobs, max_depth is None)),
+        }
+
+    def machine_cascades(self, machine: str, max_depth: int = None) -> list[dict]:
+        """
+        The cascade of every failure that affects a machine.
+        """
+        return [self.failure_cascade(f, max_depth) for f in self.failures_by_machine.get(str(machine), ())]
+
+    def high_risk_rows(self, results, depth: int = None) -> list[tuple]:
+        """
+        Rows of high_risk_failures.sparql (failure, machine, severity,
+        downtime, action) with their failure cascades, in HIGH_RISK_COLUMNS
+        order (next_failures a tuple of URIs), most severe first, then the widest cascades.
+        """
+        cascades = {}
+        for failure, *_ in results:
+            if failure not in cascades:
+                cascades[failure] = self.failure_cascade(failure, depth)
+
+        results = sorted(results, key=lambda row: (-float(row[2]), -len(cascades[row[0]]["failures"])))
+        return [(failure, machine, severity, downtime, len(cascades[failure]["failures"]) - 1,
+                 cascades[failure]["depth"], cascades[failure]["downtime"],
+                 tuple(self.propagates_to.get(str(failure), ())), action)
+                for failure, machine, severity, downtime, action in results]
@@ -0,0 +1,30 @@
+import os
+
+
+# Settings shared by the CLI, the dashboard and the graph. Kept free of
+# rdflib/owlrl imports so that `app.py --help` and option parsing stay fast.
+
+SNAPSHOT_DIR = ".snapshot"
+
+# "owlrl": full OWL RL closure (owlrl). "targeted": only the rules whose
+# conclusions the named queries in queries/ can observe (see TargetedReasoner).
+REASONING_MODES = ("owlrl", "targeted")
+DEFAULT_REASONING = os.environ.get("ONTOMAINT_REASONING", "owlrl")
+
+# Where the reasoned snapshot lives: "memory" pickles it and loads it into an
+# in-memory graph; "sqlite" keeps it in an indexed SQLite file that queries read directly.
+STORES = ("memory", "sqlite")
+DEFAULT_STORE = os.environ.get("ONTOMAINT_STORE", "memory")
+SNAPSHOT_SUFFIXES = {"memory": ".pickle", "sqlite": ".sqlite"}
+
+# Split the inputs into shards, one per subdirectory of data/ (e.g. per plant),
+# reasoned and queried separately and in parallel (see sharding.py).
+DEFAULT_SHARDED = os.environ.get("ONTOMAINT_SHARDED", "") not in ("", "0")
+
+# Ad-hoc SPARQL (the dashboard's console, the server's /sparql) runs in worker
+# processes (see sandbox.py): after QUERY_TIMEOUT seconds, or past
+# QUERY_MAX_MEMORY_MB of memory, its worker is killed; results stop at QUERY_MAX_ROWS rows.
+QUERY_WORKERS = int(os.environ.get("ONTOMAINT_QUERY_WORKERS", "2"))
+QUERY_TIMEOUT = float(os.environ.get("ONTOMAINT_QUERY_TIMEOUT", "30"))
+QUERY_MAX_ROWS = int(os.environ.get("ONTOMAINT_QUERY_MAX_ROWS", "100000"))
+QUERY_MAX_MEMORY_MB = int(os.environ.get("ONTOMAINT_QUERY_MAX_MEMORY_MB", "2048"))
@@ -1,315 +1,690 @@
-import pandas as pd
-import streamlit as st
-from pathlib import Path
-from graph_manager import OntoMaintGraph
-
-BASE_DIR = Path(__file__).resolve().parent
-QUERIES_DIR = BASE_DIR / "queries"
-
-st.set_page_config(page_title="OntoMaint Dashboard", layout="wide")
-st.title("OntoMaint Dashboard")
-
-
-# ============================================================
-# Per-query parameter metadata
-# ============================================================
-QUERY_PARAMS = {
-    "impact_failure.sparql": {
-        "title": "Failure Impact",
-        "params": [
-            {"var": "?failure", "label": "Failure", "type": "ErrorContext"},
-        ],
-    },
-    "actions_for_failure.sparql": {
-        "title": "Corrective Actions",
-        "params": [
-            {"var": "?failure", "label": "Failure", "type": "ErrorContext", "allow_all": True},
-        ],
-    },
-    "whatif_machine_failure.sparql": {
-        "title": "What-if by Machine",
-        "params": [
-            {"var": "?machine", "label": "Machine", "type": "Machine", "allow_all": True},
-        ],
-    },
-    "critical_failures.sparql": {
-        "title": "Critical Failures",
-        "params": []
-    },
-    "high_risk_failures.sparql":{
-        "title": "High-Risk Failures", "params": []
-    },
-    "machine_health.sparql": {
-        "title": "Machine Health", "params": []
-    },
-    "maintenance_schedule.sparql": {
-        "title": "Maintenance Schedule",
-        "params": [
-            {"var": "?machine", "label": "Machine", "type": "Machine", "allow_all": True},
-        ],
-    },
-    "spare_parts_impact.sparql": {
-        "title": "Spare Parts & Costs",
-        "params": [] 
-    },
-    "team_workload.sparql": {
-        "title": "Maintenance Team Workload",
-        "params": []
-    },
-    "sensor_performance.sparql": {
-        "title": "Sensor IoT Data",
-        "params": []
-    },
-    "production_impact_analysis.sparql": {
-        "title": "Production Impact",
-        "params": []
-    }
-}
-
-
-# ============================================================
-# Pretty labels for queries
-# ============================================================
-def pretty_query_label(filename: str) -> str:
-    meta = QUERY_PARAMS.get(filename)
-    if meta and meta.get("title"):
-        return meta["title"]
-    return filename.replace(".sparql", "").replace("_", " ").title()
-
-
-# ============================================================
-# Helpers
-# ============================================================
-def local_name(x) -> str:
-    s = "" if x is None else str(x)
-    return s.split("#")[-1] if "#" in s else s
-
-
-@st.cache_resource
-def load_graph():
-    g = OntoMaintGraph()
-    g.load_ontologies_and_data(BASE_DIR)
-    g.apply_reasoning()
-    return g
-
-
-def run_query_raw(query_text: str):
-    g = load_graph()
-    qr = g.graph.query(query_text)
-    vars_ = [str(v) for v in getattr(qr, "vars", [])]
-    rows = list(qr)
-    return vars_, rows
-
-
-def rows_to_df(vars_, rows, prettify=True) -> pd.DataFrame:
-    if not rows:
-        return pd.DataFrame()
-
-    if vars_ and len(vars_) == len(rows[0]):
-        cols = [v.lstrip("?") for v in vars_]
-    else:
-        cols = [f"col{i+1}" for i in range(len(rows[0]))]
-
-    df = pd.DataFrame(
-        [[str(cell) if cell is not None else "" for cell in row] for row in rows],
-        columns=cols,
-    )
-
-    if prettify:
-        df = df.applymap(local_name)
-
-    return df
-
-
-def list_sparql_files() -> list[Path]:
-    return sorted(QUERIES_DIR.glob("*.sparql")) if QUERIES_DIR.exists() else []
-
-
-def load_query_file(path: Path) -> str:
-    return path.read_text(encoding="utf-8")
-
-
-def inject_filter(query_text: str, filter_snippet: str) -> str:
-    if filter_snippet.strip():
-        query_text = query_text.replace("# __FILTER__", filter_snippet)
-        query_text = query_text.replace("#__FILTER__", filter_snippet)
-        query_text = query_text.replace("__FILTER__", filter_snippet)
-    else:
-        query_text = query_text.replace("# __FILTER__", "")
-        query_text = query_text.replace("#__FILTER__", "")
-        query_text = query_text.replace("__FILTER__", "")
-    return query_text
-
-
-# ============================================================
-# Instance fetchers
-# ============================================================
-def get_instances_of(class_local_name: str) -> list[str]:
-    vars_, rows = run_query_raw(f"""
-    PREFIX onto: <http://example.org/ontomaint#>
-    SELECT DISTINCT ?x
-    WHERE {{ ?x a onto:{class_local_name} . }}
-    ORDER BY ?x
-    """)
-    return [local_name(r[0]) for r in rows] if rows else []
-
-
-def get_failure_like_instances() -> list[str]:
-    vars_, rows = run_query_raw("""
-    PREFIX onto: <http://example.org/ontomaint#>
-    SELECT DISTINCT ?f
-    WHERE {
-      { ?f a onto:ErrorContext . }
-      UNION { ?f onto:affectsMachine ?m . }
-      UNION { ?f onto:blocksJob ?j . }
-      UNION {
-        ?fp a onto:FailurePropagation ;
-            onto:hasCause ?f .
-      }
-    }
-    ORDER BY ?f
-    """)
-    return [local_name(r[0]) for r in rows] if rows else []
-
-
-# ============================================================
-# Sidebar – Query selection
-# ============================================================
-st.sidebar.header("Controls")
-
-files = list_sparql_files()
-file_names = [f.name for f in files]
-
-query_values = ["__NONE__"] + file_names
-
-selected = st.sidebar.selectbox(
-    "Query",
-    query_values,
-    format_func=lambda v: "— Select a query —" if v == "__NONE__" else pretty_query_label(v),
-)
-
-if selected == "__NONE__":
-    st.info("Select a query from the sidebar to run it.")
-    st.stop()
-
-query_file = QUERIES_DIR / selected
-query_name = query_file.name
-query_text = load_query_file(query_file)
-
-meta = QUERY_PARAMS.get(query_name, {"title": pretty_query_label(query_name), "params": []})
-params = meta["params"]
-
-
-# ============================================================
-# Sidebar – Parameters (with hard-coded batch exclusion)
-# ============================================================
-st.sidebar.divider()
-st.sidebar.subheader("Parameters")
-
-param_values = {}
-
-EXCLUDED_BATCHES = {
-    "Batch_2025_12_001",
-    "Batch_2025_12_002",
-    "Batch_2025_12_003",
-}
-
-if not params:
-    st.sidebar.caption("This query has no parameters.")
-else:
-    for p in params:
-        p_var = p["var"]
-        p_label = p.get("label", p_var)
-        p_type = p.get("type")
-        allow_all = bool(p.get("allow_all", False))
-
-        if p_type == "Machine":
-            options = get_instances_of("Machine")
-            options = [m for m in options if m not in EXCLUDED_BATCHES]
-
-        elif p_type == "ErrorContext":
-            options = get_failure_like_instances()
-        else:
-            options = []
-
-        if not options:
-            st.sidebar.warning(f"No options found for {p_label}.")
-            continue
-
-        if allow_all:
-            options = ["All"] + options
-
-        chosen = st.sidebar.selectbox(
-            p_label,
-            options,
-            key=f"{query_name}:{p_var}",
-        )
-
-        if chosen != "All":
-            param_values[p_var] = chosen
-
-
-# ============================================================
-# Build FILTER
-# ============================================================
-filter_lines = []
-for var, val in param_values.items():
-    uri = f"http://example.org/ontomaint#{val}"
-    filter_lines.append(f"FILTER ({var} = <{uri}>)")
-
-final_query = inject_filter(query_text, "\n".join(filter_lines))
-
-
-# ============================================================
-# Main – Query Result Viewer
-# ============================================================
-st.header("Query Result Viewer")
-st.caption(f"Query: {pretty_query_label(query_name)}")
-
-c1, c2 = st.columns(2)
-show_query = c1.checkbox("Show query text")
-prettify = c2.checkbox("Prettify URIs", value=True)
-
-if show_query:
-    st.code(final_query, language="sparql")
-
-try:
-    vars_, rows = run_query_raw(final_query)
-    df = rows_to_df(vars_, rows, prettify)
-
-    if df.empty:
-        st.info("Query executed successfully, but returned no results.")
-    else:
-        st.success(f"Returned {len(df)} rows.")
-        st.dataframe(df, use_container_width=True, hide_index=True)
-
-except Exception as e:
-    st.error("Error executing query")
-    st.code(str(e))
-
-
-# ============================================================
-# SPARQL Console
-# ============================================================
-st.divider()
-st.header("SPARQL Console")
-
-console_query = st.text_area(
-    "Write SPARQL",
-    """PREFIX onto: <http://example.org/ontomaint#>
-SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 25
-""",
-    height=180,
-)
-
-if st.button("Run console query"):
-    try:
-        vars_, rows = run_query_raw(console_query)
-        df = rows_to_df(vars_, rows, prettify=True)
-        if df.empty:
-            st.info("No results.")
-        else:
-            st.dataframe(df, use_container_width=True, hide_index=True)
-    except Exception as e:
-        st.error("Console query error")
-        st.code(str(e))
+import io
+import time
+import pandas as pd
+import streamlit as st
+from contextlib import nullcontext
+from pathlib import Path
+from cascade import HIGH_RISK_COLUMNS, CascadeIndex
+from config import SNAPSHOT_DIR
+from export import EXPORT_FORMATS, MIME_TYPES, SUFFIXES, export_rows
+from graph_manager import OntoMaintGraph, input_signature
+from live_graph import POLL_SECONDS, LiveGraph
+from query_registry import QueryRegistry, prepare_text
+from result_cache import ResultCache, result_cells
+from result_frames import local_name, result_frame
+from sandbox import QueryAborted, QuerySandbox
+from timeseries import TimeSeriesStore
+from risk import RISK_COLUMNS, RISK_WEIGHTS, MachineRisk, top_k
+from scenarios import SCENARIO_COLUMNS, RelationArrays, machine_scenarios
+from profiling import Profiler
+from views import answered_by_views
+
+BASE_DIR = Path(__file__).resolve().parent
+QUERIES_DIR = BASE_DIR / "queries"
+READINGS_DIR = BASE_DIR / "data" / "readings"
+READINGS_CACHE_DIR = BASE_DIR / SNAPSHOT_DIR / "readings"
+
+# Query results shared by all sessions; bounded by entries and total result cells.
+RESULT_CACHE_ENTRIES = 512
+RESULT_CACHE_CELLS = 5_000_000
+
+# Result tables are converted and sent to the browser one page at a time.
+PAGE_SIZE = 10_000
+
+st.set_page_config(page_title="OntoMaint Dashboard", layout="wide")
+st.title("OntoMaint Dashboard")
+
+
+# ============================================================
+# Per-query parameter metadata
+# ============================================================
+QUERY_PARAMS = {
+    "impact_failure.sparql": {
+        "title": "Failure Impact",
+        "params": [
+            {"var": "?failure", "label": "Failure", "type": "ErrorContext"},
+        ],
+    },
+    "actions_for_failure.sparql": {
+        "title": "Corrective Actions",
+        "params": [
+            {"var": "?failure", "label": "Failure", "type": "ErrorContext", "allow_all": True},
+        ],
+    },
+    "whatif_machine_failure.sparql": {
+        "title": "What-if by Machine",
+        "params": [
+            {"var": "?machine", "label": "Machine", "type": "Machine", "allow_all": True},
+        ],
+    },
+    "critical_failures.sparql": {
+        "title": "Critical Failures",
+        "params": []
+    },
+    "high_risk_failures.sparql":{
+        "title": "High-Risk Failures", "params": []
+    },
+    "machine_health.sparql": {
+        "title": "Machine Health", "params": []
+    },
+    "maintenance_schedule.sparql": {
+        "title": "Maintenance Schedule",
+        "params": [
+            {"var": "?machine", "label": "Machine", "type": "Machine", "allow_all": True},
+        ],
+    },
+    "spare_parts_impact.sparql": {
+        "title": "Spare Parts & Costs",
+        "params": [] 
+    },
+    "team_workload.sparql": {
+        "title": "Maintenance Team Workload",
+        "params": []
+    },
+    "sensor_performance.sparql": {
+        "title": "Sensors & Metrics",
+        "params": []
+    },
+    "production_impact_analysis.sparql": {
+        "title": "Production Impact",
+        "params": []
+    }
+}
+
+
+# ============================================================
+# Pretty labels for queries
+# ============================================================
+def pretty_query_label(filename: str) -> str:
+    meta = QUERY_PARAMS.get(filename)
+    if meta and meta.get("title"):
+        return meta["title"]
+    return filename.replace(".sparql", "").replace("_", " ").title()
+
+
+# ============================================================
+# Helpers
+# ============================================================
+@st.cache_resource
+def load_live_graph() -> LiveGraph:
+    """
+    The reasoned graph shared by every session, kept up to date with
+    ontologies/ and data/ by a watcher thread (see LiveGraph).
+    """
+    return LiveGraph(BASE_DIR).start()
+
+
+def graph_version() -> str:
+    """
+    Content fingerprint of the inputs the live graph currently reflects;
+    a new version drops every cached result.
+    """
+    version = load_live_graph().version
+    load_result_cache().set_version(version)
+    return version
+
+
+def readings_version() -> tuple:
+    files = sorted(READINGS_DIR.glob("*.csv")) if READINGS_DIR.exists() else []
+    return input_signature(BASE_DIR, files)
+
+
+@st.cache_resource
+def load_registry():
+    return QueryRegistry(QUERIES_DIR)
+
+
+@st.cache_resource
+def load_result_cache():
+    return ResultCache(max_entries=RESULT_CACHE_ENTRIES, max_cells=RESULT_CACHE_CELLS)
+
+
+def cached_query(query_text: str, evaluate, bindings: dict = None):
+    """
+    Results keyed by (graph version, query text, bindings), shared across sessions.
+    """
+    version = graph_version()
+    key = (version, query_text, tuple(sorted((bindings or {}).items())))
+    cache = load_result_cache()
+
+    def compute():
+        with load_live_graph().reading() as graph:
+            qr = evaluate(graph.graph)
+            return [str(v) for v in getattr(qr, "vars", None) or []], list(qr)
+
+    with profile_phase("query") as record:
+        misses = cache.misses
+        result = cache.get_or_compute(key, compute, size=result_cells)
+        record.update(rows=len(result[1]), cached=cache.misses == misses)
+    return result
+
+
+def run_named_query(query_name: str, bindings: dict):
+    if not bindings and answered_by_views(query_name):
+        # read from the live graph's materialized views, which follow every change to it
+        with profile_phase("views") as record:
+            vars_, rows = load_live_graph().views.query_rows(query_name)
+            record["rows"] = len(rows)
+        return vars_, rows
+    registry = load_registry()
+    return cached_query(
+        registry.text(query_name),
+        lambda graph: registry.execute(graph, query_name, bindings),
+        bindings,
+    )
+
+
+def run_query_raw(query_text: str):
+    return cached_query(query_text, lambda graph: graph.query(prepare_text(query_text)))
+
+
+@st.cache_resource
+def load_sandbox() -> QuerySandbox:
+    live = load_live_graph()
+    return QuerySandbox(live.reading, lambda: live.version)
+
+
+def run_console_query(query_text: str, progress=None):
+    """
+    (vars, rows, truncated) of SPARQL typed into the console, run by the
+    sandbox's workers (timeout, row limit, memory ceiling) rather than in
+    this process, and cached like other results but outside the cache's
+    lock, so a slow console query holds up no one else's.
+    """
+    key = (graph_version(), "console", query_text)
+    cache = load_result_cache()
+    with profile_phase("query", sandboxed=True) as record:
+        result = cache.get(key)
+        record["cached"] = result is not None
+        if result is None:
+            result = load_sandbox().run(query_text, progress=progress)
+            cache.put(key, result, size=result_cells)
+        record["rows"] = len(result[1])
+    return result
+
+
+@st.cache_resource(max_entries=1)
+def load_timeseries_version(readings: tuple):
+    # the readings are only in the CSV files; the graph holds the sensors and metrics
+    store = TimeSeriesStore()
+    if READINGS_DIR.exists():
+        store.ingest_dir(READINGS_DIR, READINGS_CACHE_DIR)
+    return store
+
+
+def load_timeseries():
+    return load_timeseries_version(readings_version())
+
+
+@st.cache_resource(max_entries=1)
+def load_relation_arrays_version(version: str):
+    # joined on the graph's term IDs rather than from the rows of cascade_edges.sparql
+    with load_live_graph().reading() as graph:
+        return RelationArrays.from_terms(graph.term_dictionary())
+
+
+def load_relation_arrays():
+    return load_relation_arrays_version(graph_version())
+
+
+@st.cache_resource(max_entries=1)
+def load_cascade_index_version(version: str) -> CascadeIndex:
+    return CascadeIndex.from_rows(run_named_query("cascade_edges.sparql", {})[1])
+
+
+def load_cascade_index() -> CascadeIndex:
+    return load_cascade_index_version(graph_version())
+
+
+def high_risk_result(rows, prettify: bool):
+    """
+    High-risk failure rows with the cascade columns the high-risk command adds (CascadeIndex.high_risk_rows).
+    """
+    if not rows:
+        return list(HIGH_RISK_COLUMNS), []
+    name = local_name if prettify else str
+    return list(HIGH_RISK_COLUMNS), [(*row[:7], ", ".join(map(name, row[7])) or None, row[8])
+                                     for row in load_cascade_index().high_risk_rows(rows)]
+
+
+@st.cache_resource(max_entries=1)
+def load_machine_risk_version(version: str):
+    # the arrays are built once per graph version; each rerun only rescores them
+    return MachineRisk.from_rows(run_named_query("machine_health.sparql", {})[1],
+                                 run_named_query("critical_failures.sparql", {})[1])
+
+
+def load_machine_risk():
+    return load_machine_risk_version(graph_version())
+
+
+def show_rows(vars_, rows, prettify=True, key="rows"):
+    """
+    Show a result PAGE_SIZE rows at a time; only the visible page is turned into a DataFrame.
+    """
+    pages = max(1, -(-len(rows) // PAGE_SIZE))
+    page = 1
+    if pages > 1:
+        page = int(st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, key=f"{key}:page"))
+    start = (page - 1) * PAGE_SIZE
+    page_rows = rows[start:start + PAGE_SIZE]
+    if pages > 1:
+        st.caption(f"Rows {start + 1:,}–{start + len(page_rows):,} of {len(rows):,}")
+    with profile_phase("format", rows=len(page_rows)):
+        st.dataframe(result_frame(vars_, page_rows, prettify), use_container_width=True, hide_index=True)
+
+
+def download_rows(vars_, rows, file_stem: str, key: str):
+    """
+    Download button for a whole result. The file is written row by row from
+    the result when the button is clicked, never as a DataFrame.
+    """
+    c1, c2 = st.columns([1, 3])
+    fmt = c1.selectbox("Format", EXPORT_FORMATS, key=f"{key}:format", label_visibility="collapsed")
+
+    def data():
+        buffer = io.BytesIO() if fmt == "parquet" else io.StringIO()
+        export_rows(vars_, rows, fmt, buffer)
+        return buffer.getvalue()
+
+    c2.download_button(f"Download {len(rows):,} rows", data, file_name=file_stem + SUFFIXES[fmt],
+                       mime=MIME_TYPES[fmt], key=f"{key}:download", on_click="ignore")
+
+
+def profile_phase(name: str, **info):
+    """
+    A profiler phase when "Profile this run" is on, a no-op otherwise.
+    """
+    profiler = st.session_state.get("profiler")
+    if profiler is None:
+        return nullcontext(dict(info))
+    return profiler.phase(name, **info)
+
+
+def start_profile(trace_memory: bool):
+    stop_profile()
+    profiler = Profiler(trace_memory=trace_memory).start()
+    OntoMaintGraph.subscribe(profiler.event)
+    st.session_state["profiler"] = profiler
+
+
+def stop_profile():
+    """
+    End the run's profile (also one left over by a run that was interrupted) and return it.
+    """
+    profiler = st.session_state.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+        OntoMaintGraph.unsubscribe(profiler.event)
+    return profiler
+
+
+def show_profile():
+    profiler = stop_profile()
+    if profiler is None:
+        return
+    records = pd.DataFrame(profiler.records)
+    with profile_box:
+        st.dataframe(records, use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download (JSON lines)",
+            records.to_json(orient="records", lines=True),
+            file_name="ontomaint-profile.jsonl",
+        )
+
+
+def finish_run():
+    show_profile()
+    show_cache_status()
+
+
+def list_sparql_files() -> list[Path]:
+    # the analyses only: the helper queries in queries/internal/ are not offered
+    return sorted(QUERIES_DIR.glob("*.sparql")) if QUERIES_DIR.exists() else []
+
+
+# ============================================================
+# Instance fetchers
+# ============================================================
+def get_instances_of(class_local_name: str) -> list[str]:
+    vars_, rows = run_query_raw(f"""
+    PREFIX onto: <http://example.org/ontomaint#>
+    SELECT DISTINCT ?x
+    WHERE {{ ?x a onto:{class_local_name} . }}
+    ORDER BY ?x
+    """)
+    return [local_name(r[0]) for r in rows] if rows else []
+
+
+def get_failure_like_instances() -> list[str]:
+    vars_, rows = run_query_raw("""
+    PREFIX onto: <http://example.org/ontomaint#>
+    SELECT DISTINCT ?f
+    WHERE {
+      { ?f a onto:ErrorContext . }
+      UNION { ?f onto:affectsMachine ?m . }
+      UNION { ?f onto:blocksJob ?j . }
+      UNION {
+        ?fp a onto:FailurePropagation ;
+            onto:hasCause ?f .
+      }
+    }
+    ORDER BY ?f
+    """)
+    return [local_name(r[0]) for r in rows] if rows else []
+
+
+# ============================================================
+# Sidebar – Query selection
+# ============================================================
+st.sidebar.header("Controls")
+cache_status = st.sidebar.empty()
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def watch_data():
+    """
+    Rerun the page as soon as the live graph has picked up a change to the input files.
+    """
+    live = load_live_graph()
+    if live.version != st.session_state.get("graph_version", live.version):
+        st.rerun()
+    if live.changes:
+        change = live.changes[-1]
+        counts = "full reload" if change["added"] is None else f"+{change['added']} / -{change['removed']} triples"
+        st.caption(f"Data updated at {time.strftime('%H:%M:%S', time.localtime(change['time']))}: "
+                   f"{', '.join(change['files'])} ({counts}, {change['seconds']:.1f} s)")
+    if live.error:
+        st.warning(f"Could not apply data changes: {live.error}")
+
+
+st.session_state["graph_version"] = graph_version()
+with st.sidebar:
+    watch_data()
+
+if st.sidebar.toggle("Profile this run", help="Time each phase of this page: graph load, queries, tables"):
+    trace_memory = st.sidebar.checkbox("Trace memory", help="Peak Python allocations per phase (slow)")
+    start_profile(trace_memory)
+    profile_box = st.sidebar.expander("Profile", expanded=True)
+else:
+    stop_profile()
+
+
+def show_cache_status():
+    stats = load_result_cache().stats()
+    cache_status.caption(
+        f"Graph version `{graph_version()}` · result cache: {stats['hits']} hits / "
+        f"{stats['misses']} misses · {stats['entries']} entries, {stats['cells']:,} cells"
+        + (f" · {stats['evictions']} evicted" if stats["evictions"] else "")
+    )
+
+
+files = list_sparql_files()
+file_names = [f.name for f in files]
+
+query_values = ["__NONE__"] + file_names
+
+selected = st.sidebar.selectbox(
+    "Query",
+    query_values,
+    format_func=lambda v: "— Select a query —" if v == "__NONE__" else pretty_query_label(v),
+)
+
+if selected == "__NONE__":
+    st.info("Select a query from the sidebar to run it.")
+    finish_run()
+    st.stop()
+
+query_name = selected
+query_text = load_registry().text(query_name)
+
+meta = QUERY_PARAMS.get(query_name, {"title": pretty_query_label(query_name), "params": []})
+params = meta["params"]
+
+
+# ============================================================
+# Sidebar – Parameters (with hard-coded batch exclusion)
+# ============================================================
+st.sidebar.divider()
+st.sidebar.subheader("Parameters")
+
+param_values = {}
+
+EXCLUDED_BATCHES = {
+    "Batch_2025_12_001",
+    "Batch_2025_12_002",
+    "Batch_2025_12_003",
+}
+
+if not params:
+    st.sidebar.caption("This query has no parameters.")
+else:
+    for p in params:
+        p_var = p["var"]
+        p_label = p.get("label", p_var)
+        p_type = p.get("type")
+        allow_all = bool(p.get("allow_all", False))
+
+        if p_type == "Machine":
+            options = get_instances_of("Machine")
+            options = [m for m in options if m not in EXCLUDED_BATCHES]
+
+        elif p_type == "ErrorContext":
+            options = get_failure_like_instances()
+        else:
+            options = []
+
+        if not options:
+            st.sidebar.warning(f"No options found for {p_label}.")
+            continue
+
+        if allow_all:
+            options = ["All"] + options
+
+        chosen = st.sidebar.selectbox(
+            p_label,
+            options,
+            key=f"{query_name}:{p_var}",
+        )
+
+        if chosen != "All":
+            param_values[p_var] = chosen
+
+
+# ============================================================
+# Build variable bindings
+# ============================================================
+bindings = {var.lstrip("?"): val for var, val in param_values.items()}
+
+
+# ============================================================
+# Main – Query Result Viewer
+# ============================================================
+st.header("Query Result Viewer")
+st.caption(f"Query: {pretty_query_label(query_name)}")
+
+c1, c2 = st.columns(2)
+show_query = c1.checkbox("Show query text")
+prettify = c2.checkbox("Prettify URIs", value=True)
+
+if show_query:
+    st.code(query_text, language="sparql")
+    if bindings:
+        st.caption("Bindings: " + ", ".join(f"?{var} = onto:{val}" for var, val in bindings.items()))
+
+try:
+    vars_, rows = run_named_query(query_name, bindings)
+    if query_name == "high_risk_failures.sparql":
+        vars_, rows = high_risk_result(rows, prettify)
+
+    if not rows:
+        st.info("Query executed successfully, but returned no results.")
+    else:
+        st.success(f"Returned {len(rows):,} rows.")
+        show_rows(vars_, rows, prettify, key="viewer")
+        download_rows(vars_, rows, Path(query_name).stem, key="viewer")
+
+except Exception as e:
+    st.error("Error executing query")
+    st.code(str(e))
+
+
+# ============================================================
+# Sensor Time Series
+# ============================================================
+st.divider()
+st.header("Sensor Time Series")
+
+with profile_phase("timeseries_load"):
+    store = load_timeseries()
+c1, c2 = st.columns(2)
+since = c1.text_input("From (ISO time)", "").strip() or None
+until = c2.text_input("To (ISO time)", "").strip() or None
+
+try:
+    with profile_phase("timeseries_aggregate") as record:
+        agg_rows = store.aggregates(since, until)
+        record["series"] = len(agg_rows)
+except ValueError as e:
+    st.error(f"Invalid time window: {e}")
+    agg_rows = []
+
+if not agg_rows:
+    st.info("No sensor readings in this window.")
+else:
+    agg_df = pd.DataFrame(
+        agg_rows,
+        columns=["machine", "sensor", "metric", "unit", "count", "min", "max", "mean", "last", "last_time"],
+    )
+    agg_df["machine"] = agg_df["machine"].map(local_name)
+    agg_df["sensor"] = agg_df["sensor"].map(local_name)
+    st.dataframe(agg_df, use_container_width=True, hide_index=True)
+
+    keys = [(m, s, metric) for m, s, metric, *_ in agg_rows]
+    key = st.selectbox(
+        "Series",
+        keys,
+        format_func=lambda k: f"{local_name(k[0])} / {local_name(k[1])} / {k[2]}",
+    )
+    times, values = store.series[key].window(since, until)
+    st.line_chart(pd.DataFrame({key[2]: values}, index=pd.DatetimeIndex(times, name="time")))
+
+
+# ============================================================
+# Machine What-If
+# ============================================================
+st.divider()
+st.header("Machine What-If")
+st.caption("Every machine going down now, ranked by lost batch size, affected jobs and expected downtime.")
+
+with profile_phase("whatif") as record:
+    scenarios_df = pd.DataFrame(machine_scenarios(load_relation_arrays()), columns=SCENARIO_COLUMNS)
+    record["machines"] = len(scenarios_df)
+if scenarios_df.empty:
+    st.info("No machines found.")
+else:
+    scenarios_df["machine"] = scenarios_df["machine"].map(local_name)
+    scenarios_df.insert(0, "rank", range(1, len(scenarios_df) + 1))
+    top = st.number_input("Show top", min_value=1, max_value=len(scenarios_df), value=min(20, len(scenarios_df)))
+    st.dataframe(scenarios_df.head(int(top)), use_container_width=True, hide_index=True)
+
+
+# ============================================================
+# Machine Risk
+# ============================================================
+st.divider()
+st.header("Machine Risk")
+st.caption("Failure rate x age x overdue maintenance x worst severity and downtime of the failures affecting each "
+           "machine; each factor raised to its weight (0 leaves it out).")
+
+with profile_phase("risk_load"):
+    machine_risk = load_machine_risk()
+if not len(machine_risk):
+    st.info("No machine health data available.")
+else:
+    c1, c2 = st.columns(2)
+    risk_date = c1.date_input("As of", key="risk:as_of")
+    risk_top = c2.number_input("Show top", min_value=1, max_value=len(machine_risk),
+                               value=min(20, len(machine_risk)), key="risk:top")
+    weight_columns = st.columns(len(RISK_WEIGHTS))
+    risk_weights = {
+        name: column.slider(name.replace("_", " ").capitalize(), 0.0, 3.0, default, 0.25, key=f"risk:{name}")
+        for column, (name, default) in zip(weight_columns, RISK_WEIGHTS.items())
+    }
+    with profile_phase("risk", machines=len(machine_risk)):
+        as_of = pd.Timestamp(risk_date).to_pydatetime()
+        overdue = machine_risk.overdue_days(as_of)
+        scores = machine_risk.scores(as_of, risk_weights, overdue)
+        risk_rows = machine_risk.rows(top_k(scores, int(risk_top)), scores, overdue)
+    risk_df = pd.DataFrame(risk_rows, columns=RISK_COLUMNS)
+    risk_df["machine"] = risk_df["machine"].map(local_name)
+    risk_df.insert(0, "rank", range(1, len(risk_df) + 1))
+    st.dataframe(risk_df, use_container_width=True, hide_index=True)
+
+
+# ============================================================
+# Materialized Views
+# ============================================================
+st.divider()
+st.header("Materialized Views")
+st.caption("Aggregates kept up to date with every data change by re-evaluating only the keys it affects.")
+
+live_views = load_live_graph().views
+view_name = st.selectbox("View", list(live_views.views))
+with profile_phase("views", view=view_name) as record:
+    view_vars, view_rows = live_views.rows(view_name)
+    record["rows"] = len(view_rows)
+if not view_rows:
+    st.info("This view is empty.")
+else:
+    st.caption(f"{len(live_views.groups[view_name]):,} {live_views.views[view_name].key} key(s), {len(view_rows):,} rows.")
+    show_rows(view_vars, view_rows, key="views")
+
+
+# ============================================================
+# SPARQL Console
+# ============================================================
+st.divider()
+st.header("SPARQL Console")
+
+console_query = st.text_area(
+    "Write SPARQL",
+    """PREFIX onto: <http://example.org/ontomaint#>
+SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 25
+""",
+    height=180,
+)
+
+# remember the last query run, so paging through its result does not lose it
+if st.button("Run console query"):
+    st.session_state["console_query"] = console_query
+
+if "console_query" in st.session_state:
+    sandbox = load_sandbox()
+    status = st.empty()
+    try:
+        # each progress update lets Streamlit stop the run (Stop button, rerun), which kills the query's worker
+        vars_, rows, truncated = run_console_query(
+            st.session_state["console_query"],
+            progress=lambda elapsed: status.caption(
+                f"Running for {elapsed:.0f} s (stopped after {sandbox.timeout:g} s; Stop cancels it)"),
+        )
+        status.empty()
+        if not rows:
+            st.info("No results.")
+        else:
+            st.caption(f"{len(rows):,} rows.")
+            if truncated:
+                st.warning(f"The result has more rows than the console's limit of {sandbox.max_rows:,}; "
+                           "only the first ones are shown.")
+            show_rows(vars_, rows, prettify=True, key="console")
+            download_rows(vars_, rows, "query", key="console")
+    except QueryAborted as e:
+        status.empty()
+        st.error(str(e))
+    except Exception as e:
+        status.empty()
+        st.error("Console query error")
+        st.code(str(e))
+
+finish_run()
@@ -0,0 +1,139 @@
+import csv
+import json
+from decimal import Decimal
+from pathlib import Path
+
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+SUFFIXES = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet"}
+MIME_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+# Rows per Parquet row group; also all that is held in memory at a time.
+PARQUET_BATCH_ROWS = 10_000
+
+
+def text_value(value) -> str:
+    """
+    Cell as text: URIs in full, literals by their lexical form, unbound as "".
+    """
+    return "" if value is None else str(value)
+
+
+def json_value(value):
+    """
+    Cell as a JSON value: numbers and booleans (also numeric and boolean
+    literals, NumPy scalars) as such, everything else as text, unbound as null.
+    """
+    if getattr(value, "dtype", None) is not None and value.dtype.kind in "biuf":
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if getattr(value, "datatype", None) is not None:
+        python = value.toPython()
+        if isinstance(python, (bool, int)):
+            return python
+        if isinstance(python, (float, Decimal)):
+            return float(python)
+    return str(value)
+
+
+def write_csv(columns, rows, file) -> int:
+    writer = csv.writer(file)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([text_value(v) for v in row])
+        count += 1
+    return count
+
+
+def write_jsonl(columns, rows, file) -> int:
+    count = 0
+    for row in rows:
+        file.write(json.dumps(dict(zip(columns, map(json_value, row)))) + "\n")
+        count += 1
+    return count
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_parquet(columns, rows, file) -> int:
+    """
+    Write rows as Parquet, PARQUET_BATCH_ROWS at a time. Column types come from
+    the first batch (numbers, booleans, else strings); a column that is typed
+    in the first batch and holds something else later is an error.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow).") from None
+
+    def column(name, values, type_=None):
+        values = [json_value(v) for v in values]
+        if type_ is None:
+            try:
+                array = pa.array(values)
+                if not pa.types.is_null(array.type):
+                    return array
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        elif not pa.types.is_string(type_):
+            try:
+                return pa.array(values, type=type_)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                raise ValueError(f"Column {name} holds values that are not {type_} after the first "
+                                 f"{PARQUET_BATCH_ROWS:,} rows; export as csv or jsonl instead.") from None
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+    writer, schema, count = None, None, 0
+    for batch in _batches(rows, PARQUET_BATCH_ROWS):
+        cells = zip(columns, zip(*batch))
+        if schema is None:
+            table = pa.table([column(name, values) for name, values in cells], names=columns)
+            schema = table.schema
+            writer = pq.ParquetWriter(file, schema)
+        else:
+            table = pa.table([column(name, values, field.type) for (name, values), field in zip(cells, schema)],
+                             schema=schema)
+        writer.write_table(table)
+        count += len(batch)
+
+    if writer is None:
+        writer = pq.ParquetWriter(file, pa.schema([(name, pa.string()) for name in columns]))
+    writer.close()
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export_rows(columns, rows, fmt: str, target) -> int:
+    """
+    Write result rows as csv, jsonl or parquet to target: a path, or an open
+    text stream such as sys.stdout (Parquet goes to its binary buffer).
+    rows may be any iterable and is consumed lazily, so a generator is
+    exported in bounded memory. Returns the number of rows written.
+    """
+    columns = [str(c).lstrip("?") for c in columns]
+    if isinstance(target, (str, Path)):
+        if fmt == "parquet":
+            with open(target, "wb") as f:
+                return write_parquet(columns, rows, f)
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            return WRITERS[fmt](columns, rows, f)
+
+    if fmt == "parquet":
+        return write_parquet(columns, rows, getattr(target, "buffer", target))
+    count = WRITERS[fmt](columns, rows, target)
+    target.flush()
+    return count
@@ -1,42 +1,403 @@
+import hashlib
+import pickle
+import sqlite3
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+import owlrl
+import rdflib
 from rdflib import Graph
 from owlrl import DeductiveClosure, OWLRL_Semantics
 
+from bulk_load import is_rdf_file, load_files, throughput
+from config import DEFAULT_REASONING, DEFAULT_STORE, REASONING_MODES, SNAPSHOT_DIR, SNAPSHOT_SUFFIXES, STORES
+from query_registry import QueryRegistry, iter_select, query_files
+from reasoning import ChangeJournal, IncrementalReasoner, TargetedReasoner, query_vocabulary
+from sqlite_store import SQLiteStore
+
+if TYPE_CHECKING:
+    from term_dictionary import TermDictionary
+
+
+SNAPSHOT_FORMAT = 2
+QUERIES_DIR = Path(__file__).resolve().parent / "queries"
+
+
+def input_files(base_dir: Path) -> list[Path]:
+    """
+    All RDF files that make up the graph (.ttl, .nt, .nq, optionally gzipped), in load order:
+    ontologies/, then data/ including its subdirectories (e.g. one per plant, see sharding.py).
+    """
+    files = []
+    if (base_dir / "ontologies").exists():
+        files += sorted(p for p in (base_dir / "ontologies").iterdir() if p.is_file() and is_rdf_file(p))
+    if (base_dir / "data").exists():
+        files += sorted(p for p in (base_dir / "data").rglob("*") if p.is_file() and is_rdf_file(p))
+    return files
+
+
+def input_fingerprint(base_dir: Path, reasoning: str = DEFAULT_REASONING, queries_dir: Path = QUERIES_DIR,
+                      files: list[Path] = None) -> str:
+    """
+    Content hash of every input file (or only the given ones) plus the rdflib/owlrl versions.
+    Any change to the data, the ontology or the reasoner invalidates it.
+    A targeted closure also depends on the named queries, so they are hashed too.
+    """
+    h = hashlib.sha256()
+    h.update(f"format={SNAPSHOT_FORMAT};rdflib={rdflib.__version__};owlrl={owlrl.__version__}".encode())
+    files = list(input_files(base_dir) if files is None else files)
+    if reasoning != "owlrl":
+        h.update(f";reasoning={reasoning}".encode())
+        files += query_files(queries_dir)
+    for path in files:
+        h.update(path.name.encode() if path.suffix == ".sparql" else path.relative_to(base_dir).as_posix().encode())
+        h.update(b"\0")
+        h.update(path.read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def input_signature(base_dir: Path, extra_files=()) -> tuple:
+    """
+    Cheap change detector: (path, mtime, size) of every input file.
+    Compare signatures to notice edits without hashing file contents.
+    """
+    signature = []
+    for path in list(input_files(base_dir)) + list(extra_files):
+        stat = path.stat()
+        signature.append((path.relative_to(base_dir).as_posix(), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def snapshot_path(base_dir: Path, fingerprint: str, store: str = DEFAULT_STORE) -> Path:
+    return base_dir / SNAPSHOT_DIR / f"graph-{fingerprint[:16]}{SNAPSHOT_SUFFIXES[store]}"
+
 
 class OntoMaintGraph:
-    def __init__(self):
+    # Callables listener(event, info) told about every timed graph operation:
+    # parse, load, reasoning, delta, snapshot_load, snapshot_save, prepare, evaluate, query.
+    # info always has "seconds", plus counts such as triples or rows.
+    listeners = []
+
+    @classmethod
+    def subscribe(cls, listener):
+        cls.listeners.append(listener)
+
+    @classmethod
+    def unsubscribe(cls, listener):
+        if listener in cls.listeners:
+            cls.listeners.remove(listener)
+
+    def _emit(self, event: str, started: float, **info):
+        info["seconds"] = time.perf_counter() - started
+        self._notify(event, info)
+
+    def _notify(self, event: str, info: dict):
+        for listener in list(self.listeners):
+            listener(event, info)
+
+    def __init__(self, reasoning: str = DEFAULT_REASONING, queries_dir: Path = QUERIES_DIR,
+                 store: str = DEFAULT_STORE):
+        if reasoning not in REASONING_MODES:
+            raise ValueError(f"Unknown reasoning mode {reasoning!r}; expected one of {', '.join(REASONING_MODES)}")
+        if store not in STORES:
+            raise ValueError(f"Unknown store {store!r}; expected one of {', '.join(STORES)}")
         self.graph = Graph()
+        self._asserted = set()
+        self.reasoned = False
+        self.reasoning = reasoning
+        self.queries_dir = queries_dir
+        self.store = store
+        self._reasoner = None
+        self._vocabulary = None
+        self._lazy_vocabulary = None
 
-    def load_ontologies_and_data(self, base_dir: Path):
+    @property
+    def asserted(self) -> set:
         """
-        Load all .ttl files from ontologies/ and data/ into the graph.
+        The asserted (pre-reasoning) triples. A graph opened from an SQLite
+        store only reads them when first needed (incremental reasoning).
         """
-        ont_dir = base_dir / "ontologies"
-        data_dir = base_dir / "data"
-
-        #print(f"Ontology dir: {ont_dir} exists={ont_dir.exists()}")
-        #print(f"Data dir:     {data_dir} exists={data_dir.exists()}")
+        if self._asserted is None:
+            self._asserted = set(self.graph.store.asserted())
+        return self._asserted
 
-        for ttl in ont_dir.glob("*.ttl"):
-            #print(f"Loading ontology: {ttl}")
-            self.graph.parse(ttl, format="turtle")
+    def load_ontologies_and_data(self, base_dir: Path, workers: int = None, files: list[Path] = None):
+        """
+        Load all RDF files from ontologies/ and data/ (or only the given ones) into the graph, parsing
+        them in a process pool of the given size (default: one per CPU, at most one per file).
+        """
+        def parsed(path, triples, seconds):
+            self._notify("parse", {"file": path.name, "triples": triples, "seconds": seconds})
 
-        for ttl in data_dir.glob("*.ttl"):
-            #print(f"Loading data: {ttl}")
-            self.graph.parse(ttl, format="turtle")
+        started = time.perf_counter()
+        stats = load_files(self.graph, input_files(base_dir) if files is None else files, workers, on_file=parsed)
+        self.asserted.update(self.graph)
+        self._emit("load", started, files=stats["files"], triples=len(self.graph))
 
-        print(f"Graph loaded with {len(self.graph)} triples.")
+        print(f"Graph loaded with {len(self.graph)} triples "
+              f"({stats['files']} files, {throughput(stats):,.0f} triples/s).")
 
     def apply_reasoning(self):
         """
-        Apply OWL RL reasoning to materialize inferred triples.
+        Apply OWL RL reasoning to materialize inferred triples: the full
+        closure, or in "targeted" mode only what the named queries can see.
         """
-        print("Running OWL RL reasoning...")
-        DeductiveClosure(OWLRL_Semantics).expand(self.graph)
+        started, before = time.perf_counter(), len(self.graph)
+        mode = self.reasoning
+        self._reasoner = None
+        if mode == "targeted":
+            reasoner = self._targeted_reasoner()
+            if reasoner.supported:
+                print(f"Running targeted reasoning ({reasoner.rule_count()} rules)...")
+                reasoner.expand()
+                self._reasoner = reasoner
+            else:
+                print("The ontology uses constructs targeted reasoning does not cover; using full OWL RL.")
+                mode = "owlrl"
+        if mode == "owlrl":
+            print("Running OWL RL reasoning...")
+            DeductiveClosure(OWLRL_Semantics).expand(self.graph)
+        self.reasoned = True
+        self._emit("reasoning", started, mode=mode, triples_before=before, triples_after=len(self.graph))
         print(f"After reasoning: {len(self.graph)} triples.")
 
+    def reason_for_queries(self, algebras) -> int:
+        """
+        Lazy reasoning for an unreasoned graph: materialize only what the given
+        queries (prepared query algebras) can observe, on top of what earlier
+        calls materialized. Returns the number of inferred triples; 0 means the
+        queries read nothing reasoning would add and run on the asserted graph alone.
+        """
+        if self.reasoned:
+            return 0
+        started, before = time.perf_counter(), len(self.graph)
+        predicates, classes, is_open = query_vocabulary(algebras)
+        if self._lazy_vocabulary is not None:
+            predicates |= self._lazy_vocabulary[0]
+            classes |= self._lazy_vocabulary[1]
+        reasoner = TargetedReasoner(self.graph, self.asserted, predicates, classes, is_open)
+        if is_open or not reasoner.supported:
+            self.apply_reasoning()
+            return len(self.graph) - before
+
+        rules = reasoner.rule_count()
+        if rules:
+            reasoner.expand()
+        self._lazy_vocabulary = (predicates, classes)
+        self._emit("lazy_reasoning", started, rules=rules, triples_before=before, triples_after=len(self.graph))
+        return len(self.graph) - before
+
+    def _targeted_reasoner(self) -> TargetedReasoner:
+        if self._vocabulary is None:
+            registry = QueryRegistry(self.queries_dir)
+            names = registry.names(internal=True)
+            self._vocabulary = query_vocabulary(registry.prepared(name).algebra for name in names)
+        predicates, classes, is_open = self._vocabulary
+        return TargetedReasoner(self.graph, self.asserted, predicates, classes, is_open)
+
+    def apply_delta(self, added=(), removed=()):
+        """
+        Add and/or remove asserted triples, keeping the reasoned closure up to date.
+        Instance-data deltas are materialized incrementally; schema changes
+        (or ontologies the incremental rules do not cover) trigger a full re-run.
+
+        Returns the (added, removed) sets of triples by which the graph changed,
+        inferences included, or None after a full re-run.
+        """
+        added = [t for t in added if t not in self.asserted]
+        removed = [t for t in removed if t in self.asserted]
+        if not added and not removed:
+            return set(), set()
+
+        if not self.reasoned:
+            self.asserted.difference_update(removed)
+            self.asserted.update(added)
+            for t in removed:
+                self.graph.remove(t)
+            for t in added:
+                self.graph.add(t)
+            return set(added), set(removed)
+
+        if self._reasoner is None:
+            if self.reasoning == "targeted":
+                self._reasoner = self._targeted_reasoner()
+            else:
+                self._reasoner = IncrementalReasoner(self.graph, self.asserted)
+
+        if not self._reasoner.accepts(added + removed):
+            print("Delta touches the schema; re-running full reasoning...")
+            self.asserted.difference_update(removed)
+            self.asserted.update(added)
+            self.graph = Graph()
+            self.graph.addN((s, p, o, self.graph) for s, p, o in self.asserted)
+            self.apply_reasoning()
+            return None
+
+        started = time.perf_counter()
+        journal = self._reasoner.journal = ChangeJournal()
+        try:
+            removed_count = self._reasoner.remove(removed) if removed else 0
+            added_count = self._reasoner.add(added) if added else 0
+        finally:
+            self._reasoner.journal = None
+        self._emit("delta", started, added=added_count, removed=removed_count, triples=len(self.graph))
+        print(f"Incremental reasoning: +{added_count} / -{removed_count} triples, now {len(self.graph)}.")
+        return journal.added, journal.removed
+
+    def load_data_file(self, path: Path):
+        """
+        Parse one additional data file and merge it into the (reasoned) graph.
+        Returns the change to the graph as apply_delta does.
+        """
+        delta = Graph()
+        load_files(delta, [path], workers=1)
+        return self.apply_delta(added=list(delta))
+
+    def save_snapshot(self, path: Path):
+        """
+        Write the current (reasoned) graph to a snapshot: pickled for a .pickle
+        path, an SQLite store for a .sqlite one. Older snapshots in the same
+        directory are removed.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        if path.suffix == ".sqlite":
+            SQLiteStore.write(path, self.graph, self.asserted, self.graph.namespaces())
+        else:
+            tmp = path.with_suffix(".tmp")
+            inferred = [t for t in self.graph if t not in self.asserted]
+            with tmp.open("wb") as f:
+                pickle.dump((list(self.asserted), inferred), f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(path)
+        self._emit("snapshot_save", started, triples=len(self.graph))
+
+        for old in path.parent.glob("graph-*"):
+            if old != path and old.suffix in SNAPSHOT_SUFFIXES.values():
+                old.unlink()
+
+    def load_snapshot(self, path: Path) -> bool:
+        """
+        Load a snapshot written by save_snapshot. Returns False if it is missing or unreadable.
+        An SQLite snapshot is opened in place rather than read into memory;
+        changes made to the graph afterwards are not committed to it.
+        """
+        started = time.perf_counter()
+        if path.suffix == ".sqlite":
+            return self._open_store(path, started)
+        try:
+            with path.open("rb") as f:
+                asserted, inferred = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return False
+
+        self.asserted.update(asserted)
+        self.graph.addN((s, p, o, self.graph) for s, p, o in asserted)
+        self.graph.addN((s, p, o, self.graph) for s, p, o in inferred)
+        self.reasoned = True
+        self._emit("snapshot_load", started, triples=len(self.graph))
+        print(f"Graph loaded from snapshot with {len(self.graph)} triples.")
+        return True
+
+    def _open_store(self, path: Path, started: float) -> bool:
+        if not path.exists():
+            return False
+        try:
+            graph = Graph(store=SQLiteStore(path))
+            triples = len(graph)
+        except sqlite3.DatabaseError:
+            return False
+
+        self.graph = graph
+        self._asserted = None
+        self._reasoner = None
+        self.reasoned = True
+        self._emit("snapshot_load", started, store="sqlite", triples=triples)
+        print(f"Graph opened from store {path.name} with {triples} triples.")
+        return True
+
+    def load_reasoned(self, base_dir: Path, use_snapshot: bool = True, workers: int = None):
+        """
+        Load the reasoned graph, reusing the on-disk snapshot when it matches
+        the current input files and rebuilding (and re-saving) it otherwise.
+        """
+        if not use_snapshot:
+            self.load_ontologies_and_data(base_dir, workers)
+            self.apply_reasoning()
+            return
+
+        path = snapshot_path(base_dir, input_fingerprint(base_dir, self.reasoning, self.queries_dir), self.store)
+        if path.exists() and self.load_snapshot(path):
+            return
+
+        self.load_ontologies_and_data(base_dir, workers)
+        self.apply_reasoning()
+        try:
+            self.save_snapshot(path)
+        except OSError as e:
+            print(f"Could not write snapshot {path}: {e}")
+
     def run_query(self, query_str: str):
-        return list(self.graph.query(query_str))
+        started = time.perf_counter()
+        rows = list(self.graph.query(query_str))
+        self._emit("query", started, rows=len(rows))
+        return rows
+
+    def run_named_query(self, registry, name: str, bindings: dict = None):
+        """
+        Run a prepared query from a QueryRegistry with the given variable bindings.
+        """
+        print("Running query:", name)
+        started = time.perf_counter()
+        registry.prepared(name)
+        self._emit("prepare", started, query=name)
+
+        started = time.perf_counter()
+        rows = list(registry.execute(self.graph, name, bindings))
+        self._emit("evaluate", started, query=name, rows=len(rows))
+        return rows
+
+    def term_dictionary(self) -> "TermDictionary":
+        """
+        The graph's terms numbered, with their local names, and its triples
+        as integer ID arrays (see TermDictionary). Built on every call: keep
+        it for as long as the graph does not change.
+        """
+        from term_dictionary import TermDictionary
+
+        started = time.perf_counter()
+        terms = TermDictionary.from_graph(self.graph)
+        self._emit("term_dictionary", started, triples=len(self.graph), terms=len(terms))
+        return terms
+
+    def _timed_rows(self, rows, started: float, event: str, **info):
+        count = 0
+        for row in rows:
+            count += 1
+            yield row
+        self._emit(event, started, rows=count, **info)
+
+    def iter_query(self, query, bindings: dict = None):
+        """
+        (variable names, rows) of a SELECT query (text or prepared), rows
+        streamed as evaluated; the query event fires once they are consumed.
+        """
+        started = time.perf_counter()
+        variables, rows = iter_select(self.graph, query, bindings)
+        return variables, self._timed_rows(rows, started, "query")
+
+    def iter_named_query(self, registry, name: str, bindings: dict = None):
+        """
+        Streaming run_named_query: (variable names, rows) as iter_query.
+        """
+        started = time.perf_counter()
+        registry.prepared(name)
+        self._emit("prepare", started, query=name)
+
+        started = time.perf_counter()
+        variables, rows = registry.iter_rows(self.graph, name, bindings)
+        return variables, self._timed_rows(rows, started, "evaluate", query=name)
 
     def run_query_from_file(self, query_file: Path, filter_clause: str = ""):
         text = query_file.read_text(encoding="utf-8")
@@ -0,0 +1,217 @@
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from rdflib import BNode
+
+from bulk_load import parse_file
+from config import DEFAULT_REASONING
+from graph_manager import QUERIES_DIR, OntoMaintGraph, input_fingerprint, input_signature, snapshot_path
+from query_registry import QueryRegistry
+from views import MaterializedViews, views_path
+
+
+# Seconds between checks of the input files for changes.
+POLL_SECONDS = 2.0
+
+
+def _file_stats(base_dir: Path) -> dict:
+    return {path: (mtime, size) for path, mtime, size in input_signature(base_dir)}
+
+
+def _file_stats_of(path: Path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _has_blank_nodes(triples) -> bool:
+    return any(isinstance(term, BNode) for triple in triples for term in triple)
+
+
+class LiveGraph:
+    """
+    A reasoned OntoMaintGraph kept in step with the files in ontologies/ and
+    data/ while it is being queried.
+
+    A watcher thread polls the files' mtime and size. For each changed file
+    it diffs the triples the file holds now against the ones it held before
+    (per-file provenance) and applies only that difference, with incremental
+    reasoning, so a change costs about the same however large the graph is.
+
+    Two copies of the graph are kept. A change is applied to the standby
+    copy, which then becomes the one readers get; the other copy gets the
+    same change once the readers still using it are done. Readers never wait
+    for a change nor see one half applied, for twice the memory.
+
+    The materialized views (views.py) follow the graph: a change updates a
+    copy of them with the triples it added and removed, swapped in together
+    with the standby copy of the graph.
+    """
+
+    def __init__(self, base_dir: Path, reasoning: str = DEFAULT_REASONING, poll_seconds: float = POLL_SECONDS):
+        self.base_dir = base_dir
+        self.reasoning = reasoning
+        self.poll_seconds = poll_seconds
+        self.registry = QueryRegistry(QUERIES_DIR)
+        # {"time", "files", "added", "removed", "seconds"} of every change applied, newest last;
+        # added/removed are None when the change needed a full reload
+        self.changes = []
+        self.error = None
+        self._cond = threading.Condition()
+        self._readers = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._load()
+
+    def _load(self):
+        """
+        (Re)load the reasoned graph from scratch; _prepare then builds provenance and the standby copy.
+        """
+        stats = _file_stats(self.base_dir)
+        fingerprint = input_fingerprint(self.base_dir, self.reasoning)
+        graph = OntoMaintGraph(self.reasoning)
+        graph.load_reasoned(self.base_dir)
+        views = MaterializedViews.load(views_path(self.base_dir, fingerprint), self.registry)
+        if views is None:
+            views = MaterializedViews(self.registry).build(graph.graph)
+            self._save_views(views, fingerprint)
+        with self._cond:
+            self._active, self.views, self.version = graph, views, fingerprint[:16]
+        self._stats = stats
+        self._sources = None
+        self._standby = None
+
+    def _prepare(self):
+        """
+        Parse every file once for its provenance and copy the graph for the standby side.
+        A file that changed since the graph was loaded has unknown provenance (None).
+        """
+        sources = {}
+        for name, stat in self._stats.items():
+            path = self.base_dir / name
+            triples = set(parse_file(path)[0])
+            sources[name] = triples if _file_stats_of(path) == stat else None
+        self._sources = sources
+
+        active = self._active
+        standby = OntoMaintGraph(self.reasoning)
+        standby.graph.addN((s, p, o, standby.graph) for s, p, o in active.graph)
+        standby.asserted.update(active.asserted)
+        standby.reasoned = True
+        self._standby = standby
+
+    @contextmanager
+    def reading(self):
+        """
+        The current OntoMaintGraph, left unmodified until the block ends.
+        """
+        with self._cond:
+            graph = self._active
+            self._readers[graph] = self._readers.get(graph, 0) + 1
+        try:
+            yield graph
+        finally:
+            with self._cond:
+                self._readers[graph] -= 1
+                self._cond.notify_all()
+
+    # ------------------------------------------------------------
+    # Watching for changes
+    # ------------------------------------------------------------
+    def start(self) -> "LiveGraph":
+        self._thread = threading.Thread(target=self._watch, name="ontomaint-live-graph", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _watch(self):
+        while not self._stop.is_set():
+            try:
+                if self._sources is None:
+                    self._prepare()
+                self.refresh()
+                self.error = None
+            except Exception as e:
+                # e.g. a file caught half-written; it is read again on the next poll
+                self.error = f"{type(e).__name__}: {e}"
+            self._stop.wait(self.poll_seconds)
+
+    def refresh(self) -> bool:
+        """
+        Apply the changes made to the input files since the last refresh. True if there were any.
+        """
+        if self._sources is None:
+            self._prepare()
+        stats = _file_stats(self.base_dir)
+        changed = sorted(name for name in stats.keys() | self._stats.keys() if stats.get(name) != self._stats.get(name))
+        if not changed:
+            return False
+
+        started = time.perf_counter()
+        fingerprint = input_fingerprint(self.base_dir, self.reasoning)
+        new_sources = {name: set(parse_file(self.base_dir / name)[0]) if name in stats else set() for name in changed}
+        old_sources = [self._sources.get(name, set()) for name in changed]
+        if any(old is None or _has_blank_nodes(old) or _has_blank_nodes(new_sources[name])
+               for name, old in zip(changed, old_sources)):
+            # no provenance to diff against, or blank node labels that differ between parses
+            self._load()
+            self._prepare()
+            self._record(changed, None, None, started)
+            return True
+
+        added, removed = set(), set()
+        for name, old in zip(changed, old_sources):
+            added |= new_sources[name] - old
+            removed |= old - new_sources[name]
+        # a triple another file still states stays asserted
+        others = [triples for name, triples in self._sources.items() if name not in new_sources]
+        removed = [t for t in removed if not any(t in triples for triples in others + list(new_sources.values()))]
+        self._apply(list(added), removed, fingerprint[:16])
+
+        for name in changed:
+            if name in stats:
+                self._sources[name] = new_sources[name]
+            else:
+                self._sources.pop(name, None)
+        self._stats = stats
+        self._record(changed, len(added), len(removed), started)
+
+        # only when nothing changed again meanwhile is the graph exactly these inputs
+        if _file_stats(self.base_dir) == stats:
+            self._save_snapshot(fingerprint)
+        return True
+
+    def _apply(self, added: list, removed: list, version: str):
+        standby = self._standby
+        delta = standby.apply_delta(added, removed)
+        views = self.views.copy()
+        views.update(standby.graph, delta)
+        with self._cond:
+            previous, self._active, self.views, self.version = self._active, standby, views, version
+            self._cond.wait_for(lambda: not self._readers.get(previous))
+            self._readers.pop(previous, None)
+        previous.apply_delta(added, removed)
+        self._standby = previous
+
+    def _record(self, changed: list, added, removed, started: float):
+        self.changes.append({"time": time.time(), "files": changed, "added": added, "removed": removed,
+                             "seconds": time.perf_counter() - started})
+
+    def _save_snapshot(self, fingerprint: str):
+        graph = self._active
+        try:
+            graph.save_snapshot(snapshot_path(self.base_dir, fingerprint, graph.store))
+        except OSError as e:
+            print(f"Could not write snapshot: {e}")
+        self._save_views(self.views, fingerprint)
+
+    def _save_views(self, views: MaterializedViews, fingerprint: str):
+        try:
+            views.save(views_path(self.base_dir, fingerprint))
+        except OSError as e:
+            print(f"Could not write views: {e}")
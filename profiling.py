@@ -0,0 +1,138 @@
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    Records wall time per phase (load, reasoning, SPARQL parse/evaluate,
+    output formatting...) plus whatever counts the phase reports: triples,
+    rows. Phases nest; a record's phase is its path, e.g.
+    "command:production/query:production_impact_analysis.sparql/evaluate".
+
+    Subscribe it to OntoMaintGraph (OntoMaintGraph.subscribe(profiler.event))
+    to get the graph's own parse/reasoning/snapshot/query events as phases.
+    With trace_memory, each record also holds the peak traced Python
+    allocation during the phase (tracemalloc slows everything down noticeably).
+    With cprofile, the whole run is also profiled function by function.
+    Only events from the thread that started the profiler are recorded, so
+    concurrent users of a shared graph (dashboard sessions) do not mix in.
+    """
+
+    def __init__(self, trace_memory: bool = False, cprofile: bool = False):
+        self.records = []
+        self.trace_memory = trace_memory
+        self._stack = []
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._started = None
+        self._thread = None
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        self._thread = threading.get_ident()
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self._started is None:
+            return
+        self.records.append({"phase": "total", "seconds": time.perf_counter() - self._started})
+        self._started = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _path(self, name: str) -> str:
+        return "/".join(self._stack + [name])
+
+    @contextmanager
+    def phase(self, name: str, **info):
+        """
+        Time the enclosed block as a phase. The yielded dict is stored with the
+        record, so the block can add counts it only knows at the end (rows=...).
+        """
+        record = {"phase": self._path(name), "seconds": None, **info}
+        self.records.append(record)
+        self._stack.append(name)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if tracing:
+                record["peak_mb"] = (tracemalloc.get_traced_memory()[1] - before) / 1e6
+            self._stack.pop()
+
+    def event(self, name: str, info: dict):
+        """
+        OntoMaintGraph listener: store a timed graph event as a phase of whatever phase is open.
+        """
+        if threading.get_ident() != self._thread:
+            return
+        self.records.append({"phase": self._path(name), **info})
+
+    # ------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------
+    def cprofile_stats(self, limit: int = 25) -> str:
+        if self._cprofile is None:
+            return ""
+        out = io.StringIO()
+        pstats.Stats(self._cprofile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def dump_cprofile(self, path):
+        """
+        Write the raw cProfile stats (for snakeviz, pstats, ...).
+        """
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(str(path))
+
+    def report_jsonl(self, file=None):
+        file = file or sys.stderr
+        for record in self.records:
+            file.write(json.dumps(record, default=str) + "\n")
+
+    def report_table(self, file=None):
+        file = file or sys.stderr
+        extras = []
+        for record in self.records:
+            extras += [k for k in record if k not in ("phase", "seconds") and k not in extras]
+
+        width = max([len("Phase")] + [len(r["phase"]) for r in self.records])
+        file.write(f"\n{'Phase':<{width}} {'Seconds':>10}  {'Details'}\n")
+        file.write("-" * (width + 40) + "\n")
+        for record in self.records:
+            seconds = record.get("seconds")
+            details = "  ".join(f"{k}={_short(record[k])}" for k in extras if record.get(k) is not None)
+            file.write(f"{record['phase']:<{width}} {'' if seconds is None else f'{seconds:.4f}':>10}  {details}\n")
+
+        stats = self.cprofile_stats()
+        if stats:
+            file.write("\n" + stats)
+
+    def report(self, fmt: str = "table", file=None):
+        if fmt == "jsonl":
+            self.report_jsonl(file)
+        else:
+            self.report_table(file)
+
+
+def _short(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
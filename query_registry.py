@@ -0,0 +1,153 @@
+import threading
+from pathlib import Path
+
+
+ONTO = "http://example.org/ontomaint#"
+
+# rdflib's SPARQL parser is not thread-safe; queries are parsed one at a time
+# (evaluating them concurrently is fine).
+PARSE_LOCK = threading.Lock()
+
+# Subdirectory of the queries directory with the queries the analyses run
+# themselves (cascade index, materialized views, scheduler) rather than
+# offer as analyses; they are run by name like the others.
+INTERNAL_DIR = "internal"
+
+# Characters an IRI cannot hold (those rdflib checks before serializing one).
+INVALID_IRI_CHARS = frozenset('<>" {}|\\^`')
+
+
+def to_term(value):
+    """
+    Turn a binding value into an RDF term: full URIs and local names
+    (e.g. 'MixerA' -> onto:MixerA) become URIRefs, terms (literals too) are kept as-is.
+    """
+    from rdflib import URIRef
+    from rdflib.term import Node
+
+    if isinstance(value, Node) or not isinstance(value, str):
+        return value
+    if "://" in value:
+        return URIRef(value)
+    return URIRef(ONTO + value)
+
+
+def is_iri(value: str) -> bool:
+    """
+    Whether to_term(value) is an IRI that can be written into query text
+    (none of the characters rdflib refuses to serialize in one).
+    """
+    return bool(value) and not any(c in INVALID_IRI_CHARS for c in value)
+
+
+def prepare_text(text: str):
+    """
+    Parse ad-hoc query text. Besides its own PREFIXes it may use onto: and
+    rdflib's default prefixes (rdf, rdfs, owl, xsd, ...).
+    """
+    from rdflib import Graph
+    from rdflib.plugins.sparql import prepareQuery
+
+    with PARSE_LOCK:
+        return prepareQuery(text, initNs={**dict(Graph().namespaces()), "onto": ONTO})
+
+
+def iter_select(graph, query, bindings: dict = None):
+    """
+    (variable names, rows) of a SELECT query, a prepared query or query text.
+    Rows are tuples of terms (None if unbound) produced as rdflib evaluates
+    them, instead of being collected in a Result first, so a caller that
+    writes them out as they come holds one row at a time (ORDER BY, DISTINCT
+    and aggregates still hold what they need).
+    """
+    from rdflib.plugins.sparql.evaluate import evalQuery
+
+    if isinstance(query, str):
+        query = prepare_text(query)
+    if query.algebra.name != "SelectQuery":
+        raise ValueError(f"Only SELECT queries produce rows, not {query.algebra.name}")
+    init = {k.lstrip("?"): to_term(v) for k, v in (bindings or {}).items()}
+    result = evalQuery(graph, query, init)
+    variables = result["vars_"]
+    return [str(v) for v in variables], (tuple(row.get(v) for v in variables) for row in result["bindings"])
+
+
+def query_files(queries_dir: Path, internal: bool = True) -> list[Path]:
+    """
+    The .sparql files of a queries directory, then (with internal) of its INTERNAL_DIR.
+    """
+    files = sorted(queries_dir.glob("*.sparql"))
+    return files + sorted((queries_dir / INTERNAL_DIR).glob("*.sparql")) if internal else files
+
+
+class QueryRegistry:
+    """
+    Named queries from queries/*.sparql and queries/internal/*.sparql, read,
+    parsed and translated to SPARQL algebra once per process. Parameters are passed as variable
+    bindings (initBindings), so evaluation starts from the bound nodes
+    instead of filtering every solution afterwards.
+    """
+
+    def __init__(self, queries_dir: Path):
+        self.queries_dir = queries_dir
+        self._texts = {}
+        self._prepared = {}
+
+    def names(self, internal: bool = False) -> list[str]:
+        """
+        Names of the analysis queries, and with internal those in INTERNAL_DIR too.
+        """
+        return sorted(p.name for p in query_files(self.queries_dir, internal))
+
+    def text(self, name: str) -> str:
+        if name not in self._texts:
+            for directory in (self.queries_dir, self.queries_dir / INTERNAL_DIR):
+                path = directory / name
+                if path.suffix == ".sparql" and path.parent == directory and path.exists():
+                    self._texts[name] = path.read_text(encoding="utf-8")
+                    break
+            else:
+                raise KeyError(name)
+        return self._texts[name]
+
+    def prepared(self, name: str):
+        if name not in self._prepared:
+            # rdflib's SPARQL parser takes a good part of startup to import; only pay for it when parsing
+            from rdflib.plugins.sparql import prepareQuery
+
+            with PARSE_LOCK:
+                if name not in self._prepared:
+                    self._prepared[name] = prepareQuery(self.text(name))
+        return self._prepared[name]
+
+    def prepared_with_values(self, name: str, variable: str, values):
+        """
+        A named query with VALUES ?variable { ... } over the given URIs or
+        local names (each one is_iri), to answer many bindings in one
+        evaluation. The block goes first in the WHERE pattern: rdflib
+        evaluates joins in the order they are written, so every value is then
+        looked up by index rather than matched against all solutions of the
+        rest. Not cached.
+        """
+        from rdflib.plugins.sparql import prepareQuery
+
+        text = self.text(name)
+        if "WHERE {" not in text:
+            raise ValueError(f"{name} has no WHERE {{ ... }} pattern to add VALUES to")
+        block = f"VALUES ?{variable.lstrip('?')} {{ {' '.join(to_term(v).n3() for v in values)} }}"
+        with PARSE_LOCK:
+            return prepareQuery(text.replace("WHERE {", "WHERE {\n  " + block, 1))
+
+    def execute(self, graph, name: str, bindings: dict = None):
+        """
+        Evaluate a named query on an rdflib Graph. bindings maps variable
+        names (with or without '?') to URIs, local names or RDF terms.
+        """
+        init = {k.lstrip("?"): to_term(v) for k, v in (bindings or {}).items()}
+        return graph.query(self.prepared(name), initBindings=init)
+
+    def iter_rows(self, graph, name: str, bindings: dict = None):
+        """
+        Like execute, but (variable names, row generator); see iter_select.
+        """
+        return iter_select(graph, self.prepared(name), bindings)
@@ -0,0 +1,488 @@
+from collections import defaultdict
+
+from rdflib import BNode, Literal, URIRef
+from rdflib.namespace import OWL, RDF, RDFS
+from rdflib.paths import NegatedPath, Path
+from rdflib.plugins.sparql.parserutils import CompValue
+from owlrl.AxiomaticTriples import OWLRL_Datatypes_Disjointness
+from owlrl.XsdDatatypes import OWL_RL_Datatypes, OWL_Datatype_Subsumptions
+
+
+SCHEMA_NAMESPACES = (str(RDF), str(RDFS), str(OWL))
+
+# Ontology constructs whose OWL RL rules are not implemented incrementally.
+# If the closure contains any of them, deltas fall back to full reasoning.
+UNSUPPORTED_PREDICATES = {
+    OWL.onProperty, OWL.propertyChainAxiom, OWL.hasKey, OWL.unionOf,
+    OWL.intersectionOf, OWL.oneOf, OWL.complementOf, OWL.sourceIndividual,
+    OWL.members, OWL.distinctMembers, OWL.hasSelf,
+}
+UNSUPPORTED_TYPES = {
+    OWL.FunctionalProperty, OWL.InverseFunctionalProperty, OWL.AllDifferent,
+    OWL.AllDisjointClasses, OWL.AllDisjointProperties, OWL.NegativePropertyAssertion,
+}
+
+
+class ChangeJournal:
+    """
+    Net changes to a closure: a triple added and then removed again (or the
+    other way round) is in neither set.
+    """
+
+    def __init__(self):
+        self.added = set()
+        self.removed = set()
+
+    def add(self, t):
+        if t in self.removed:
+            self.removed.discard(t)
+        else:
+            self.added.add(t)
+
+    def remove(self, t):
+        if t in self.added:
+            self.added.discard(t)
+        else:
+            self.removed.add(t)
+
+
+def is_schema_triple(t) -> bool:
+    """
+    True for triples that change the T-box (RDFS/OWL vocabulary) rather than instance data.
+    """
+    s, p, o = t
+    if isinstance(p, BNode) or p == OWL.sameAs:
+        return True
+    if p != RDF.type:
+        return str(p).startswith(SCHEMA_NAMESPACES)
+    return str(o).startswith(SCHEMA_NAMESPACES) or o in OWL_RL_Datatypes
+
+
+class IncrementalReasoner:
+    """
+    Semi-naive OWL RL materialization of instance-data deltas.
+
+    The schema part of an already reasoned graph is compiled into lookup
+    tables once (subclasses, domains/ranges, sub/inverse/symmetric/transitive
+    properties). Added triples are then pushed through the rules that involve
+    a single data premise, plus the prp-trp join, so only newly entailed
+    triples are computed. Removals use delete/rederive (DRed).
+
+    The result matches owlrl's DeductiveClosure(OWLRL_Semantics) as long as
+    the delta does not touch the schema (see is_schema_triple) and the
+    ontology avoids the constructs in UNSUPPORTED_PREDICATES/TYPES.
+    """
+
+    def __init__(self, graph, asserted):
+        self.graph = graph
+        self.asserted = asserted
+
+        self.super_classes = defaultdict(set)
+        self.sub_classes = defaultdict(set)
+        self.domains = defaultdict(set)
+        self.ranges = defaultdict(set)
+        self.props_by_domain = defaultdict(set)
+        self.props_by_range = defaultdict(set)
+        self.super_props = defaultdict(set)
+        self.sub_props = defaultdict(set)
+        self.inverses = defaultdict(set)
+        self.symmetric = set()
+        self.transitive = set()
+
+        for c, d in graph.subject_objects(RDFS.subClassOf):
+            self.super_classes[c].add(d)
+            self.sub_classes[d].add(c)
+        for p, c in graph.subject_objects(RDFS.domain):
+            self.domains[p].add(c)
+            self.props_by_domain[c].add(p)
+        for p, c in graph.subject_objects(RDFS.range):
+            self.ranges[p].add(c)
+            self.props_by_range[c].add(p)
+        for p, q in graph.subject_objects(RDFS.subPropertyOf):
+            if p != q:
+                self.super_props[p].add(q)
+                self.sub_props[q].add(p)
+        for p, q in graph.subject_objects(OWL.inverseOf):
+            self.inverses[p].add(q)
+            self.inverses[q].add(p)
+        self.symmetric.update(graph.subjects(RDF.type, OWL.SymmetricProperty))
+        self.transitive.update(graph.subjects(RDF.type, OWL.TransitiveProperty))
+
+        self.supported = self._check_supported()
+        # records what add/remove change in the graph while set (see OntoMaintGraph.apply_delta)
+        self.journal = None
+
+    def _put(self, t):
+        if self.journal is not None and t not in self.graph:
+            self.journal.add(t)
+        self.graph.add(t)
+
+    def _drop(self, t):
+        if self.journal is not None and t in self.graph:
+            self.journal.remove(t)
+        self.graph.remove(t)
+
+    def _check_supported(self) -> bool:
+        for p in UNSUPPORTED_PREDICATES:
+            if next(self.graph.triples((None, p, None)), None) is not None:
+                return False
+        for t in UNSUPPORTED_TYPES:
+            if next(self.graph.triples((None, RDF.type, t)), None) is not None:
+                return False
+        return all(s == o for s, o in self.graph.subject_objects(OWL.sameAs))
+
+    def accepts(self, triples) -> bool:
+        """
+        Whether a delta can be handled incrementally.
+        """
+        return self.supported and not any(is_schema_triple(t) for t in triples)
+
+    # ------------------------------------------------------------
+    # Rules
+    # ------------------------------------------------------------
+    def consequences(self, t, typed_literals=False):
+        """
+        Triples entailed in one step by t together with the current graph.
+        typed_literals enables dt-type2, which owlrl only applies to asserted literals.
+        """
+        s, p, o = t
+        g = self.graph
+
+        # eq-ref
+        yield (s, OWL.sameAs, s)
+        yield (p, OWL.sameAs, p)
+        yield (o, OWL.sameAs, o)
+
+        # cax-sco (equivalent classes are already expanded to subClassOf in the closure)
+        if p == RDF.type:
+            for d in self.super_classes.get(o, ()):
+                yield (s, RDF.type, d)
+
+        # prp-dom, prp-rng
+        for c in self.domains.get(p, ()):
+            yield (s, RDF.type, c)
+        for c in self.ranges.get(p, ()):
+            yield (o, RDF.type, c)
+
+        # prp-spo1 (and prp-eqp1/2 through the expanded subPropertyOf)
+        for q in self.super_props.get(p, ()):
+            yield (s, q, o)
+
+        # prp-inv1/2, prp-symp
+        for q in self.inverses.get(p, ()):
+            yield (o, q, s)
+        if p in self.symmetric:
+            yield (o, p, s)
+
+        # prp-trp, joined on both sides so t may be either premise
+        if p in self.transitive:
+            for z in g.objects(o, p):
+                yield (s, p, z)
+            for x in g.subjects(p, s):
+                yield (x, p, o)
+
+        # dt-type2 and datatype subsumption
+        if typed_literals and isinstance(o, Literal) and o.datatype in OWL_RL_Datatypes:
+            yield (o, RDF.type, o.datatype)
+            for dt in OWL_Datatype_Subsumptions.get(o.datatype, ()):
+                yield (o, RDF.type, dt)
+                yield (dt, RDF.type, RDFS.Datatype)
+
+    def derivable(self, t) -> bool:
+        """
+        Whether t has a one-step derivation from the current graph.
+        """
+        s, p, o = t
+        g = self.graph
+
+        if t in self.asserted:
+            return True
+
+        if p == OWL.sameAs and s == o:
+            for pattern in ((s, None, None), (None, s, None), (None, None, s)):
+                for other in g.triples(pattern):
+                    if other != t:
+                        return True
+            return False
+
+        if p == RDF.type:
+            if o == RDFS.Datatype and s in OWL_RL_Datatypes:
+                return True
+            for c in self.sub_classes.get(o, ()):
+                if (s, RDF.type, c) in g:
+                    return True
+            for q in self.props_by_domain.get(o, ()):
+                if next(g.objects(s, q), None) is not None:
+                    return True
+            for q in self.props_by_range.get(o, ()):
+                if next(g.subjects(q, s), None) is not None:
+                    return True
+            if isinstance(s, Literal) and s.datatype in OWL_RL_Datatypes:
+                if o == s.datatype or o in OWL_Datatype_Subsumptions.get(s.datatype, ()):
+                    if any(q != OWL.sameAs for q in g.predicates(None, s)):
+                        return True
+
+        for q in self.sub_props.get(p, ()):
+            if (s, q, o) in g:
+                return True
+        for q in self.inverses.get(p, ()):
+            if (o, q, s) in g:
+                return True
+        if p in self.symmetric and (o, p, s) in g:
+            return True
+        if p in self.transitive:
+            for z in g.objects(s, p):
+                if z != o and (z, p, o) in g:
+                    return True
+        return False
+
+    def _datatype_used(self, dt) -> bool:
+        """
+        owlrl's notion of a datatype "in use": carried by an asserted literal
+        (directly or via subsumption) or explicitly asserted as a type.
+        """
+        for r in self.graph.subjects(RDF.type, dt):
+            if isinstance(r, Literal):
+                if r.datatype == dt or dt in OWL_Datatype_Subsumptions.get(r.datatype, ()):
+                    return True
+            elif (r, RDF.type, dt) in self.asserted:
+                return True
+        return False
+
+    def _disjointness(self, datatypes):
+        for t in OWLRL_Datatypes_Disjointness:
+            l, _, r = t
+            if (l in datatypes or r in datatypes) and self._datatype_used(l) and self._datatype_used(r):
+                yield t
+
+    # ------------------------------------------------------------
+    # Delta application
+    # ------------------------------------------------------------
+    def add(self, triples) -> int:
+        """
+        Assert triples and materialize what they entail. Returns the number of new triples.
+        """
+        triples = list(triples)
+        self.asserted.update(triples)
+        return self._insert(triples, typed_literals=True)
+
+    def _insert(self, triples, typed_literals=False) -> int:
+        g = self.graph
+        before = len(g)
+        new_datatypes = set()
+
+        pending = list(triples)
+        for t in pending:
+            self._put(t)
+        while pending:
+            t = pending.pop()
+            for c in self.consequences(t, typed_literals=typed_literals and t in self.asserted):
+                if c not in g:
+                    self._put(c)
+                    pending.append(c)
+                    if c[1] == RDF.type and isinstance(c[0], Literal):
+                        new_datatypes.add(c[2])
+
+        for t in self._disjointness(new_datatypes):
+            self._put(t)
+
+        return len(g) - before
+
+    def remove(self, triples) -> int:
+        """
+        Retract triples and everything that is no longer entailed (DRed).
+        Returns the number of triples removed from the closure.
+        """
+        g = self.graph
+        before = len(g)
+        triples = [t for t in triples if t in g]
+
+        # 1. over-delete everything reachable from the retracted triples
+        overdeleted = set()
+        pending = list(triples)
+        while pending:
+            t = pending.pop()
+            if t in overdeleted:
+                continue
+            overdeleted.add(t)
+            for c in self.consequences(t, typed_literals=True):
+                if c in g and c not in overdeleted:
+                    pending.append(c)
+
+        self.asserted.difference_update(triples)
+        datatypes = {o for s, p, o in overdeleted if p == RDF.type and isinstance(s, Literal)}
+        for t in overdeleted:
+            self._drop(t)
+
+        # 2. rederive what still has an alternative derivation, then re-close
+        rederived = [t for t in overdeleted if self.derivable(t)]
+        self._insert(rederived, typed_literals=True)
+
+        # datatype disjointness only holds between datatypes that are still in use
+        unused = {dt for dt in datatypes if not self._datatype_used(dt)}
+        for t in OWLRL_Datatypes_Disjointness:
+            l, _, r = t
+            if (l in unused or r in unused) and t in g and t not in self.asserted:
+                self._drop(t)
+
+        return before - len(g)
+
+
+def query_vocabulary(algebras) -> tuple[set, set, bool]:
+    """
+    (predicates, classes, open) used by the triple patterns of the given
+    SPARQL algebra trees (prepared_query.algebra). classes are the objects of
+    rdf:type patterns; open is True when a pattern has a variable predicate,
+    a variable class or a negated property path, i.e. it could observe any triple.
+    """
+    predicates, classes = set(), set()
+    is_open = False
+
+    def path_predicates(path):
+        if isinstance(path, URIRef):
+            return [path]
+        found = []
+        for attr in ("args", "path"):
+            inner = getattr(path, attr, None)
+            for item in inner if isinstance(inner, (list, tuple)) else [inner]:
+                if item is not None:
+                    found += path_predicates(item)
+        return found
+
+    def walk(node):
+        nonlocal is_open
+        if isinstance(node, CompValue):
+            if node.name == "BGP":
+                for s, p, o in node.triples:
+                    if p == RDF.type:
+                        if isinstance(o, URIRef):
+                            classes.add(o)
+                        else:
+                            is_open = True
+                    elif isinstance(p, URIRef):
+                        predicates.add(p)
+                    elif isinstance(p, Path):
+                        if isinstance(p, NegatedPath):
+                            is_open = True
+                        for q in path_predicates(p):
+                            predicates.add(q)
+                    else:
+                        is_open = True
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, (list, tuple)):
+            for value in node:
+                walk(value)
+
+    for algebra in algebras:
+        walk(algebra)
+    if RDF.type in predicates:  # rdf:type inside a property path: any class
+        is_open = True
+    return predicates, classes, is_open
+
+
+class TargetedReasoner(IncrementalReasoner):
+    """
+    Materializes only what a known set of queries can observe.
+
+    The rule tables are those of IncrementalReasoner, built from the asserted
+    ontology (equivalent classes/properties expanded both ways), then cut
+    down to rule instances whose conclusion is relevant: an rdf:type of a
+    class the queries mention, or a triple of a property they mention, plus
+    everything those can be derived from (subclasses, properties whose
+    domain/range is a relevant class, sub- and inverse properties).
+    eq-ref (x owl:sameAs x), datatype typing and the axiomatic triples of
+    full OWL RL are never produced.
+
+    Query answers equal those on the full OWL RL closure as long as
+    `supported` holds (same conditions as IncrementalReasoner) and the
+    queries only use the vocabulary given to the constructor.
+    With is_open, every rule instance of the ontology is kept.
+    """
+
+    def __init__(self, graph, asserted, predicates=(), classes=(), is_open=False):
+        super().__init__(graph, asserted)
+
+        for c, d in graph.subject_objects(OWL.equivalentClass):
+            for x, y in ((c, d), (d, c)):
+                self.super_classes[x].add(y)
+                self.sub_classes[y].add(x)
+        for p, q in graph.subject_objects(OWL.equivalentProperty):
+            for x, y in ((p, q), (q, p)):
+                if x != y:
+                    self.super_props[x].add(y)
+                    self.sub_props[y].add(x)
+
+        self.predicates, self.classes = set(predicates), set(classes)
+        if not is_open:
+            self._restrict()
+
+    def _relevant(self) -> tuple[set, set]:
+        """
+        Classes and properties whose triples can feed, through the rules,
+        a triple the queries read.
+        """
+        classes, props = set(self.classes), set(self.predicates)
+        pending = [("class", c) for c in classes] + [("prop", p) for p in props]
+        while pending:
+            kind, x = pending.pop()
+            if kind == "class":
+                found = [("class", c) for c in self.sub_classes.get(x, ())]
+                found += [("prop", p) for p in self.props_by_domain.get(x, set()) | self.props_by_range.get(x, set())]
+            else:
+                found = [("prop", p) for p in self.sub_props.get(x, set()) | self.inverses.get(x, set())]
+            for kind, y in found:
+                target = classes if kind == "class" else props
+                if y not in target:
+                    target.add(y)
+                    pending.append((kind, y))
+        return classes, props
+
+    def _restrict(self):
+        classes, props = self._relevant()
+
+        def keep(table, allowed):
+            kept = defaultdict(set)
+            for k, values in table.items():
+                values = values & allowed
+                if values:
+                    kept[k] = values
+            return kept
+
+        def invert(table):
+            inverted = defaultdict(set)
+            for k, values in table.items():
+                for v in values:
+                    inverted[v].add(k)
+            return inverted
+
+        self.super_classes = keep(self.super_classes, classes)
+        self.sub_classes = invert(self.super_classes)
+        self.domains = keep(self.domains, classes)
+        self.props_by_domain = invert(self.domains)
+        self.ranges = keep(self.ranges, classes)
+        self.props_by_range = invert(self.ranges)
+        self.super_props = keep(self.super_props, props)
+        self.sub_props = invert(self.super_props)
+        self.inverses = keep(self.inverses, props)
+        self.symmetric &= props
+        self.transitive &= props
+
+    def rule_count(self) -> int:
+        """
+        Number of rule instances left after restriction, for reporting.
+        """
+        tables = (self.super_classes, self.domains, self.ranges, self.super_props, self.inverses)
+        return sum(len(v) for table in tables for v in table.values()) + len(self.symmetric) + len(self.transitive)
+
+    def consequences(self, t, typed_literals=False):
+        for c in super().consequences(t):
+            if c[1] != OWL.sameAs:
+                yield c
+
+    def expand(self) -> int:
+        """
+        Materialize the targeted closure of the graph. Returns the number of new triples.
+        """
+        return self._insert(list(self.graph))
+
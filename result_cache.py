@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+
+
+class _Pending:
+    # a miss being computed; callers asking for the same key wait on done
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for query results, bounded by entry count and by the
+    total number of result cells. The lock only guards the entries and
+    counters: hits never wait for a computation, and misses on different keys
+    are computed concurrently, while concurrent callers asking for the same
+    result wait for the first one instead of all evaluating it.
+    """
+
+    def __init__(self, max_entries: int = 256, max_cells: int = None):
+        self.max_entries = max_entries
+        self.max_cells = max_cells
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cells = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute, size=None):
+        """
+        Return the cached value for key, or compute(), store and return it.
+        size(value) gives its cost in cells; values larger than max_cells are not stored.
+        A value computed while the version changed is returned but not stored.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = _Pending()
+                    self.misses += 1
+                    version = self.version
+                    break
+            pending.done.wait()
+            if not pending.failed:
+                with self._lock:
+                    self.hits += 1
+                return pending.value
+            # the computation failed: try again, computing it here if no one else does
+
+        try:
+            pending.value = compute()
+        except BaseException:
+            pending.failed = True
+            raise
+        else:
+            with self._lock:
+                if self.version == version:
+                    self._store(key, pending.value, size)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+        return pending.value
+
+    def get(self, key):
+        """
+        The cached value for key, or None. With put, for values computed
+        elsewhere (in another process), which concurrent callers may compute twice.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        with self._lock:
+            self._store(key, value, size)
+
+    def _store(self, key, value, size):
+        cells = size(value) if size else 1
+        if self.max_cells is None or cells <= self.max_cells:
+            if key in self._entries:
+                self.cells -= self._entries.pop(key)[1]
+            self._entries[key] = (value, cells)
+            self.cells += cells
+            self._evict()
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_cells is not None and self.cells > self.max_cells)
+        ):
+            _, (_, cells) = self._entries.popitem(last=False)
+            self.cells -= cells
+            self.evictions += 1
+
+    def set_version(self, version):
+        """
+        Drop every entry when the data version changes, so stale results are never served.
+        """
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.cells = 0
+                self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.cells = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "cells": self.cells,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def result_cells(result) -> int:
+    """
+    Size of a (vars, rows) result in cells, for ResultCache's max_cells
+    (or a (vars, rows, truncated) one).
+    """
+    vars_, rows = result[:2]
+    return max(1, len(rows) * max(1, len(vars_)))
@@ -0,0 +1,135 @@
+import operator
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from rdflib import Literal
+from rdflib.namespace import XSD
+
+
+INTEGER_TYPES = {
+    XSD.integer, XSD.int, XSD.long, XSD.short, XSD.byte,
+    XSD.nonNegativeInteger, XSD.positiveInteger, XSD.negativeInteger, XSD.nonPositiveInteger,
+    XSD.unsignedLong, XSD.unsignedInt, XSD.unsignedShort, XSD.unsignedByte,
+}
+FLOAT_TYPES = {XSD.decimal, XSD.double, XSD.float}
+DATETIME_TYPES = {XSD.dateTime, XSD.dateTimeStamp, XSD.date}
+BOOLEAN_TYPES = {XSD.boolean}
+
+
+def local_name(x) -> str:
+    s = "" if x is None else str(x)
+    return s.split("#")[-1] if "#" in s else s
+
+
+def _column_kind(terms) -> str:
+    """
+    'int', 'float', 'datetime' or 'bool' when every term is a literal of that
+    family (ints mixed with decimals count as float), 'str' otherwise.
+    """
+    kinds = set()
+    for term in terms:
+        if not isinstance(term, Literal):
+            return "str"
+        dt = term.datatype
+        if dt in INTEGER_TYPES:
+            kinds.add("int")
+        elif dt in FLOAT_TYPES:
+            kinds.add("float")
+        elif dt in DATETIME_TYPES:
+            kinds.add("datetime")
+        elif dt in BOOLEAN_TYPES:
+            kinds.add("bool")
+        else:
+            return "str"
+    if kinds <= {"int"}:
+        return "int" if kinds else "str"
+    if kinds <= {"int", "float"}:
+        return "float"
+    return kinds.pop() if len(kinds) == 1 else "str"
+
+
+def _typed(kind: str, terms: list):
+    """
+    Convert the distinct terms of a column to a typed pandas array, or None if
+    some lexical form does not parse. Integers beyond int64 make a float column.
+    """
+    try:
+        if kind == "int":
+            values = [int(t) for t in terms]
+            try:
+                return pd.array(values, dtype="Int64")
+            except OverflowError:
+                # float(int) raises OverflowError too past the float range: strings then
+                return pd.array([float(v) for v in values], dtype="Float64")
+        if kind == "float":
+            return pd.array([float(t) for t in terms], dtype="Float64")
+        if kind == "bool":
+            return pd.array([t.toPython() for t in terms], dtype="boolean")
+        if kind == "datetime":
+            return pd.to_datetime(pd.Series([str(t) for t in terms]), format="ISO8601").array
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return None
+
+
+def _factorize_terms(cells):
+    """
+    (codes, distinct terms) for a column of RDF terms, with -1 for unbound cells.
+    rdflib hashes terms in Python, so cells are grouped by object identity
+    first (result rows share term objects heavily) and only the distinct
+    objects are hashed by value.
+    """
+    n = len(cells)
+    ids = np.fromiter(map(id, cells), dtype=np.int64, count=n)
+    id_codes, id_uniques = pd.factorize(ids)
+
+    first = np.empty(len(id_uniques), dtype=np.int64)
+    first[id_codes[::-1]] = np.arange(n - 1, -1, -1)
+    objects = np.empty(len(first), dtype=object)
+    objects[:] = [cells[i] for i in first]
+
+    term_codes, terms = pd.factorize(objects)
+    return term_codes[id_codes], list(terms)
+
+
+def result_column(cells, prettify: bool = True):
+    """
+    One result column as a pandas array. Each distinct term is converted once
+    (factorize, then take): numeric, boolean and date literals become typed
+    columns, everything else strings (URIs shortened to local names if prettify).
+    Unbound cells become missing values ('' for strings).
+    """
+    codes, terms = _factorize_terms(cells)
+
+    kind = _column_kind(terms)
+    if kind != "str":
+        typed = _typed(kind, terms)
+        if typed is not None:
+            return typed.take(codes, allow_fill=True)
+
+    convert = local_name if prettify else str
+    # the extra trailing "" is what missing cells (code -1) pick up
+    names = np.array([convert(t) for t in terms] + [""], dtype=object)
+    return names[codes]
+
+
+def result_frame(vars_, rows, prettify: bool = True) -> pd.DataFrame:
+    """
+    Build a DataFrame column by column from SPARQL result rows.
+    """
+    if not rows:
+        return pd.DataFrame()
+
+    width = len(rows[0])
+    if vars_ and len(vars_) == width:
+        cols = [v.lstrip("?") for v in vars_]
+    else:
+        cols = [f"col{i+1}" for i in range(width)]
+
+    # rdflib's ResultRow overrides __getitem__ in Python; tuple.__getitem__ reads the cells directly
+    getitem = tuple.__getitem__ if isinstance(rows[0], tuple) else operator.getitem
+    return pd.DataFrame({
+        col: result_column(list(map(getitem, rows, repeat(i))), prettify)
+        for i, col in enumerate(cols)
+    })
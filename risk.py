@@ -0,0 +1,156 @@
+import math
+from datetime import datetime
+
+import numpy as np
+
+from timeseries import epoch_seconds
+
+
+RISK_COLUMNS = [
+    "machine", "risk", "failure_rate", "age_years", "overdue_days",
+    "worst_severity", "worst_downtime", "failure_modes",
+]
+
+# A machine's risk is the product of these factors, each raised to its weight
+# (0 leaves a factor out):
+# - failure_rate: failureRate
+# - age: 1 + hasAgeYears
+# - overdue: 1 + the time since maintenance fell due (lastMaintenanceDate +
+#   maintenanceIntervalDays), in maintenance intervals
+# - severity: 1 + the worst hasSeverity of the ErrorContexts affecting the machine
+# - downtime: 1 + the worst hasDowntimeMinutes of those, in hours
+RISK_WEIGHTS = {"failure_rate": 1.0, "age": 1.0, "overdue": 1.0, "severity": 1.0, "downtime": 1.0}
+
+SECONDS_PER_DAY = 86400
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, highest first (ties in index order):
+    argpartition finds them in linear time, so only those k are sorted.
+    NaN scores rank last.
+    """
+    scores = np.nan_to_num(scores, nan=-np.inf)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class MachineRisk:
+    """
+    The risk signals of every machine as NumPy arrays, built once from the
+    rows of machine_health.sparql and critical_failures.sparql and scored
+    for any date and weights. last_maintenance is seconds since
+    timeseries.EPOCH and interval days; unknown values are NaN and count as a
+    neutral factor, an unknown failure rate as the median known one.
+    """
+
+    def __init__(self, machines: list, failure_rate: np.ndarray, age: np.ndarray, last_maintenance: np.ndarray,
+                 interval: np.ndarray, worst_severity: np.ndarray, worst_downtime: np.ndarray,
+                 failure_modes: np.ndarray):
+        self.machines = machines
+        self.failure_rate = failure_rate
+        self.age = age
+        self.last_maintenance = last_maintenance
+        self.interval = interval
+        self.worst_severity = worst_severity
+        self.worst_downtime = worst_downtime
+        self.failure_modes = failure_modes
+        known = failure_rate[~np.isnan(failure_rate)]
+        self.median_failure_rate = float(np.median(known)) if len(known) else 1.0
+
+    @classmethod
+    def from_rows(cls, health_rows, failure_rows) -> "MachineRisk":
+        """
+        health_rows are (machine, uptime, failure rate, age, last maintenance,
+        interval days), failure_rows (failure, machine, severity, downtime
+        minutes); cells as literals or text. A machine's first health row counts.
+        """
+        machines, columns = {}, []
+        for machine, _, failure_rate, age, last, interval in health_rows:
+            if machine in machines:
+                continue
+            machines[machine] = len(machines)
+            try:
+                last = epoch_seconds(last)
+            except (TypeError, ValueError):
+                last = math.nan
+            columns.append((_number(failure_rate), _number(age), last, _number(interval)))
+        failure_rate, age, last, interval = np.array(columns, dtype=float).reshape(-1, 4).T.copy()
+
+        affected, failures, severity, downtime = [], [], [], []
+        for failure, machine, failure_severity, failure_downtime in failure_rows:
+            position = machines.get(machine)
+            if position is not None:
+                affected.append(position)
+                failures.append((position, failure))
+                severity.append(_number(failure_severity))
+                downtime.append(_number(failure_downtime))
+        affected = np.array(affected, dtype=np.int64)
+        worst_severity = np.full(len(machines), np.nan)
+        worst_downtime = np.full(len(machines), np.nan)
+        np.fmax.at(worst_severity, affected, np.array(severity, dtype=float))
+        np.fmax.at(worst_downtime, affected, np.array(downtime, dtype=float))
+        failure_modes = np.bincount(np.array([p for p, _ in dict.fromkeys(failures)], dtype=np.int64),
+                                    minlength=len(machines))
+        return cls([str(m) for m in machines], failure_rate, age, last, interval,
+                   worst_severity, worst_downtime, failure_modes)
+
+    def __len__(self):
+        return len(self.machines)
+
+    def overdue_days(self, as_of: datetime) -> np.ndarray:
+        """
+        Days since each machine's maintenance fell due (last maintenance + interval), 0 if not yet due or unknown.
+        """
+        elapsed = (epoch_seconds(as_of) - self.last_maintenance) / SECONDS_PER_DAY
+        return np.nan_to_num(np.maximum(elapsed - self.interval, 0.0))
+
+    def scores(self, as_of: datetime, weights: dict = None, overdue: np.ndarray = None) -> np.ndarray:
+        """
+        The composite risk of every machine (see RISK_WEIGHTS), weights overriding the defaults.
+        """
+        weights = {**RISK_WEIGHTS, **(weights or {})}
+        if unknown := set(weights) - set(RISK_WEIGHTS):
+            raise ValueError(f"Unknown risk factor(s) {', '.join(sorted(unknown))}; "
+                             f"expected {', '.join(RISK_WEIGHTS)}")
+        overdue = self.overdue_days(as_of) if overdue is None else overdue
+        intervals = np.divide(overdue, self.interval, out=np.zeros(len(self)), where=self.interval > 0)
+        factors = {
+            "failure_rate": np.nan_to_num(self.failure_rate, nan=self.median_failure_rate),
+            "age": 1.0 + self.age,
+            "overdue": 1.0 + intervals,
+            "severity": 1.0 + self.worst_severity,
+            "downtime": 1.0 + self.worst_downtime / 60.0,
+        }
+        risk = np.ones(len(self))
+        for name, factor in factors.items():
+            if weights[name]:
+                risk *= np.power(np.nan_to_num(factor, nan=1.0), weights[name])
+        return risk
+
+    def ranking(self, as_of: datetime, top: int = None, weights: dict = None) -> list[tuple]:
+        """
+        The top machines by risk, highest first, as rows in RISK_COLUMNS order (all of them without top).
+        """
+        overdue = self.overdue_days(as_of)
+        risk = self.scores(as_of, weights, overdue)
+        order = top_k(risk, len(self) if top is None else top)
+        return self.rows(order, risk, overdue)
+
+    def rows(self, order: np.ndarray, risk: np.ndarray, overdue: np.ndarray) -> list[tuple]:
+        def value(array):
+            return [None if math.isnan(v) else v for v in array[order].tolist()]
+
+        return list(zip([self.machines[i] for i in order.tolist()], risk[order].tolist(), value(self.failure_rate),
+                        value(self.age), overdue[order].tolist(), value(self.worst_severity),
+                        value(self.worst_downtime), self.failure_modes[order].tolist()))
@@ -0,0 +1,316 @@
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import recv_handle, send_handle
+
+from config import QUERY_MAX_MEMORY_MB, QUERY_MAX_ROWS, QUERY_TIMEOUT, QUERY_WORKERS
+from query_registry import PARSE_LOCK, iter_select, prepare_text
+
+try:
+    import resource
+except ImportError:  # Windows: no memory ceiling
+    resource = None
+
+# Forking shares the reasoned graph with the workers instead of copying it;
+# without fork, ad-hoc queries run inline with only the row limit.
+CAN_FORK = "fork" in mp.get_all_start_methods()
+
+# How often a waiting caller checks on its query's worker (and reports progress).
+POLL_SECONDS = 0.25
+
+TRIPLE_COLUMNS = ["subject", "predicate", "object"]
+
+
+class QueryAborted(RuntimeError):
+    """An ad-hoc query stopped before it finished: timed out, over its memory ceiling or cancelled."""
+
+
+def evaluate(graph, text: str, max_rows: int):
+    """
+    (variables, rows, truncated): the first max_rows rows of any query on an
+    rdflib graph. SELECT rows are streamed and evaluation stops at the first
+    row past the limit; ASK gives one row (ask), CONSTRUCT and DESCRIBE one
+    per triple (subject, predicate, object).
+    """
+    prepared = prepare_text(text)
+    if prepared.algebra.name == "SelectQuery":
+        variables, rows = iter_select(graph, prepared)
+    else:
+        result = graph.query(prepared)
+        if result.type == "ASK":
+            variables, rows = ["ask"], iter([(result.askAnswer,)])
+        else:
+            variables, rows = TRIPLE_COLUMNS, iter(result.graph)
+    rows = list(itertools.islice(rows, max_rows + 1))
+    return variables, rows[:max_rows], len(rows) > max_rows
+
+
+def _memory_limit(max_memory_mb):
+    # RLIMIT_AS for the workers: what this process maps now, the graph included, plus max_memory_mb
+    if resource is None or max_memory_mb is None or not os.path.exists("/proc/self/statm"):
+        return None
+    with open("/proc/self/statm") as f:
+        limit = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE") + max_memory_mb * 2**20
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    return limit if hard == resource.RLIM_INFINITY else min(limit, hard)
+
+
+def _set_memory_limit(limit):
+    # None lifts the ceiling back to the hard limit
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (hard if limit is None else limit, hard))
+
+
+def _serve(graph, conn, memory_limit):
+    # Runs in a worker, which shares the graph copy-on-write.
+    # rdflib's generators, closed while a MemoryError unwinds, raise it again: not worth reporting.
+    sys.unraisablehook = lambda unraisable: None
+    _set_memory_limit(memory_limit)
+    while True:
+        try:
+            text, max_rows = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(("ok", evaluate(graph.graph, text, max_rows)))
+        except MemoryError:
+            # the heap may be left fragmented or half-built: let the parent start another worker,
+            # lifting the ceiling first so this one can free it and exit
+            _set_memory_limit(None)
+            conn.send(("memory", None))
+            return
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+def _fork_workers(graph, conn, parent_conn, max_memory_mb):
+    # Runs in the process forked once from the graph. It has a single thread, so
+    # forking it again is safe; each request forks a worker and sends back its pid
+    # and its end of a socket pair.
+    PARSE_LOCK.release()  # held across the fork by _Forker, for this process too
+    parent_conn.close()  # so that conn reaches EOF when the parent exits
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # exited workers are reaped at once
+    memory_limit = _memory_limit(max_memory_mb)
+    while True:
+        try:
+            conn.recv()
+        except EOFError:
+            return
+        ours, theirs = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                conn.close()
+                ours.close()
+                _serve(graph, Connection(theirs.detach()), memory_limit)
+                code = 0
+            finally:
+                os._exit(code)
+        theirs.close()
+        conn.send(pid)
+        send_handle(conn, ours.fileno(), os.getppid())
+        ours.close()
+
+
+class _Worker:
+    def __init__(self, pid, conn, version):
+        self.pid = pid
+        self.conn = conn
+        self.version = version
+
+    def alive(self) -> bool:
+        # an idle worker never writes: a readable connection means it exited
+        return not self.conn.poll()
+
+    def stop(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.conn.close()
+
+
+class _Forker:
+    """
+    A process forked once from a version of the graph, which forks the query
+    workers of that version in turn: they all get the same memory ceiling,
+    and none is forked from a process running other threads, whose locks a
+    child would inherit held.
+    """
+
+    def __init__(self, graph, version, max_memory_mb):
+        ctx = mp.get_context("fork")
+        self.conn, child = ctx.Pipe()
+        self.version = version
+        # the one lock workers take: were another thread parsing now, it would stay held in them
+        with PARSE_LOCK:
+            self.process = ctx.Process(target=_fork_workers, args=(graph, child, self.conn, max_memory_mb),
+                                       name="ontomaint-query-forker", daemon=True)
+            self.process.start()
+        child.close()
+
+    def fork(self) -> _Worker:
+        self.conn.send(None)
+        pid = self.conn.recv()
+        return _Worker(pid, Connection(recv_handle(self.conn)), self.version)
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class QuerySandbox:
+    """
+    Runs ad-hoc SPARQL (the dashboard's console, the query server's /sparql)
+    in a pool of worker processes forked from the reasoned graph, so that a
+    runaway query costs its worker and not the process serving everyone.
+    Workers are forked from a process forked once per version of the graph
+    (start() does it up front, before the query server starts its threads).
+
+    reading() is a context manager yielding the OntoMaintGraph to fork from,
+    left unmodified inside it (LiveGraph.reading), and version() the version
+    of that graph: workers forked from an older version are retired when
+    next taken. Each query gets a timeout, a row limit (SELECT evaluation
+    stops at the first row past it) and a memory ceiling on top of the
+    graph, set with RLIMIT_AS. Past the timeout, or when the caller's
+    progress callback raises (a Streamlit stop or rerun), the worker is
+    killed. At most `workers` queries run at once; more wait for a worker.
+    The ceiling is the same for every worker of a version: max_memory_mb
+    over what the process forking them maps when it starts.
+
+    Workers share the graph's memory with the parent until they touch it,
+    which can copy up to the whole graph into each over time.
+    """
+
+    def __init__(self, reading, version=lambda: None, workers: int = QUERY_WORKERS,
+                 timeout: float = QUERY_TIMEOUT, max_rows: int = QUERY_MAX_ROWS,
+                 max_memory_mb: int = QUERY_MAX_MEMORY_MB):
+        self.reading = reading
+        self.version = version
+        self.workers = workers
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_memory_mb = max_memory_mb
+        self.aborted = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._forker = None
+        self._forking = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers)
+
+    @classmethod
+    def of_graph(cls, graph, **kwargs) -> "QuerySandbox":
+        """
+        A sandbox for a graph that never changes (the query server's).
+        """
+        return cls(lambda: nullcontext(graph), **kwargs)
+
+    def start(self) -> "QuerySandbox":
+        """
+        Fork the process workers are forked from now rather than with the
+        first query, i.e. before this process starts other threads.
+        """
+        if CAN_FORK:
+            with self._forking:
+                self._current_forker(self.version())
+        return self
+
+    def run(self, text: str, timeout: float = None, max_rows: int = None, progress=None):
+        """
+        (variables, rows, truncated) of a query as evaluate() gives them, run
+        in a worker. progress(seconds elapsed) is called while it runs.
+        Raises QueryAborted if the query is stopped, ValueError if it fails.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        max_rows = self.max_rows if max_rows is None else max_rows
+        if not CAN_FORK:
+            with self.reading() as graph:
+                return evaluate(graph.graph, text, max_rows)
+
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            self.aborted += 1
+            raise QueryAborted(f"All {self.workers} query workers stayed busy for {timeout:g} s.")
+        try:
+            worker = self._take()
+            try:
+                status, payload = self._wait(worker, (text, max_rows), started, timeout, progress)
+            except BaseException:
+                self.aborted += 1
+                worker.stop()
+                raise
+        finally:
+            self._slots.release()
+
+        if status == "memory":
+            worker.conn.close()  # it exits by itself
+            self.aborted += 1
+            raise QueryAborted(f"Query stopped: it needed more than {self.max_memory_mb:,} MB of memory.")
+        with self._lock:
+            self._idle.append(worker)
+        if status == "error":
+            raise ValueError(payload)
+        return payload
+
+    def _take(self) -> _Worker:
+        version = self.version()
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if not worker.alive():
+                    worker.conn.close()
+                elif worker.version == version:
+                    return worker
+                else:
+                    worker.stop()
+        with self._forking:
+            return self._current_forker(version).fork()
+
+    def _current_forker(self, version) -> _Forker:
+        # with self._forking held
+        if self._forker is not None and self._forker.version != version:
+            self._forker.stop()
+            self._forker = None
+        if self._forker is None:
+            with self.reading() as graph:
+                self._forker = _Forker(graph, version, self.max_memory_mb)
+        return self._forker
+
+    @staticmethod
+    def _wait(worker: _Worker, request: tuple, started: float, timeout: float, progress):
+        worker.conn.send(request)
+        while not worker.conn.poll(max(0.0, min(POLL_SECONDS, started + timeout - time.monotonic()))):
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout:
+                raise QueryAborted(f"Query cancelled after {timeout:g} s (timeout).")
+            if progress is not None:
+                progress(elapsed)
+        try:
+            return worker.conn.recv()
+        except EOFError:
+            raise QueryAborted("Query worker exited before answering.") from None
+
+    def close(self):
+        """
+        Stop the idle workers (busy ones are stopped by the queries running on
+        them) and the process forking them.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+        with self._forking:
+            forker, self._forker = self._forker, None
+        if forker is not None:
+            forker.stop()
@@ -0,0 +1,228 @@
+import numpy as np
+
+from cascade import CascadeIndex
+from term_dictionary import TermDictionary
+
+
+SCENARIO_COLUMNS = [
+    "machine", "failure_modes", "blocked_jobs", "downstream_jobs",
+    "batches", "lost_batch_size", "expected_downtime", "worst_downtime",
+]
+
+# Upper bound on the (machines x jobs) visited matrix used for the nextJob closure;
+# machines are processed in blocks that fit.
+VISITED_CELLS = 1 << 25
+
+
+def _ids(items) -> dict:
+    return {item: i for i, item in enumerate(items)}
+
+
+def _edge_arrays(adjacency: dict, src_ids: dict, dst_ids: dict):
+    """
+    (src, dst) int arrays for the edges of a {source: [targets]} map, keeping known nodes only.
+    """
+    src, dst = [], []
+    for source, targets in adjacency.items():
+        s = src_ids.get(source)
+        if s is None:
+            continue
+        for target in targets:
+            d = dst_ids.get(target)
+            if d is not None:
+                src.append(s)
+                dst.append(d)
+    return np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64)
+
+
+def _csr(src: np.ndarray, dst: np.ndarray, n: int):
+    """
+    Compressed adjacency: the targets of node i are indices[indptr[i]:indptr[i + 1]].
+    """
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order]
+
+
+def _expand(owners: np.ndarray, nodes: np.ndarray, indptr: np.ndarray, indices: np.ndarray):
+    """
+    For every (owner, node) pair, one (owner, target) pair per outgoing edge of node.
+    """
+    counts = indptr[nodes + 1] - indptr[nodes]
+    total = int(counts.sum())
+    if not total:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    starts = np.repeat(indptr[nodes] - np.cumsum(counts) + counts, counts)
+    return np.repeat(owners, counts), indices[starts + np.arange(total)]
+
+
+class RelationArrays:
+    """
+    The relations of a CascadeIndex that what-if scenarios need, as integer-coded
+    NumPy arrays. Copying them out of the index is the only per-edge Python
+    loop; build this once and reuse it for every scenario run.
+    """
+
+    def __init__(self, index: CascadeIndex, machines: list = None):
+        self.machines = index.machine_names() if machines is None else [str(m) for m in machines]
+        failures = list(dict.fromkeys(f for m in self.machines for f in index.failures_by_machine.get(m, ())))
+        self.jobs = list(dict.fromkeys(
+            [j for f in failures for j in index.blocked_jobs.get(f, ())]
+            + [j for src, targets in index.next_jobs.items() for j in [src, *targets]]
+        ))
+        batches = list(dict.fromkeys(b for m in self.machines for b in index.batches.get(m, ())))
+
+        machine_ids, failure_ids, job_ids, batch_ids = _ids(self.machines), _ids(failures), _ids(self.jobs), _ids(batches)
+        self.n_failures = len(failures)
+
+        self.fm_failure, self.fm_machine = _edge_arrays(index.machines, failure_ids, machine_ids)
+        self.fj_failure, self.fj_job = _edge_arrays(index.blocked_jobs, failure_ids, job_ids)
+        self.next_src, self.next_dst = _edge_arrays(index.next_jobs, job_ids, job_ids)
+        self.mb_machine, self.mb_batch = _edge_arrays(index.batches, machine_ids, batch_ids)
+
+        self.downtime = np.array([index.downtime.get(f, 0.0) for f in failures], dtype=np.float64)
+        self.batch_size = np.array([index.batch_size.get(b, 0.0) for b in batches], dtype=np.float64)
+
+    @classmethod
+    def from_terms(cls, terms: TermDictionary) -> "RelationArrays":
+        """
+        The same arrays straight from a graph's TermDictionary, with the
+        edges of queries/internal/cascade_edges.sparql selected and
+        renumbered on ID arrays; only the machines' names and the downtime
+        and batch size literals are decoded.
+        """
+        relations = cls.__new__(cls)
+        error_contexts = terms.instances("ErrorContext")
+        fm_failure, fm_machine = _typed_sources(terms.relation("affectsMachine"), error_contexts)
+        fj_failure, fj_job = _typed_sources(terms.relation("blocksJob"), error_contexts)
+        next_src, next_dst = terms.relation("nextJob")
+        mb_machine, mb_batch = terms.relation("processesBatch")
+
+        machines = _unique_in_order(terms.instances("Machine"), fm_machine, mb_machine)
+        failures = _unique_in_order(fm_failure)
+        fj_failure, fj_job = _typed_sources((fj_failure, fj_job), failures)
+        jobs = _unique_in_order(fj_job, np.stack([next_src, next_dst], axis=1).ravel())
+        batches = _unique_in_order(mb_batch)
+
+        relations.machines = [str(term) for term in terms.decode(machines)]
+        relations.jobs = terms.decode(jobs)
+        relations.n_failures = len(failures)
+        machine_ids, failure_ids, job_ids, batch_ids = (_renumber(ids, len(terms)) for ids in (machines, failures, jobs, batches))
+        relations.fm_failure, relations.fm_machine = failure_ids[fm_failure], machine_ids[fm_machine]
+        relations.fj_failure, relations.fj_job = failure_ids[fj_failure], job_ids[fj_job]
+        relations.next_src, relations.next_dst = job_ids[next_src], job_ids[next_dst]
+        relations.mb_machine, relations.mb_batch = machine_ids[mb_machine], batch_ids[mb_batch]
+
+        relations.downtime = _literal_values(terms, _typed_sources(terms.pairs("hasDowntimeMinutes"), error_contexts),
+                                             failure_ids, len(failures))
+        relations.batch_size = _literal_values(
+            terms, _typed_sources(terms.pairs("batchSize"), terms.instances("ProductionBatch")), batch_ids, len(batches))
+        return relations
+
+
+def _typed_sources(pairs: tuple, typed: np.ndarray):
+    # the (source, target) pairs whose source is in typed
+    sources, targets = pairs
+    keep = np.isin(sources, typed)
+    return sources[keep], targets[keep]
+
+
+def _unique_in_order(*ids: np.ndarray) -> np.ndarray:
+    """
+    The distinct IDs of the arrays, in order of first appearance.
+    """
+    ids = np.concatenate(ids)
+    _, first = np.unique(ids, return_index=True)
+    return ids[np.sort(first)]
+
+
+def _renumber(ids: np.ndarray, n_terms: int) -> np.ndarray:
+    """
+    Term ID -> position in ids (-1 if absent), as an array indexed by term ID.
+    """
+    positions = np.full(n_terms, -1, dtype=np.int64)
+    positions[ids] = np.arange(len(ids))
+    return positions
+
+
+def _literal_values(terms: TermDictionary, pairs: tuple, positions: np.ndarray, n: int) -> np.ndarray:
+    """
+    Float values of (node, literal) pairs by the nodes' positions, 0 for nodes without one.
+    """
+    nodes, literals = pairs
+    nodes = positions[nodes]
+    keep = nodes >= 0
+    values = np.zeros(n)
+    values[nodes[keep]] = np.nan_to_num(terms.values(literals[keep]))
+    return values
+
+
+def machine_scenarios(relations: RelationArrays) -> list[tuple]:
+    """
+    "What if this machine goes down now", for every machine at once:
+    - failure modes: failures that affect the machine
+    - blocked jobs: jobs those failures block
+    - downstream jobs: jobs reachable from them over nextJob (excluding the blocked ones)
+    - batches / lost batch size: ProductionBatches the machine processes
+    - expected / worst downtime: mean / max downtime over its failure modes
+
+    Returns rows in SCENARIO_COLUMNS order, ranked by lost batch size,
+    then jobs affected, then expected downtime.
+    """
+    r = relations
+    machines = r.machines
+    n_machines, n_jobs = len(machines), len(r.jobs)
+    fm_failure, fm_machine, downtime = r.fm_failure, r.fm_machine, r.downtime
+
+    # failure modes and downtime per machine
+    failure_modes = np.bincount(fm_machine, minlength=n_machines)
+    total_downtime = np.bincount(fm_machine, weights=downtime[fm_failure], minlength=n_machines)
+    expected_downtime = np.divide(total_downtime, failure_modes, out=np.zeros(n_machines), where=failure_modes > 0)
+    worst_downtime = np.zeros(n_machines)
+    np.maximum.at(worst_downtime, fm_machine, downtime[fm_failure])
+
+    # batches per machine
+    batch_count = np.bincount(r.mb_machine, minlength=n_machines)
+    lost_batch_size = np.bincount(r.mb_machine, weights=r.batch_size[r.mb_batch], minlength=n_machines)
+
+    # machine -> blocked job pairs: join (failure, machine) with (failure, job)
+    fj_indptr, fj_indices = _csr(r.fj_failure, r.fj_job, r.n_failures)
+    owner, job = _expand(fm_machine, fm_failure, fj_indptr, fj_indices)
+    blocked_keys = np.unique(owner * max(n_jobs, 1) + job)
+    blocked_owner, blocked_job = np.divmod(blocked_keys, max(n_jobs, 1))
+    blocked_jobs = np.bincount(blocked_owner, minlength=n_machines)
+
+    # nextJob closure per machine, one block of machines at a time; the visited
+    # matrix is reused and only the cells a block touched are cleared again
+    next_indptr, next_indices = _csr(r.next_src, r.next_dst, n_jobs)
+    downstream_jobs = np.zeros(n_machines, dtype=np.int64)
+    block = max(1, VISITED_CELLS // max(n_jobs, 1))
+    visited = np.zeros((min(block, n_machines), n_jobs), dtype=bool)
+    for lo in range(0, n_machines, block):
+        hi = min(lo + block, n_machines)
+        in_block = (blocked_owner >= lo) & (blocked_owner < hi)
+        owners, nodes = blocked_owner[in_block] - lo, blocked_job[in_block]
+        visited[owners, nodes] = True
+
+        touched = [(owners, nodes)]
+        while len(owners):
+            owners, nodes = _expand(owners, nodes, next_indptr, next_indices)
+            fresh = ~visited[owners, nodes]
+            keys = np.unique(owners[fresh] * n_jobs + nodes[fresh])
+            owners, nodes = np.divmod(keys, n_jobs)
+            visited[owners, nodes] = True
+            touched.append((owners, nodes))
+
+        for owners, nodes in touched:
+            visited[owners, nodes] = False
+        reached_owners = np.concatenate([owners for owners, _ in touched[1:]] or [np.empty(0, dtype=np.int64)])
+        downstream_jobs[lo:hi] = np.bincount(reached_owners, minlength=hi - lo)
+
+    order = np.lexsort((-expected_downtime, -(blocked_jobs + downstream_jobs), -lost_batch_size))
+    return [
+        (machines[i], int(failure_modes[i]), int(blocked_jobs[i]), int(downstream_jobs[i]),
+         int(batch_count[i]), float(lost_batch_size[i]), float(expected_downtime[i]), float(worst_downtime[i]))
+        for i in order
+    ]
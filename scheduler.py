@@ -0,0 +1,305 @@
+import heapq
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from timeseries import epoch_seconds
+
+
+SCHEDULE_COLUMNS = ["task", "machine", "team", "operator", "specialty_match", "due", "start", "end", "late_hours"]
+
+# Every operator works HOURS_PER_DAY hours a day from WORKDAY_START (hour of
+# the day), every day of the planning horizon.
+WORKDAY_START = 8
+HOURS_PER_DAY = 8.0
+HORIZON_DAYS = 30
+
+
+class WorkCalendar:
+    """
+    Working hours counted from midnight of the horizon's first day: the
+    scheduler places tasks on this axis, where every operator's capacity is
+    one interval [0, days * hours_per_day) and working days follow each other
+    without gaps. Wall-clock times, given as hours since that midnight, map
+    to the nearest edge of the working day when outside it.
+    """
+
+    def __init__(self, start: datetime, days: int = HORIZON_DAYS, hours_per_day: float = HOURS_PER_DAY,
+                 workday_start: float = WORKDAY_START):
+        self.start = datetime(start.year, start.month, start.day)
+        self.days = days
+        self.hours_per_day = hours_per_day
+        self.workday_start = workday_start
+        self.capacity = days * hours_per_day
+
+    def work_hours(self, hours: np.ndarray) -> np.ndarray:
+        day = np.floor(hours / 24)
+        return day * self.hours_per_day + np.clip(hours - day * 24 - self.workday_start, 0.0, self.hours_per_day)
+
+    def wall_time(self, hours: float) -> datetime:
+        return self.start + timedelta(seconds=round(hours * 3600))
+
+    def wall_times(self, hours: np.ndarray) -> np.ndarray:
+        """
+        wall_time of every element, as datetime64[s].
+        """
+        return np.datetime64(self.start, "s") + np.round(hours * 3600).astype("timedelta64[s]")
+
+    def to_datetimes(self, work_hours: np.ndarray, end: bool = False) -> np.ndarray:
+        """
+        The wall-clock times (datetime64[s]) of points on the working-hour
+        axis; with end, the close of a working day rather than the start of the next one.
+        """
+        day = np.floor(work_hours / self.hours_per_day)
+        offset = work_hours - day * self.hours_per_day
+        if end:
+            closing = (offset == 0) & (day > 0)
+            day = day - closing
+            offset = np.where(closing, self.hours_per_day, offset)
+        return self.wall_times(day * 24 + self.workday_start + offset)
+
+
+def task_occurrences(due: np.ndarray, last: np.ndarray, interval: np.ndarray, end: float):
+    """
+    (task, due, release) arrays of the occurrences of every task up to end,
+    all times in wall-clock hours since the start, unknown ones NaN.
+
+    A task's first occurrence is due at its dueDate, or an interval after
+    the machine's lastMaintenanceDate (at end if neither is known), and can
+    be done from the start. The task then recurs every
+    maintenanceIntervalDays, each occurrence released when the previous one
+    was due. Recurrences falling before the start are not repeated: an
+    overdue first occurrence stands for them.
+    """
+    first = np.where(np.isnan(due), last + interval, due)
+    first[np.isnan(first)] = end
+    tasks = np.flatnonzero(first <= end)
+    first, interval = first[tasks], interval[tasks]
+
+    recurring = np.flatnonzero(interval > 0)
+    step = interval[recurring]
+    k = np.maximum(1, np.ceil(-first[recurring] / step))
+    counts = np.maximum(0, np.floor((end - first[recurring]) / step) - k + 1).astype(np.int64)
+    # k, k + 1, ... for each recurring task: positions within each run added to its first k
+    runs = np.repeat(np.cumsum(counts) - counts, counts)
+    ks = np.repeat(k, counts) + np.arange(int(counts.sum())) - runs
+    recurrences = np.repeat(first[recurring], counts) + ks * np.repeat(step, counts)
+
+    return (np.concatenate([tasks, np.repeat(tasks[recurring], counts)]),
+            np.concatenate([first, recurrences]),
+            np.concatenate([np.zeros(len(first)), recurrences - np.repeat(step, counts)]))
+
+
+def _earliest(heap: list, free: list):
+    """
+    The operator of a (free hours, operator) heap who is free first. Entries
+    are never updated in place, only pushed again, so stale ones are dropped here.
+    """
+    while heap and heap[0][0] != free[heap[0][1]]:
+        heapq.heappop(heap)
+    return heap[0][1] if heap else None
+
+
+class Schedule:
+    """
+    The assignment of task occurrences to operators made by plan_maintenance:
+    assigned holds (task, operator, release, due, start, end, due hours)
+    with times in working hours (see WorkCalendar) but for the wall-clock
+    due hours, unscheduled (task, due hours, reason).
+    """
+
+    def __init__(self, calendar: WorkCalendar, tasks: list, operators: list):
+        self.calendar = calendar
+        self.tasks = tasks
+        self.operators = operators
+        self.assigned = []
+        self.unscheduled = []
+
+    def rows(self) -> list[tuple]:
+        """
+        Assignments in SCHEDULE_COLUMNS order, by start time.
+        """
+        if not self.assigned:
+            return []
+        task, operator, _, due, start, end, due_hours = (np.array(column) for column in zip(*self.assigned))
+        order = np.lexsort((operator, start))
+        task, operator, due, start, end, due_hours = (a[order] for a in (task, operator, due, start, end, due_hours))
+        tasks = [self.tasks[i] for i in task.tolist()]
+        operators = [self.operators[i] for i in operator.tolist()]
+        calendar = self.calendar
+        return list(zip(
+            [name for name, *_ in tasks], [machine for _, machine, *_ in tasks], [team for _, _, team, *_ in tasks],
+            [name for name, *_ in operators],
+            [theirs in specialties for (*_, specialties), (*_, theirs) in zip(tasks, operators)],
+            calendar.wall_times(due_hours).tolist(), calendar.to_datetimes(start).tolist(),
+            calendar.to_datetimes(end, end=True).tolist(),
+            [round(late, 2) for late in np.maximum(0.0, end - due).tolist()],
+        ))
+
+    def late(self) -> int:
+        return sum(1 for _, _, _, due, _, end, _ in self.assigned if end > due)
+
+    def team_utilization(self) -> dict:
+        """
+        {team: (operators, hours assigned, hours available)} over the horizon.
+        """
+        teams = {}
+        for _, team, _ in self.operators:
+            count, _, capacity = teams.get(team, (0, 0.0, 0.0))
+            teams[team] = (count + 1, 0.0, capacity + self.calendar.capacity)
+        for _, operator, _, _, start, end, _ in self.assigned:
+            count, hours, capacity = teams[self.operators[operator][1]]
+            teams[self.operators[operator][1]] = (count, hours + end - start, capacity)
+        return teams
+
+    def violations(self) -> list[str]:
+        """
+        Why the schedule is infeasible, checked from the assignments alone:
+        an operator of another team, a task started before its release,
+        overlapping work or work outside the horizon. Empty if it is feasible.
+        """
+        problems = []
+        by_operator = {}
+        for task, operator, release, _, start, end, _ in self.assigned:
+            name, _, team, hours, _ = self.tasks[task]
+            if self.operators[operator][1] != team:
+                problems.append(f"{name}: assigned to {self.operators[operator][0]} of another team")
+            if abs(end - start - hours) > 1e-9:
+                problems.append(f"{name}: scheduled for {end - start} h instead of {hours} h")
+            if start < max(release, 0.0) - 1e-9:
+                problems.append(f"{name}: starts before it is released")
+            if start < -1e-9 or end > self.calendar.capacity + 1e-9:
+                problems.append(f"{name}: outside the planning horizon")
+            by_operator.setdefault(operator, []).append((start, end, name))
+        for operator, intervals in by_operator.items():
+            intervals.sort()
+            for (_, end, first), (start, _, second) in zip(intervals, intervals[1:]):
+                if start < end - 1e-9:
+                    problems.append(f"{self.operators[operator][0]}: {first} and {second} overlap")
+        return problems
+
+
+class MaintenanceData:
+    """
+    Maintenance tasks and team operators as the scheduler takes them, built
+    once from the rows of maintenance_tasks.sparql and
+    maintenance_operators.sparql and planned over any horizon. tasks are
+    (task, machine, team, hours, specialties), with the specialties preferred
+    for the task (those of the machine's operators, any one will do; empty
+    if none); operators are (operator, team, specialty). due and last (maintenance) are seconds
+    since timeseries.EPOCH and interval hours, NaN when unknown.
+
+    Teams and (team, specialty) groups of operators are numbered here, with
+    each task's team and preferred groups (those some operator is in), so
+    that plan_maintenance only compares integers.
+    """
+
+    def __init__(self, tasks: list, operators: list, due: np.ndarray, last: np.ndarray, interval: np.ndarray):
+        self.tasks = tasks
+        self.operators = operators
+        self.due = due
+        self.last = last
+        self.interval = interval
+
+        teams, groups = {}, {}
+        self.operator_team = [teams.setdefault(team, len(teams)) for _, team, _ in operators]
+        self.operator_group = [groups.setdefault((team, specialty), len(groups)) for _, team, specialty in operators]
+        self.teams, self.groups = len(teams), len(groups)
+        self.task_team = np.array([teams.get(team, -1) for _, _, team, _, _ in tasks], dtype=np.int64)
+        self.task_groups = [tuple(groups[team, specialty] for specialty in specialties if (team, specialty) in groups)
+                            for _, _, team, _, specialties in tasks]
+        self.task_hours = np.array([hours for _, _, _, hours, _ in tasks], dtype=float)
+
+    @classmethod
+    def from_rows(cls, task_rows, operator_rows) -> "MaintenanceData":
+        """
+        task_rows are (task, machine, team, hours, due, last maintenance,
+        interval days, specialty), dateTimes as literals, datetimes or ISO
+        text; operator_rows (operator, team, specialty). Unbound cells are None.
+        A task is kept once per machine, with the specialties of all its rows.
+        """
+        operators = [(str(operator), str(team), None if specialty is None else str(specialty))
+                     for operator, team, specialty in dict.fromkeys(tuple(row) for row in operator_rows)]
+        tasks, due, last, interval, seen = [], [], [], [], {}
+        for task, machine, team, hours, due_date, last_date, interval_days, specialty in task_rows:
+            if (task, machine) in seen:
+                specialties = seen[task, machine]
+                if specialty is not None and str(specialty) not in specialties:
+                    specialties.append(str(specialty))
+                continue
+            seen[task, machine] = specialties = [] if specialty is None else [str(specialty)]
+            tasks.append((str(task), str(machine), str(team), float(hours), specialties))
+            due.append(math.nan if due_date is None else epoch_seconds(due_date))
+            last.append(math.nan if last_date is None else epoch_seconds(last_date))
+            interval.append(math.nan if interval_days is None else float(interval_days) * 24)
+        tasks = [(*task, tuple(specialties)) for *task, specialties in tasks]
+        return cls(tasks, operators, np.array(due, dtype=float), np.array(last, dtype=float),
+                   np.array(interval, dtype=float))
+
+
+def plan_maintenance(data: MaintenanceData, start: datetime, days: int = HORIZON_DAYS,
+                     hours_per_day: float = HOURS_PER_DAY) -> Schedule:
+    """
+    Assign every occurrence of every maintenance task due within the horizon
+    to an operator of the machine's maintaining team, without giving anyone
+    more work than their working hours.
+
+    Greedy earliest-due-date list scheduling: occurrences are taken by due
+    date and each goes to the operator who finishes it first, one of a
+    preferred specialty when that operator still finishes in time. Each
+    team keeps a heap of its operators by the working hour they are next
+    free, and one per specialty, so an assignment costs O(log operators).
+    Occurrences that cannot end within the horizon are left unscheduled.
+    """
+    calendar = WorkCalendar(start, days, hours_per_day)
+    tasks, operators = data.tasks, data.operators
+    offset = epoch_seconds(calendar.start)
+    due, last = (data.due - offset) / 3600, (data.last - offset) / 3600
+    interval = data.interval
+
+    ids, due_hours, release_hours = task_occurrences(due, last, interval, days * 24.0)
+    due, release = calendar.work_hours(due_hours), calendar.work_hours(release_hours)
+    order = np.lexsort((ids, release, due))
+    ids, due, release, due_hours = ids[order], due[order], release[order], due_hours[order]
+
+    # every operator is free from hour 0: lists of (0.0, operator) by operator are heaps already
+    team_heaps, group_heaps = [[] for _ in range(data.teams)], [[] for _ in range(data.groups)]
+    heaps_of = [(team_heaps[team], group_heaps[group]) for team, group in zip(data.operator_team, data.operator_group)]
+    for op, (team_heap, group_heap) in enumerate(heaps_of):
+        team_heap.append((0.0, op))
+        group_heap.append((0.0, op))
+
+    schedule = Schedule(calendar, tasks, operators)
+    capacity = calendar.capacity
+    free = [0.0] * len(operators)
+    assigned = schedule.assigned
+    task_groups = data.task_groups
+    for i, team, hours, due, release, due_hours in zip(
+            ids.tolist(), data.task_team[ids].tolist(), data.task_hours[ids].tolist(),
+            due.tolist(), release.tolist(), due_hours.tolist()):
+        if team < 0:
+            schedule.unscheduled.append((i, due_hours, "team has no operators"))
+            continue
+
+        op = None
+        for group in task_groups[i]:
+            candidate = _earliest(group_heaps[group], free)
+            if candidate is not None and (op is None or free[candidate] < free[op]):
+                op = candidate
+        if op is None or max(free[op], release) + hours > due:
+            other = _earliest(team_heaps[team], free)
+            if op is None or free[other] < free[op]:
+                op = other
+        begin = max(free[op], release)
+        end = begin + hours
+        if end > capacity:
+            schedule.unscheduled.append((i, due_hours, "no capacity left in the horizon"))
+            continue
+
+        free[op] = end
+        team_heap, group_heap = heaps_of[op]
+        heapq.heappush(team_heap, (end, op))
+        heapq.heappush(group_heap, (end, op))
+        assigned.append((i, op, release, due, begin, end, due_hours))
+    return schedule
@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import QUERY_TIMEOUT
+from result_cache import ResultCache
+from sandbox import QuerySandbox
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Set ONTOMAINT_SERVER to another URL to use a remote daemon, or to "" to always run locally.
+SERVER_URL = os.environ.get("ONTOMAINT_SERVER", f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+
+
+def serialize_cell(cell):
+    return None if cell is None else str(cell)
+
+
+class QueryService:
+    """
+    Holds one reasoned OntoMaintGraph and answers named and ad-hoc queries.
+    The graph is never modified while serving, so results are memoized.
+    Ad-hoc queries run in the sandbox's worker processes, with its timeout,
+    row limit and memory ceiling, and outside the cache's lock.
+    """
+
+    def __init__(self, graph, registry, cache_size: int = 256, sandbox: QuerySandbox = None):
+        self.graph = graph
+        self.registry = registry
+        self.cache = ResultCache(max_entries=cache_size)
+        # forked before the server's threads exist
+        self.sandbox = (sandbox or QuerySandbox.of_graph(graph)).start()
+
+    def _cached(self, key, evaluate):
+        def compute():
+            qr = evaluate()
+            vars_ = [str(v) for v in (qr.vars or [])]
+            rows = [[serialize_cell(cell) for cell in row] for row in qr]
+            return {"vars": vars_, "rows": rows}
+
+        return self.cache.get_or_compute(key, compute)
+
+    def run_sparql(self, text: str):
+        key = ("sparql", text)
+        result = self.cache.get(key)
+        if result is None:
+            vars_, rows, truncated = self.sandbox.run(text)
+            result = {"vars": vars_, "rows": [[serialize_cell(cell) for cell in row] for row in rows],
+                      "truncated": truncated}
+            self.cache.put(key, result)
+        return result
+
+    def run_named(self, name: str, bindings: dict = None):
+        key = ("named", name, tuple(sorted((bindings or {}).items())))
+        return self._cached(key, lambda: self.registry.execute(self.graph.graph, name, bindings))
+
+
+class QueryHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # many CLI clients may connect at once; the socketserver default of 5 drops them
+    request_queue_size = 128
+
+
+def make_handler(service: QueryService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok", "triples": len(service.graph.graph)})
+            else:
+                self._reply(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                self._reply(400, {"error": f"Invalid JSON: {e}"})
+                return
+
+            try:
+                if self.path == "/query":
+                    result = service.run_named(request["name"], request.get("bindings"))
+                elif self.path == "/sparql":
+                    result = service.run_sparql(request["query"])
+                else:
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+                    return
+            except KeyError as e:
+                self._reply(404, {"error": f"Unknown query {e}"})
+                return
+            except Exception as e:
+                self._reply(400, {"error": str(e)})
+                return
+
+            self._reply(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(service: QueryService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """
+    Serve queries over HTTP until interrupted.
+    """
+    httpd = QueryHTTPServer((host, port), make_handler(service))
+    print(f"OntoMaint query server listening on http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def start_background(service: QueryService, host: str = DEFAULT_HOST, port: int = 0):
+    """
+    Start a server on a background thread; returns (httpd, url). Mainly for tooling and benchmarks.
+    """
+    httpd = QueryHTTPServer((host, port), make_handler(service))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://{host}:{httpd.server_address[1]}"
+
+
+# ============================================================
+# Client side
+# ============================================================
+# The daemon is normally local, so bypass any HTTP proxy settings.
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def _post(url: str, path: str, payload: dict, timeout: float):
+    req = urllib.request.Request(
+        url + path,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with _opener.open(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read()).get("error", str(e))) from None
+
+
+def remote_query(name: str, bindings: dict = None, url: str = SERVER_URL, timeout: float = 30.0):
+    """
+    Run a named query on the server. Returns None when no server is reachable,
+    so callers can fall back to a local graph.
+    """
+    if not url:
+        return None
+    try:
+        result = _post(url, "/query", {"name": name, "bindings": bindings or {}}, timeout)
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+    return [tuple(row) for row in result["rows"]]
+
+
+def remote_sparql(query: str, url: str = SERVER_URL, timeout: float = QUERY_TIMEOUT + 10.0):
+    """
+    Run ad-hoc SPARQL on the server. Returns (vars, rows, truncated), truncated
+    when the server's row limit cut the result, or None when no server is reachable.
+    """
+    if not url:
+        return None
+    try:
+        result = _post(url, "/sparql", {"query": query}, timeout)
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+    return result["vars"], [tuple(row) for row in result["rows"]], result.get("truncated", False)
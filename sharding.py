@@ -0,0 +1,331 @@
+import multiprocessing as mp
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from rdflib import Graph, RDF
+from rdflib.plugins.sparql.algebra import CompValue
+from rdflib.plugins.sparql.evaluate import _val
+from rdflib.plugins.sparql.sparql import Query
+
+from config import DEFAULT_REASONING, DEFAULT_STORE, SNAPSHOT_DIR, SNAPSHOT_SUFFIXES
+from graph_manager import QUERIES_DIR, OntoMaintGraph, input_files, input_fingerprint
+from query_registry import iter_select, prepare_text
+from reasoning import query_vocabulary
+
+
+# Shard of the files directly in data/; every subdirectory of data/ is a shard of its own.
+MAIN_SHARD = "main"
+
+# Algebra nodes whose result on the whole graph cannot be put together from
+# the shards' results: aggregates (GROUP BY, COUNT, SUM...) and subqueries.
+GATHERED_NODES = {"AggregateJoin", "Group", "ToMultiSet"}
+
+
+def shard_files(base_dir: Path) -> dict[str, list[Path]]:
+    """
+    Input files of each shard, by shard name: the ontologies (replicated into
+    every shard), then the shard's data files. data/<name>/ (e.g. one
+    directory per plant or line) is the shard <name>, files directly in data/
+    are the shard "main".
+    """
+    ontologies, shards = [], {}
+    for path in input_files(base_dir):
+        relative = path.relative_to(base_dir).parts
+        if relative[0] == "ontologies":
+            ontologies.append(path)
+        else:
+            shards.setdefault(relative[1] if len(relative) > 2 else MAIN_SHARD, []).append(path)
+    return {name: ontologies + files for name, files in sorted(shards.items())} or {MAIN_SHARD: ontologies}
+
+
+def shard_snapshot_path(base_dir: Path, shard: str, fingerprint: str, store: str = DEFAULT_STORE) -> Path:
+    # one directory per shard: save_snapshot removes the other snapshots in its directory
+    return base_dir / SNAPSHOT_DIR / "shards" / shard / f"graph-{fingerprint[:16]}{SNAPSHOT_SUFFIXES[store]}"
+
+
+def merge_plan(query) -> dict:
+    """
+    How the rows a SELECT query gives on each shard combine into its rows on
+    all of them: {"variables", "solution", "distinct", "order": [(column,
+    descending)], "start", "length"}. None when they do not combine row by
+    row, i.e. the query aggregates, has subqueries or sorts on something it
+    does not project.
+
+    "solution" is the projected variables followed by every other variable
+    of the query's pattern. Shards return whole solutions of queries without
+    DISTINCT, so that merge_rows can tell one solution two shards both find
+    from two solutions that project to the same row.
+    """
+    found = set()
+
+    def walk(node):
+        if isinstance(node, CompValue):
+            found.add(node.name)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, (list, tuple)):
+            for value in node:
+                walk(value)
+
+    walk(query.algebra)
+    if found & GATHERED_NODES:
+        return None
+
+    node = query.algebra.p
+    plan = {"distinct": False, "order": [], "start": 0, "length": None}
+    if node.name == "Slice":
+        plan["start"], plan["length"] = node.start, node.length
+        node = node.p
+    if node.name in ("Distinct", "Reduced"):
+        plan["distinct"] = node.name == "Distinct"
+        node = node.p
+    if node.name != "Project":
+        return None
+    plan["variables"] = list(node.PV)
+    plan["solution"] = list(plan["variables"])
+    if not plan["distinct"]:
+        plan["solution"] += sorted(v for v in node.p._vars if v not in plan["variables"])
+
+    if node.p.name == "OrderBy":
+        for condition in node.p.expr:
+            expr = condition.expr if isinstance(condition, CompValue) else condition
+            if expr not in plan["variables"]:
+                return None
+            descending = isinstance(condition, CompValue) and condition.order == "DESC"
+            plan["order"].append((plan["variables"].index(expr), descending))
+    return plan
+
+
+def _order_key(term):
+    # rdflib's ORDER BY key; unbound values sort first
+    return (-1,) if term is None else _val(term)
+
+
+def merge_rows(plan: dict, results) -> list[tuple]:
+    """
+    Combine the rows of a query with the given merge_plan, in SPARQL order:
+    the union of the shards' rows of a DISTINCT query, or of the solutions
+    of any other, or one result's rows as they are (e.g. a view's rows, only
+    sorted and sliced). Rows may hold the plan's whole "solution" and are
+    cut to its "variables".
+
+    Shards repeat the ontology and whatever reference data (corrective
+    actions, spare parts...) each of their files states, so one solution can
+    come from several shards: a solution is kept as many times as the shard
+    that has it most often has it (more than once only through UNION).
+    Solutions differing in any variable, projected or not, are all kept.
+    """
+    if len(results) == 1:
+        rows = list(results[0])
+    elif plan["distinct"]:
+        rows = list(dict.fromkeys(row for rows in results for row in rows))
+    else:
+        counts = {}
+        for rows in results:
+            for row, count in Counter(rows).items():
+                counts[row] = max(counts.get(row, 0), count)
+        rows = [row for row, count in counts.items() for _ in range(count)]
+
+    for column, descending in reversed(plan["order"]):
+        rows.sort(key=lambda row: _order_key(row[column]), reverse=descending)
+    stop = None if plan["length"] is None else plan["start"] + plan["length"]
+    width = len(plan["variables"])
+    return [row[:width] for row in rows[plan["start"]:stop]]
+
+
+def _shard_query(query, plan: dict):
+    """
+    The query each shard runs: the same one, but projecting the plan's whole
+    solution (REDUCED dropped), and with OFFSET dropped and LIMIT raised to
+    OFFSET + LIMIT, as any shard's rows may end up first.
+    """
+    if plan["start"] == 0 and plan["solution"] == plan["variables"]:
+        return query
+    select = query.algebra
+    node = select.p.p if select.p.name == "Slice" else select.p
+    if plan["solution"] != plan["variables"]:
+        node = node.p if node.name == "Reduced" else node
+        node = CompValue(node.name, **{**node, "PV": plan["solution"]})
+    if select.p.name == "Slice":
+        length = None if plan["length"] is None else plan["start"] + plan["length"]
+        node = CompValue("Slice", start=0, length=length, p=node)
+    return Query(query.prologue, CompValue(select.name, **{**select, "PV": plan["solution"], "p": node}))
+
+
+# What forked scatter workers evaluate: (shards, query, bindings, vocabulary),
+# set in the parent right before it forks them.
+_scatter = None
+
+
+def _shard_rows(name: str) -> list[tuple]:
+    shards, query, bindings, _ = _scatter
+    return list(iter_select(shards[name].graph, query, bindings)[1])
+
+
+def _shard_triples(name: str) -> list[tuple]:
+    shards, _, _, (predicates, classes, is_open) = _scatter
+    graph = shards[name].graph
+    if is_open:
+        return list(graph)
+    triples = []
+    for predicate in predicates:
+        triples += graph.triples((None, predicate, None))
+    for cls in classes:
+        triples += graph.triples((None, RDF.type, cls))
+    return triples
+
+
+def _build_shard(base_dir: Path, name: str, files: list[Path], reasoning: str, store: str,
+                 queries_dir: Path) -> Path:
+    # Runs in a worker process; the parent loads the snapshot it writes.
+    path = shard_snapshot_path(base_dir, name, input_fingerprint(base_dir, reasoning, queries_dir, files), store)
+    graph = OntoMaintGraph(reasoning, queries_dir, store)
+    graph.load_ontologies_and_data(base_dir, workers=1, files=files)
+    graph.apply_reasoning()
+    graph.save_snapshot(path)
+    return path
+
+
+class ShardedGraph:
+    """
+    The inputs split into shards (see shard_files), each loaded and reasoned
+    as an OntoMaintGraph of its own, in parallel, and queried in parallel
+    (scatter-gather). Reasoning cost grows faster than the graph, so many
+    small shards reason much faster than one graph holding all of them.
+
+    A query's result on the shards equals its result on one graph holding
+    everything as long as no solution and no inference needs triples from
+    two shards, e.g. shards are plants and nothing relates two plants.
+    Queries without aggregates run on every shard and their rows are merged
+    (DISTINCT, ORDER BY, LIMIT/OFFSET applied again over all of them); see
+    merge_rows for how a solution every shard finds through the replicated
+    ontology and reference data is kept once.
+    Aggregates would be wrong summed per shard (a team with machines in two
+    shards, COUNT(DISTINCT) of something in both), so for them every shard
+    sends the triples the query's patterns can match and the query runs once
+    over those.
+
+    Offers run_named_query, iter_named_query and iter_query like OntoMaintGraph.
+    """
+
+    def __init__(self, base_dir: Path, reasoning: str = DEFAULT_REASONING, store: str = DEFAULT_STORE,
+                 queries_dir: Path = QUERIES_DIR, workers: int = None):
+        self.base_dir = base_dir
+        self.reasoning = reasoning
+        self.store = store
+        self.queries_dir = queries_dir
+        self.workers = workers
+        self.shards = {}
+        self.reasoned = True
+
+    def _notify(self, event: str, started: float, **info):
+        info["seconds"] = time.perf_counter() - started
+        for listener in list(OntoMaintGraph.listeners):
+            listener(event, info)
+
+    def _pool(self, tasks: int) -> ProcessPoolExecutor:
+        workers = min(self.workers or os.cpu_count() or 1, tasks)
+        if workers <= 1 or "fork" not in mp.get_all_start_methods():
+            return None
+        # rdflib is CPU-bound Python: forked processes, which see the loaded shards copy-on-write
+        return ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("fork"))
+
+    def snapshot_paths(self) -> dict[str, Path]:
+        return {name: shard_snapshot_path(self.base_dir, name,
+                                          input_fingerprint(self.base_dir, self.reasoning, self.queries_dir, files),
+                                          self.store)
+                for name, files in shard_files(self.base_dir).items()}
+
+    def load(self, use_snapshot: bool = True) -> "ShardedGraph":
+        """
+        Load every shard from its snapshot, first building (loading,
+        reasoning and saving) in a process pool the ones that are missing.
+        """
+        started = time.perf_counter()
+        files = shard_files(self.base_dir)
+        paths = self.snapshot_paths()
+        missing = [name for name, path in paths.items() if not (use_snapshot and path.exists())]
+
+        tasks = [(self.base_dir, name, files[name], self.reasoning, self.store, self.queries_dir) for name in missing]
+        pool = self._pool(len(tasks))
+        if pool is None:
+            for task in tasks:
+                _build_shard(*task)
+        else:
+            with pool:
+                for future in [pool.submit(_build_shard, *task) for task in tasks]:
+                    future.result()
+
+        self.shards = {}
+        for name, path in paths.items():
+            shard = OntoMaintGraph(self.reasoning, self.queries_dir, self.store)
+            if not shard.load_snapshot(path):
+                raise RuntimeError(f"Could not read the snapshot of shard {name}: {path}")
+            self.shards[name] = shard
+        triples = sum(len(shard.graph) for shard in self.shards.values())
+        self._notify("load", started, shards=len(self.shards), built=len(missing), triples=triples)
+        print(f"{len(self.shards)} shard(s) loaded with {triples} triples ({len(missing)} reasoned).")
+        return self
+
+    def _scatter(self, worker, query, bindings: dict, vocabulary=None) -> list:
+        """
+        worker(shard name) for every shard, in forked processes when there are several.
+        """
+        global _scatter
+        _scatter = (self.shards, query, bindings, vocabulary)
+        try:
+            pool = self._pool(len(self.shards))
+            if pool is None:
+                return [worker(name) for name in self.shards]
+            with pool:
+                return list(pool.map(worker, self.shards))
+        finally:
+            _scatter = None
+
+    def select(self, query, bindings: dict = None):
+        """
+        (variable names, rows) of a SELECT query (text or prepared) over all shards.
+        """
+        started = time.perf_counter()
+        if isinstance(query, str):
+            query = prepare_text(query)
+        if query.algebra.name != "SelectQuery":
+            raise ValueError(f"Only SELECT queries produce rows, not {query.algebra.name}")
+
+        plan = merge_plan(query)
+        if plan is not None:
+            rows = merge_rows(plan, self._scatter(_shard_rows, _shard_query(query, plan), bindings))
+            variables = [str(v) for v in plan["variables"]]
+            strategy = "merge"
+        else:
+            gathered = Graph()
+            vocabulary = query_vocabulary([query.algebra])
+            for triples in self._scatter(_shard_triples, query, bindings, vocabulary):
+                gathered.addN((s, p, o, gathered) for s, p, o in triples)
+            variables, rows = iter_select(gathered, query, bindings)
+            rows = list(rows)
+            strategy = "gather"
+        self._notify("scatter", started, shards=len(self.shards), strategy=strategy, rows=len(rows))
+        return variables, rows
+
+    def run_named_query(self, registry, name: str, bindings: dict = None):
+        print("Running query:", name)
+        started = time.perf_counter()
+        query = registry.prepared(name)
+        self._notify("prepare", started, query=name)
+
+        started = time.perf_counter()
+        rows = self.select(query, bindings)[1]
+        self._notify("evaluate", started, query=name, rows=len(rows))
+        return rows
+
+    def iter_query(self, query, bindings: dict = None):
+        variables, rows = self.select(query, bindings)
+        return variables, iter(rows)
+
+    def iter_named_query(self, registry, name: str, bindings: dict = None):
+        variables, rows = self.select(registry.prepared(name), bindings)
+        return variables, iter(rows)
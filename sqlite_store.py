@@ -0,0 +1,272 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from rdflib import BNode, Literal, URIRef
+from rdflib.store import Store
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    datatype TEXT NOT NULL DEFAULT '',
+    lang TEXT NOT NULL DEFAULT '',
+    UNIQUE (kind, value, datatype, lang)
+);
+CREATE TABLE IF NOT EXISTS triples (
+    s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS asserted (
+    s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS namespaces (prefix TEXT PRIMARY KEY, uri TEXT NOT NULL);
+"""
+# Created after a bulk write, which is much faster than maintaining them row by row.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS triples_pos ON triples (p, o, s);
+CREATE INDEX IF NOT EXISTS triples_osp ON triples (o, s, p);
+"""
+
+# Primary key column order is s, p, o; SQLite picks POS/OSP for the other patterns.
+_COLUMNS = ("s", "p", "o")
+# Ids looked up per "IN (...)" query when decoding; below SQLite's parameter limit.
+_DECODE_BATCH = 500
+
+
+def _key(term) -> tuple:
+    if isinstance(term, Literal):
+        return ("L", str(term), str(term.datatype or ""), term.language or "")
+    if isinstance(term, BNode):
+        return ("B", str(term), "", "")
+    return ("U", str(term), "", "")
+
+
+def _term(kind, value, datatype, lang):
+    if kind == "L":
+        return Literal(value, lang=lang or None, datatype=URIRef(datatype) if datatype else None)
+    if kind == "B":
+        return BNode(value)
+    return URIRef(value)
+
+
+class SQLiteStore(Store):
+    """
+    rdflib store kept in one SQLite file: a term dictionary plus an integer
+    triples table indexed as SPO (primary key), POS and OSP, so every
+    triple pattern is an index range scan. The asserted (pre-reasoning)
+    triples are kept in a table of their own for incremental reasoning.
+
+    Opening an existing file reads nothing up front; terms are decoded on
+    first use and cached, so memory grows with what queries touch rather
+    than with the size of the closure. Safe to share between threads (one
+    connection behind a lock) and to use after fork (the child reconnects).
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, path: Path = None, configuration=None, identifier=None):
+        super().__init__(configuration, identifier)
+        self.path = Path(path or configuration) if (path or configuration) else None
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self._ids = {}
+        self._terms = {}
+        if self.path is not None:
+            self.open(self.path)
+
+    # ------------------------------------------------------------
+    # Connection and term dictionary
+    # ------------------------------------------------------------
+    def open(self, configuration, create: bool = True):
+        self.path = Path(configuration)
+        if not create and not self.path.exists():
+            return -1  # rdflib.store.NO_STORE
+        self._connect()
+        return 1  # rdflib.store.VALID_STORE
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(SCHEMA + INDEXES)
+        self._pid = os.getpid()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def close(self, commit_pending_transaction: bool = False):
+        if self._conn is not None:
+            if commit_pending_transaction:
+                self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def commit(self):
+        with self._lock:
+            self._db().commit()
+
+    def rollback(self):
+        with self._lock:
+            self._db().rollback()
+
+    def _id(self, term, create: bool = False):
+        term_id = self._ids.get(term)
+        if term_id is not None:
+            return term_id
+        key = _key(term)
+        db = self._db()
+        row = db.execute("SELECT id FROM terms WHERE kind=? AND value=? AND datatype=? AND lang=?", key).fetchone()
+        if row is None:
+            if not create:
+                return None
+            row = (db.execute("INSERT INTO terms (kind, value, datatype, lang) VALUES (?, ?, ?, ?)", key).lastrowid,)
+        self._ids[term] = row[0]
+        self._terms[row[0]] = term
+        return row[0]
+
+    def _decode(self, ids):
+        missing = list({i for i in ids if i not in self._terms})
+        db = self._db()
+        for start in range(0, len(missing), _DECODE_BATCH):
+            batch = missing[start:start + _DECODE_BATCH]
+            rows = db.execute(f"SELECT id, kind, value, datatype, lang FROM terms WHERE id IN ({','.join('?' * len(batch))})",
+                              batch)
+            for term_id, *key in rows:
+                term = _term(*key)
+                self._terms[term_id] = term
+                self._ids[term] = term_id
+
+    # ------------------------------------------------------------
+    # rdflib Store API
+    # ------------------------------------------------------------
+    def add(self, triple, context=None, quoted=False):
+        with self._lock:
+            ids = tuple(self._id(term, create=True) for term in triple)
+            self._db().execute("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)", ids)
+        super().add(triple, context, quoted)
+
+    def addN(self, quads):
+        with self._lock:
+            rows = [tuple(self._id(term, create=True) for term in (s, p, o)) for s, p, o, _ in quads]
+            self._db().executemany("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)", rows)
+
+    def remove(self, triple, context=None):
+        with self._lock:
+            where, args = self._where(triple)
+            if where is not None:
+                self._db().execute(f"DELETE FROM triples{where}", args)
+        super().remove(triple, context)
+
+    def _where(self, pattern):
+        """
+        (" WHERE ..." clause, parameters) for a triple pattern; clause None if a bound term is unknown.
+        """
+        conditions, args = [], []
+        for column, term in zip(_COLUMNS, pattern):
+            if term is None:
+                continue
+            term_id = self._id(term)
+            if term_id is None:
+                return None, None
+            conditions.append(f"{column}=?")
+            args.append(term_id)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
+
+    def triples(self, triple_pattern, context=None):
+        with self._lock:
+            where, args = self._where(triple_pattern)
+            if where is None:
+                return
+            rows = self._db().execute(f"SELECT s, p, o FROM triples{where}", args).fetchall()
+            self._decode(i for row in rows for i in row)
+        terms = self._terms
+        for s, p, o in rows:
+            yield (terms[s], terms[p], terms[o]), iter(())
+
+    def __len__(self, context=None):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        # rdflib binds its default prefixes on every Graph(); only write what changes
+        current = self.namespace(prefix)
+        if current == URIRef(namespace) or (current is not None and not override):
+            return
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO namespaces VALUES (?, ?)", (prefix, str(namespace)))
+
+    def namespace(self, prefix):
+        with self._lock:
+            row = self._db().execute("SELECT uri FROM namespaces WHERE prefix=?", (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        with self._lock:
+            row = self._db().execute("SELECT prefix FROM namespaces WHERE uri=?", (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        with self._lock:
+            rows = self._db().execute("SELECT prefix, uri FROM namespaces").fetchall()
+        for prefix, uri in rows:
+            yield prefix, URIRef(uri)
+
+    # ------------------------------------------------------------
+    # Asserted triples and bulk writes
+    # ------------------------------------------------------------
+    def asserted(self) -> list:
+        with self._lock:
+            rows = self._db().execute("SELECT s, p, o FROM asserted").fetchall()
+            self._decode(i for row in rows for i in row)
+        return [(self._terms[s], self._terms[p], self._terms[o]) for s, p, o in rows]
+
+    def set_asserted(self, triples):
+        with self._lock:
+            rows = [tuple(self._id(term, create=True) for term in t) for t in triples]
+            db = self._db()
+            db.execute("DELETE FROM asserted")
+            db.executemany("INSERT OR IGNORE INTO asserted VALUES (?, ?, ?)", rows)
+
+    @classmethod
+    def write(cls, path: Path, triples, asserted, namespaces=()):
+        """
+        Write a new store file with the given triples and asserted subset.
+        Built under a temporary name and renamed, so readers never see a partial file.
+        """
+        tmp = path.with_suffix(".tmp")
+        tmp.unlink(missing_ok=True)
+        db = sqlite3.connect(tmp)
+        db.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + SCHEMA)
+
+        ids = {}
+
+        def encode(term):
+            term_id = ids.get(term)
+            if term_id is None:
+                term_id = ids[term] = len(ids) + 1
+            return term_id
+
+        db.executemany("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)",
+                       ((encode(s), encode(p), encode(o)) for s, p, o in triples))
+        db.executemany("INSERT OR IGNORE INTO asserted VALUES (?, ?, ?)",
+                       ((encode(s), encode(p), encode(o)) for s, p, o in asserted))
+        db.executemany("INSERT INTO terms VALUES (?, ?, ?, ?, ?)",
+                       ((term_id, *_key(term)) for term, term_id in ids.items()))
+        db.executemany("INSERT OR REPLACE INTO namespaces VALUES (?, ?)",
+                       ((prefix, str(uri)) for prefix, uri in namespaces))
+        db.executescript(INDEXES + "ANALYZE;")
+        db.commit()
+        db.close()
+        tmp.replace(path)
@@ -0,0 +1,139 @@
+import sys
+
+import numpy as np
+from rdflib import RDF, URIRef
+
+from query_registry import ONTO
+
+
+# The relations the analyses join, as (subject, object) ID pairs of the
+# predicate of the same name; propagatesTo pairs the hasCause and the
+# propagatesTo of every FailurePropagation (cause -> effect).
+RELATIONS = ("affectsMachine", "blocksJob", "nextJob", "propagatesTo", "maintainedBy", "processesBatch")
+
+
+def _local_name(term) -> str:
+    # as app.format_uri: the part after the last '#', else after the last '/'
+    s = str(term)
+    if "#" in s:
+        return s.split("#")[-1]
+    if "/" in s:
+        return s.split("/")[-1]
+    return s
+
+
+def join(left_key: np.ndarray, left: np.ndarray, right_key: np.ndarray, right: np.ndarray):
+    """
+    (left, right) value pairs of every left and right entry with equal keys,
+    as sorted merge on ID arrays.
+    """
+    order = np.argsort(right_key, kind="stable")
+    right_key, right = right_key[order], right[order]
+    starts = np.searchsorted(right_key, left_key, side="left")
+    counts = np.searchsorted(right_key, left_key, side="right") - starts
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(left, counts), right[np.repeat(starts, counts) + offsets]
+
+
+class TermDictionary:
+    """
+    Every IRI, blank node and literal of a graph numbered with a compact
+    integer ID, with its local name computed once, and the graph's triples
+    as three int32 ID arrays (subjects, predicates, objects).
+
+    The analyses' relations come out as pairs of ID arrays (relation,
+    pairs), so their joins, grouping and counting run on integers in NumPy;
+    terms are decoded (terms, names) only for the rows that are output.
+    """
+
+    def __init__(self, terms: list, subjects: np.ndarray, predicates: np.ndarray, objects: np.ndarray,
+                 ids: dict = None):
+        self.terms = terms
+        self.ids = {term: i for i, term in enumerate(terms)} if ids is None else ids
+        self.names = [_local_name(term) for term in terms]
+        self.subjects = subjects
+        self.predicates = predicates
+        self.objects = objects
+
+    @classmethod
+    def from_graph(cls, graph) -> "TermDictionary":
+        """
+        Number the terms of an rdflib graph in the order its triples come.
+        """
+        ids = {}
+        codes = np.fromiter((ids.setdefault(term, len(ids)) for triple in graph for term in triple),
+                            dtype=np.int32, count=3 * len(graph)).reshape(-1, 3)
+        return cls(list(ids), codes[:, 0].copy(), codes[:, 1].copy(), codes[:, 2].copy(), ids)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def id(self, term) -> int:
+        """
+        The ID of a term (a local name is taken in the onto: namespace), -1 if the graph lacks it.
+        """
+        if type(term) is str and ":" not in term:
+            term = URIRef(ONTO + term)
+        return self.ids.get(term, -1)
+
+    def pairs(self, predicate) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (subjects, objects) of the triples with a predicate.
+        """
+        matches = self.predicates == self.id(predicate)
+        return self.subjects[matches], self.objects[matches]
+
+    def instances(self, cls) -> np.ndarray:
+        """
+        Sorted IDs of the subjects typed with a class.
+        """
+        subjects, classes = self.pairs(RDF.type)
+        return np.unique(subjects[classes == self.id(cls)])
+
+    def relation(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (source, target) ID arrays of one of RELATIONS.
+        """
+        if name not in RELATIONS:
+            raise ValueError(f"Unknown relation {name!r}; expected one of {', '.join(RELATIONS)}")
+        if name != "propagatesTo":
+            return self.pairs(name)
+
+        propagations = self.instances("FailurePropagation")
+        cause_of, causes = self.pairs("hasCause")
+        effect_of, effects = self.pairs("propagatesTo")
+        typed = np.isin(cause_of, propagations)
+        causes, effects = join(cause_of[typed], causes[typed], effect_of, effects)
+        # one cause -> effect edge however many propagations state it
+        edges = np.unique(causes.astype(np.int64) * len(self.terms) + effects)
+        causes, effects = np.divmod(edges, len(self.terms))
+        return causes.astype(np.int32), effects.astype(np.int32)
+
+    def decode(self, ids) -> list:
+        terms = self.terms
+        return [terms[i] for i in np.asarray(ids).tolist()]
+
+    def local_names(self, ids) -> list[str]:
+        names = self.names
+        return [names[i] for i in np.asarray(ids).tolist()]
+
+    def values(self, ids) -> np.ndarray:
+        """
+        Literals as floats, NaN for what is not numeric.
+        """
+        out = np.full(len(ids), np.nan)
+        for k, term in enumerate(self.decode(ids)):
+            try:
+                out[k] = float(term)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+    def nbytes(self) -> dict:
+        """
+        Bytes held by the ID arrays and, roughly, by the dictionary itself (ids and names, not the terms).
+        """
+        arrays = self.subjects.nbytes + self.predicates.nbytes + self.objects.nbytes
+        names = sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        return {"triples": arrays, "ids": sys.getsizeof(self.ids), "names": names}
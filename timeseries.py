@@ -0,0 +1,318 @@
+import hashlib
+import io
+import pickle
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+
+TIME_UNIT = "datetime64[ms]"
+READINGS_COLUMNS = ["time", "machine", "sensor", "metric", "value", "unit"]
+
+READINGS_FORMAT = 1
+
+# Origin of dateTimes held as seconds (MaintenanceData, MachineRisk).
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_datetime64(value):
+    """
+    Parse an ISO timestamp (or xsd:dateTime literal) into numpy datetime64[ms].
+    """
+    if value is None:
+        return None
+    return np.datetime64(str(value).rstrip("Z"), "ms")
+
+
+def to_naive_datetime(value) -> datetime:
+    """
+    An xsd:dateTime literal, datetime or ISO timestamp as a naive datetime:
+    ones with a timezone compare with the ones without it as wall-clock times.
+    """
+    value = value.toPython() if hasattr(value, "toPython") else value
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value if value.tzinfo is None else value.replace(tzinfo=None)
+
+
+def epoch_seconds(value) -> float:
+    """
+    Seconds since EPOCH of a dateTime (see to_naive_datetime).
+    """
+    return (to_naive_datetime(value) - EPOCH).total_seconds()
+
+
+class TimeSeries:
+    """
+    Append-only timestamp/value columns for one (machine, sensor, metric).
+    Appends are buffered as chunks and consolidated into contiguous, time-sorted
+    arrays the first time the series is read.
+    """
+
+    def __init__(self, unit: str = None):
+        self.unit = unit
+        self._times = np.empty(0, dtype=TIME_UNIT)
+        self._values = np.empty(0, dtype=np.float64)
+        self._pending = []
+
+    def append(self, times, values):
+        times = np.asarray(times, dtype=TIME_UNIT)
+        values = np.asarray(values, dtype=np.float64)
+        if times.shape != values.shape:
+            raise ValueError("times and values must have the same length")
+        if len(times):
+            self._pending.append((times, values))
+
+    def _consolidate(self):
+        if not self._pending:
+            return
+        in_order = all(np.all(t[1:] >= t[:-1]) for t, _ in self._pending)
+        last = self._times[-1] if len(self._times) else None
+        for t, _ in self._pending:
+            if last is not None and t[0] < last:
+                in_order = False
+            last = t[-1]
+
+        times = np.concatenate([self._times] + [t for t, _ in self._pending])
+        values = np.concatenate([self._values] + [v for _, v in self._pending])
+        if not in_order:
+            order = np.argsort(times, kind="stable")
+            times, values = times[order], values[order]
+        self._times, self._values = times, values
+        self._pending = []
+
+    @property
+    def times(self) -> np.ndarray:
+        self._consolidate()
+        return self._times
+
+    @property
+    def values(self) -> np.ndarray:
+        self._consolidate()
+        return self._values
+
+    def __len__(self):
+        return len(self._times) + sum(len(t) for t, _ in self._pending)
+
+    def window(self, start=None, end=None):
+        """
+        (times, values) with start <= time <= end; either bound may be None.
+        """
+        times, values = self.times, self.values
+        lo = 0 if start is None else np.searchsorted(times, to_datetime64(start), side="left")
+        hi = len(times) if end is None else np.searchsorted(times, to_datetime64(end), side="right")
+        return times[lo:hi], values[lo:hi]
+
+    def aggregate(self, start=None, end=None) -> dict:
+        """
+        count/min/max/mean/last over a time window.
+        """
+        times, values = self.window(start, end)
+        if not len(values):
+            return {"count": 0, "min": None, "max": None, "mean": None, "last": None, "last_time": None}
+        return {
+            "count": int(len(values)),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+            "last": float(values[-1]),
+            "last_time": str(times[-1]),
+        }
+
+
+def readings_cache_path(cache_dir: Path, csv_path: Path) -> Path:
+    # one cache file per CSV, replaced as the CSV changes
+    digest = hashlib.sha256(str(csv_path.resolve()).encode()).hexdigest()[:16]
+    return cache_dir / f"readings-{csv_path.stem}-{digest}.pickle"
+
+
+class ReadingsColumns:
+    """
+    The readings of one CSV as columns: the (machine URI, sensor URI, metric)
+    keys of its series and their units, and per reading the index of its
+    series, its time and its value, in file order.
+
+    cached() keeps them in the snapshot directory with the size, mtime and
+    hash of the bytes they were parsed from: an unchanged CSV is not parsed
+    again, and one that only grew (readings appended) has only its new lines parsed.
+    """
+
+    def __init__(self, keys: list, units: list, series: np.ndarray, times: np.ndarray, values: np.ndarray):
+        self.keys = keys
+        self.units = units
+        self.series = series
+        self.times = times
+        self.values = values
+        # {"size", "mtime_ns", "sha256", "header", "complete"} of the CSV bytes parsed, once cached
+        self.parsed = None
+
+    def __len__(self):
+        return len(self.series)
+
+    @classmethod
+    def parse(cls, data: bytes, name: str = "readings") -> "ReadingsColumns":
+        """
+        Parse readings CSV text with columns time,machine,sensor,metric,value[,unit].
+        Machines and sensors may be local names (MixerA) or full URIs.
+        """
+        import pandas as pd
+        from query_registry import to_term
+
+        df = pd.read_csv(io.BytesIO(data))
+        missing = set(READINGS_COLUMNS[:5]) - set(df.columns)
+        if missing:
+            raise ValueError(f"{name}: missing columns {sorted(missing)}")
+        if "unit" not in df.columns:
+            df["unit"] = None
+
+        groups = df.groupby(["machine", "sensor", "metric"], sort=False)
+        first = groups.head(1)  # in group order: sort=False numbers groups as they first appear
+        keys = [(str(to_term(machine)), str(to_term(sensor)), str(metric))
+                for machine, sensor, metric in zip(first["machine"], first["sensor"], first["metric"])]
+        units = [None if pd.isna(unit) else str(unit) for unit in first["unit"]]
+        return cls(keys, units, groups.ngroup().to_numpy(dtype=np.int32),
+                   pd.to_datetime(df["time"]).values.astype(TIME_UNIT), df["value"].to_numpy(dtype=np.float64))
+
+    def extend(self, other: "ReadingsColumns"):
+        """
+        Append the readings of other (later lines of the same CSV).
+        """
+        index = {key: i for i, key in enumerate(self.keys)}
+        remap = np.empty(len(other.keys), dtype=np.int32)
+        for i, (key, unit) in enumerate(zip(other.keys, other.units)):
+            if key not in index:
+                index[key] = len(self.keys)
+                self.keys.append(key)
+                self.units.append(unit)
+            remap[i] = index[key]
+        self.series = np.concatenate([self.series, remap[other.series]])
+        self.times = np.concatenate([self.times, other.times])
+        self.values = np.concatenate([self.values, other.values])
+
+    @classmethod
+    def cached(cls, path: Path, cache_dir: Path) -> "ReadingsColumns":
+        """
+        The readings of a CSV, from its cache in cache_dir (see readings_cache_path)
+        if still valid, with whatever lines were appended since parsed and added.
+        """
+        cache = readings_cache_path(cache_dir, path)
+        stat = path.stat()
+        columns = cls.load(cache)
+        if columns is not None and (columns.parsed["size"], columns.parsed["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return columns
+
+        data = path.read_bytes()
+        digest = None
+        if columns is not None and columns.parsed["complete"] and columns.parsed["size"] <= len(data):
+            digest = hashlib.sha256(data[:columns.parsed["size"]])
+            if digest.hexdigest() == columns.parsed["sha256"]:
+                tail = data[columns.parsed["size"]:]
+                if tail.strip():
+                    columns.extend(cls.parse(columns.parsed["header"] + tail, str(path)))
+                digest.update(tail)
+            else:
+                digest = None
+        if digest is None:
+            columns = cls.parse(data, str(path))
+            digest = hashlib.sha256(data)
+
+        columns.parsed = {"size": len(data), "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest(),
+                          "header": data[:data.find(b"\n") + 1], "complete": data.endswith(b"\n")}
+        try:
+            columns.save(cache)
+        except OSError as e:
+            print(f"Could not write readings cache {cache}: {e}")
+        return columns
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump((READINGS_FORMAT, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @staticmethod
+    def load(path: Path):
+        """
+        Load columns written by save, or None if missing, unreadable or from another format.
+        """
+        try:
+            with path.open("rb") as f:
+                fmt, columns = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError, ValueError):
+            return None
+        return columns if fmt == READINGS_FORMAT else None
+
+
+class TimeSeriesStore:
+    """
+    Sensor readings keyed by (machine, sensor, metric), kept outside the RDF graph.
+    Machines and sensors are stored as full URIs, metrics by name.
+    """
+
+    def __init__(self):
+        self.series = {}
+
+    def __len__(self):
+        return sum(len(s) for s in self.series.values())
+
+    def get(self, machine: str, sensor: str, metric: str, unit: str = None) -> TimeSeries:
+        key = (str(machine), str(sensor), str(metric))
+        if key not in self.series:
+            self.series[key] = TimeSeries(unit)
+        elif unit and not self.series[key].unit:
+            self.series[key].unit = unit
+        return self.series[key]
+
+    def append(self, machine, sensor, metric, times, values, unit: str = None):
+        self.get(machine, sensor, metric, unit).append(times, values)
+
+    def ingest_rows(self, rows):
+        """
+        Ingest (machine, sensor, metric, value, unit, time) rows.
+        """
+        grouped = {}
+        for machine, sensor, metric, value, unit, time in rows:
+            key = (str(machine), str(sensor), str(metric), None if unit is None else str(unit))
+            times, values = grouped.setdefault(key, ([], []))
+            times.append(to_datetime64(time))
+            values.append(float(value))
+        for (machine, sensor, metric, unit), (times, values) in grouped.items():
+            self.append(machine, sensor, metric, times, values, unit)
+
+    def ingest_columns(self, columns: ReadingsColumns):
+        order = np.argsort(columns.series, kind="stable")
+        ends = np.cumsum(np.bincount(columns.series, minlength=len(columns.keys)))
+        start = 0
+        for ((machine, sensor, metric), unit), end in zip(zip(columns.keys, columns.units), ends.tolist()):
+            rows = order[start:end]
+            self.append(machine, sensor, metric, columns.times[rows], columns.values[rows], unit)
+            start = end
+
+    def ingest_csv(self, path: Path, cache_dir: Path = None):
+        """
+        Ingest a readings CSV (see ReadingsColumns.parse), parsed columns
+        cached in cache_dir if given (see ReadingsColumns.cached).
+        """
+        if cache_dir is None:
+            self.ingest_columns(ReadingsColumns.parse(path.read_bytes(), str(path)))
+        else:
+            self.ingest_columns(ReadingsColumns.cached(path, cache_dir))
+
+    def ingest_dir(self, directory: Path, cache_dir: Path = None):
+        for path in sorted(directory.glob("*.csv")):
+            self.ingest_csv(path, cache_dir)
+
+    def aggregates(self, start=None, end=None) -> list[tuple]:
+        """
+        One row per series: (machine, sensor, metric, unit, count, min, max, mean, last, last_time),
+        skipping series without readings in the window.
+        """
+        rows = []
+        for (machine, sensor, metric), ts in sorted(self.series.items()):
+            agg = ts.aggregate(start, end)
+            if agg["count"]:
+                rows.append((machine, sensor, metric, ts.unit, agg["count"], agg["min"],
+                             agg["max"], agg["mean"], agg["last"], agg["last_time"]))
+        return rows
@@ -0,0 +1,331 @@
+import pickle
+from pathlib import Path
+
+from rdflib import Graph, Variable
+from rdflib.graph import ReadOnlyGraphAggregate
+from rdflib.paths import Path as PropertyPath
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+
+from config import SNAPSHOT_DIR
+from query_registry import iter_select
+from sharding import merge_plan, merge_rows
+
+
+VIEWS_FORMAT = 1
+
+# name: (named query, key variable). A view holds the rows of
+# its query grouped by the key's value; rows with an unbound key are not kept.
+VIEWS = {
+    "team_operators": ("team_operators.sparql", "team"),
+    "team_machines": ("team_machines.sparql", "team"),
+    "team_hours": ("team_hours.sparql", "team"),
+    "high_risk_failures": ("high_risk_failures.sparql", "failure"),
+    "production_impact": ("production_impact_analysis.sparql", "batch"),
+}
+
+# Named queries answered by reading one view instead of being evaluated: name -> view.
+VIEW_QUERIES = {
+    "high_risk_failures.sparql": "high_risk_failures",
+    "production_impact_analysis.sparql": "production_impact",
+}
+
+# Named queries answered by joining several views on their key (see
+# query_rows): name -> the views, in the order of the query's columns after the key.
+JOINED_QUERIES = {
+    "team_workload.sparql": ("team_operators", "team_machines", "team_hours"),
+}
+
+# Under these a new triple can remove solutions (and a removed one add
+# some): which keys that affects cannot be told from the triple itself.
+NEGATION_NODES = {"Minus", "Builtin_EXISTS", "Builtin_NOTEXISTS"}
+
+
+def answered_by_views(query_name: str) -> bool:
+    """
+    Whether a named query is read from the views (VIEW_QUERIES, JOINED_QUERIES).
+    """
+    return query_name in VIEW_QUERIES or query_name in JOINED_QUERIES
+
+
+def views_path(base_dir: Path, fingerprint: str) -> Path:
+    return base_dir / SNAPSHOT_DIR / f"views-{fingerprint[:16]}.pickle"
+
+
+def _nodes(node, found: list) -> list:
+    if isinstance(node, CompValue):
+        found.append(node)
+        for value in node.values():
+            _nodes(value, found)
+    elif isinstance(node, (list, tuple)):
+        for value in node:
+            _nodes(value, found)
+    return found
+
+
+def _pattern(select):
+    """
+    The graph pattern of a SELECT query, below its solution modifiers and aggregation.
+    """
+    node = select.p
+    while node.name in ("Slice", "Distinct", "Reduced", "Project", "OrderBy"):
+        node = node.p
+    inner = node
+    while inner.name in ("Extend", "Filter"):
+        inner = inner.p
+    return inner.p.p if inner.name == "AggregateJoin" else node
+
+
+def _unify(pattern: tuple, triple: tuple):
+    """
+    Variable bindings under which a triple pattern matches the triple, or
+    None. A property path may match anything: {} (no bindings).
+    """
+    bindings = {}
+    for term, value in zip(pattern, triple):
+        if isinstance(term, PropertyPath):
+            return {}
+        if isinstance(term, Variable):
+            if bindings.setdefault(term, value) != value:
+                return None
+        elif term != value:
+            return None
+    return bindings
+
+
+def _holds(node, pattern) -> bool:
+    return any(n.name == "BGP" and pattern in n.triples for n in _nodes(node, []))
+
+
+def _starting_from(triples: list, pattern) -> list:
+    """
+    A BGP's triple patterns reordered to start with pattern and go on with
+    the ones most bound by what came before: rdflib evaluates them in list
+    order, so each is then an index lookup rather than a scan.
+    """
+    ordered, bound, rest = [pattern], set(pattern), [t for t in triples if t != pattern]
+    while rest:
+        best = max(rest, key=lambda t: sum(not isinstance(term, Variable) or term in bound for term in t))
+        rest.remove(best)
+        ordered.append(best)
+        bound.update(best)
+    return ordered
+
+
+def _requiring(node, pattern):
+    """
+    node rewritten to be evaluated from the triple pattern outwards: its BGP
+    starts with the pattern, joins evaluate the side holding it first, and an
+    OPTIONAL whose optional side holds it becomes a join (with the
+    OPTIONAL's filter). Only the nodes above the pattern are copied.
+    """
+    if not isinstance(node, CompValue) or not _holds(node, pattern):
+        return node
+    if node.name == "BGP":
+        return CompValue("BGP", triples=_starting_from(node.triples, pattern))
+    if node.name in ("Join", "LeftJoin") and _holds(node.p2, pattern):
+        join = CompValue("Join", p1=_requiring(node.p2, pattern), p2=node.p1, lazy=True)
+        return join if node.name == "Join" else CompValue("Filter", expr=node.expr, p=join)
+    if node.name == "Join":
+        return CompValue("Join", p1=_requiring(node.p1, pattern), p2=node.p2, lazy=True)
+    return CompValue(node.name, **{name: [_requiring(v, pattern) for v in value] if isinstance(value, list)
+                                   else _requiring(value, pattern) for name, value in node.items()})
+
+
+class View:
+    """
+    One view: the rows of a named query grouped by a key variable, and how
+    to find the keys a change to the graph can affect.
+    """
+
+    def __init__(self, name: str, query, key: str):
+        self.name = name
+        self.query = query
+        self.key = Variable(key)
+        self.variables = [str(v) for v in query.algebra.PV]
+        self.column = self.variables.index(key)
+        nodes = _nodes(query.algebra, [])
+        self.patterns = [t for node in nodes if node.name == "BGP" for t in node.triples]
+        self.negated = any(node.name in NEGATION_NODES for node in nodes)
+        self.aggregated = any(node.name == "AggregateJoin" for node in nodes)
+        self._keys_queries = {}
+
+    def keys_query(self, pattern):
+        """
+        SELECT DISTINCT ?key WHERE { the query's pattern }, with the
+        OPTIONALs that hold the given triple pattern made required: bindings
+        for its variables must then restrict the solutions, not just be
+        compatible with ones that left the OPTIONAL unbound. With no triple
+        pattern (None), the query's pattern as it is.
+        """
+        if pattern not in self._keys_queries:
+            select = self.query.algebra
+            where = _requiring(_pattern(select), pattern)
+            keys = CompValue("Distinct", p=CompValue("Project", p=where, PV=[self.key]))
+            self._keys_queries[pattern] = Query(self.query.prologue, CompValue(
+                select.name, **{**select, "p": keys, "PV": [self.key]}))
+        return self._keys_queries[pattern]
+
+    def evaluate(self, graph, key=None) -> dict:
+        """
+        {key: rows} of the whole view, or of the given key only.
+        """
+        groups = {}
+        bindings = None if key is None else {str(self.key): key}
+        if key is not None and self.aggregated and not any(iter_select(graph, self.keys_query(None), bindings)[1]):
+            # rdflib gives a grouped query whose key is bound but matches nothing
+            # one row anyway, of the key and unbound aggregates
+            return groups
+        for row in iter_select(graph, self.query, bindings)[1]:
+            if row[self.column] is not None:
+                groups.setdefault(row[self.column], []).append(row)
+        return groups
+
+    def affected_keys(self, graph, triples):
+        """
+        Keys whose rows can differ between graph with and without the given
+        triples, or None if any can. Found with the query's pattern, the
+        variables of each triple pattern bound to each triple it matches, on
+        graph plus the triples: every solution using a changed triple, before
+        or after the change, is there.
+        """
+        lookups = set()
+        for triple in triples:
+            for pattern in self.patterns:
+                found = _unify(pattern, triple)
+                if found == {} or (found and self.negated):
+                    return None
+                if found is not None:
+                    lookups.add((pattern, tuple(sorted(found.items()))))
+        if not lookups:
+            return set()
+
+        changed = Graph()
+        for triple in triples:
+            changed.add(triple)
+        union = ReadOnlyGraphAggregate([graph, changed])
+        keys = set()
+        for pattern, found in lookups:
+            for (key,) in iter_select(union, self.keys_query(pattern), {str(v): term for v, term in found})[1]:
+                keys.add(key)
+        return keys
+
+
+class MaterializedViews:
+    """
+    The aggregates and joins behind the team workload, high-risk and
+    production analyses (VIEWS), computed once and stored next to the graph
+    snapshot. When triples are added or removed (OntoMaintGraph.apply_delta
+    reports which, inferences included) only the keys those triples can
+    affect are re-evaluated, e.g. one team's counts when one of its machines
+    changes, with the key bound so that rdflib evaluates just that group.
+    """
+
+    def __init__(self, registry, views: dict = VIEWS):
+        self.registry = registry
+        # the views' query texts, stored with their rows: an edited query makes them stale
+        self.texts = {name: registry.text(query) for name, (query, _) in views.items()}
+        self.views = {name: View(name, registry.prepared(query), key) for name, (query, key) in views.items()}
+        self.groups = {name: {} for name in self.views}
+
+    def build(self, graph) -> "MaterializedViews":
+        for name, view in self.views.items():
+            self.groups[name] = view.evaluate(graph)
+        return self
+
+    def update(self, graph, delta) -> dict:
+        """
+        Bring the views up to date with graph after a change: delta is what
+        apply_delta returned, (added, removed) or None to rebuild everything.
+        Returns the number of keys re-evaluated per view.
+        """
+        triples = None if delta is None else delta[0] | delta[1]
+        updated = {}
+        for name, view in self.views.items():
+            keys = None if triples is None else view.affected_keys(graph, triples)
+            if keys is None:
+                self.groups[name] = view.evaluate(graph)
+                updated[name] = len(self.groups[name])
+                continue
+            groups = self.groups[name] = dict(self.groups[name])
+            for key in keys:
+                rows = view.evaluate(graph, key).get(key)
+                if rows:
+                    groups[key] = rows
+                else:
+                    groups.pop(key, None)
+            updated[name] = len(keys)
+        return updated
+
+    def copy(self) -> "MaterializedViews":
+        views = object.__new__(MaterializedViews)
+        views.registry, views.texts, views.views = self.registry, self.texts, self.views
+        views.groups = dict(self.groups)
+        return views
+
+    def rows(self, name: str) -> tuple[list[str], list[tuple]]:
+        """
+        (variable names, rows) of a view, in the order of its query's ORDER BY if it has one.
+        """
+        view = self.views[name]
+        rows = [row for group in self.groups[name].values() for row in group]
+        plan = merge_plan(view.query)
+        return view.variables, rows if plan is None else merge_rows(plan, [rows])
+
+    def query_rows(self, query_name: str) -> tuple[list[str], list[tuple]]:
+        """
+        (variable names, rows) of a named query answered_by_views, read from the views.
+        """
+        if query_name in VIEW_QUERIES:
+            return self.rows(VIEW_QUERIES[query_name])
+        # per-key aggregates joined on the key, like the query's subqueries
+        names = JOINED_QUERIES[query_name]
+        groups = [self.groups[name] for name in names]
+        keys = sorted(set.intersection(*(set(group) for group in groups)))
+        variables = [str(self.views[names[0]].key)] + [self.views[name].variables[1] for name in names]
+        return variables, [(key, *(group[key][0][1] for group in groups)) for key in keys]
+
+    def check(self, graph) -> list[str]:
+        """
+        Names of the views whose rows differ from their query's on graph (compared as multisets).
+        """
+        def key(rows):
+            return sorted("\t".join("" if term is None else term.n3() for term in row) for row in rows)
+
+        return [name for name, view in self.views.items()
+                if key(row for group in self.groups[name].values() for row in group)
+                != key(row for group in view.evaluate(graph).values() for row in group)]
+
+    # ------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------
+    def save(self, path: Path):
+        """
+        Pickle the views' rows (see views_path); older view files are removed.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for old in path.parent.glob("views-*.pickle"):
+            if old != path:
+                old.unlink()
+
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump((VIEWS_FORMAT, self.texts, self.groups), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, registry):
+        """
+        Views saved by save, or None if the file is missing, unreadable, from
+        another format or from other view queries than the registry's.
+        """
+        try:
+            with path.open("rb") as f:
+                fmt, texts, groups = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError, ValueError):
+            return None
+        views = cls(registry)
+        if fmt != VIEWS_FORMAT or texts != views.texts:
+            return None
+        views.groups = groups
+        return views